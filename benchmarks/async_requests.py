@@ -0,0 +1,109 @@
+"""Load test of the sync views and the async views (ASYNC_DATABASE) of the database mode.
+
+Run from the project root, optionally with the numbers of worker threads to compare:
+    python -m benchmarks.async_requests
+    python -m benchmarks.async_requests 1 4 16
+
+Each worker thread stands for a thread of a threaded worker, and sends track detail, genre search and
+album detail requests through the Flask test client. Both apps serve the same SQLite file of a synthetic catalog.
+Needs flask[async] and aiosqlite.
+"""
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from sqlalchemy.orm import sessionmaker, clear_mappers
+
+from music import create_app
+from music.adapters.database_engine import create_database_engine
+from music.adapters.database_repository import SqlAlchemyRepository
+from music.adapters.orm import metadata, map_model_to_tables
+from music.domainmodel.user import User
+from music.domainmodel.review import Review
+from benchmarks.synthetic import make_catalog, report
+
+WORKER_COUNTS = [1, 4, 8]
+NUMBER_OF_TRACKS = 20_000
+REQUESTS_PER_WORKER = 200
+
+
+def request_urls(number_of_requests: int) -> list:
+    # Detail pages of tracks with reviews, genre searches and album pages, in turn.
+    urls = []
+    for request_index in range(number_of_requests):
+        track_id = request_index * 7919 % NUMBER_OF_TRACKS
+        urls.append([
+            f'/track_detail?track_id={track_id}',
+            f'/search_tracks?page={request_index % 5}&search_key=genre&text=rock',
+            f'/album_detail?album_id={track_id // 10}',
+        ][request_index % 3])
+    return urls
+
+
+def requests_per_second(app, number_of_workers: int) -> float:
+    def work():
+        client = app.test_client()
+        for url in request_urls(REQUESTS_PER_WORKER):
+            assert client.get(url).status_code == 200
+
+    workers = [threading.Thread(target=work) for _ in range(number_of_workers)]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return number_of_workers * REQUESTS_PER_WORKER / (time.perf_counter() - start)
+
+
+def populate(database_uri: str):
+    engine = create_database_engine(database_uri)
+    metadata.create_all(engine)
+    map_model_to_tables()
+    repo = SqlAlchemyRepository(sessionmaker(bind=engine))
+    catalog = make_catalog(NUMBER_OF_TRACKS)
+    repo.add_catalog(catalog['albums'], catalog['artists'], catalog['genres'], catalog['tracks'])
+
+    # A few reviews on every track that the detail requests read.
+    users = [User(f'user{user_index}', 'Password1') for user_index in range(3)]
+    for user in users:
+        repo.add_user(user)
+    for track_id in set(int(url.split('=')[1]) for url in request_urls(REQUESTS_PER_WORKER)
+                        if url.startswith('/track_detail')):
+        for user in users:
+            review = Review(repo.get_track(track_id), f'Review by {user.user_name}', 4)
+            review.user = user
+            repo.add_review(review)
+    repo.close_session()
+    engine.dispose()
+    clear_mappers()
+
+
+def make_app(database_uri: str, async_database: bool):
+    clear_mappers()
+    return create_app({
+        'REPOSITORY': 'database',
+        'SQLALCHEMY_DATABASE_URI': database_uri,
+        'ASYNC_DATABASE': async_database,
+        'TEST_DATA_PATH': None,
+        'WTF_CSRF_ENABLED': False,
+    })
+
+
+if __name__ == '__main__':
+    worker_counts = [int(arg) for arg in sys.argv[1:]] or WORKER_COUNTS
+    with tempfile.TemporaryDirectory() as directory:
+        database_uri = f'sqlite:///{Path(directory) / "benchmark.db"}'
+        populate(database_uri)
+
+        # The repositories are global, so one app is measured at a time.
+        sync_app = make_app(database_uri, async_database=False)
+        sync_rates = [requests_per_second(sync_app, workers) for workers in worker_counts]
+        async_app = make_app(database_uri, async_database=True)
+        async_rates = [requests_per_second(async_app, workers) for workers in worker_counts]
+
+    rows = [(workers, sync_rate, async_rate, async_rate / sync_rate)
+            for workers, sync_rate, async_rate in zip(worker_counts, sync_rates, async_rates)]
+    report(f'Requests per second of the sync and async views ({NUMBER_OF_TRACKS} tracks)', rows,
+           ('workers', 'sync (req/s)', 'async (req/s)', 'async / sync'))
@@ -0,0 +1,94 @@
+"""Benchmark of the peak memory of populating a database file from tracks csv files of growing size.
+
+Run from the project root, optionally with the numbers of csv rows to measure:
+    python -m benchmarks.csv_populate
+    python -m benchmarks.csv_populate 20000 200000
+
+The tracks csv files repeat the rows of the tracks excerpt under new track ids. Each population runs in a new
+process, whose peak resident set size is reported. Reading the whole file holds every row and track in memory
+before adding them, while streaming it holds a batch of POPULATE_BATCH_SIZE tracks.
+"""
+import csv
+import multiprocessing
+import resource
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from sqlalchemy.orm import sessionmaker
+
+from music.adapters.csvdatareader import TrackCSVReader
+from music.adapters.database_engine import create_database_engine
+from music.adapters.database_repository import SqlAlchemyRepository
+from music.adapters.orm import metadata, map_model_to_tables
+from music.adapters.repository_populate import populate_repository
+from benchmarks.synthetic import report
+
+DATA_PATH = Path('music') / 'adapters' / 'data'
+ROW_COUNTS = [20_000, 80_000, 320_000]
+POPULATE_BATCH_SIZE = 10_000
+
+
+def write_tracks_csv(path: Path, number_of_rows: int):
+    # The file is written with the encoding it is read with, so that its rows read back the same.
+    with open(DATA_PATH / 'raw_tracks_excerpt.csv', encoding='unicode_escape') as excerpt_csv:
+        reader = csv.DictReader(excerpt_csv)
+        fieldnames = reader.fieldnames
+        excerpt_rows = list(reader)
+
+    with open(path, 'w', encoding='unicode_escape', newline='') as tracks_csv:
+        writer = csv.DictWriter(tracks_csv, fieldnames)
+        writer.writeheader()
+        for track_id in range(1, number_of_rows + 1):
+            writer.writerow(dict(excerpt_rows[track_id % len(excerpt_rows)], track_id=track_id))
+
+
+def populate_in_process(tracks_csv_file: str, database_file: str, batch_size: int, results):
+    # Runs in a new process, so that its peak resident set size is that of this population alone.
+    engine = create_database_engine(f'sqlite:///{database_file}')
+    metadata.create_all(engine)
+    map_model_to_tables()
+    repo = SqlAlchemyRepository(sessionmaker(bind=engine), reference_cache=False)
+    reader = TrackCSVReader(str(DATA_PATH / 'raw_albums_excerpt.csv'), tracks_csv_file)
+
+    start = time.perf_counter()
+    populate_repository(reader, repo, batch_size)
+    elapsed = time.perf_counter() - start
+
+    number_of_tracks = repo.get_number_of_tracks()
+    repo.close_session()
+    engine.dispose()
+    # ru_maxrss is in kilobytes on Linux.
+    results.put((number_of_tracks, elapsed, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024))
+
+
+def populate_peak(directory: Path, tracks_csv_file: Path, batch_size: int) -> tuple:
+    database_file = directory / f'music-{batch_size}.db'
+    database_file.unlink(missing_ok=True)
+    context = multiprocessing.get_context('spawn')
+    results = context.Queue()
+    process = context.Process(target=populate_in_process,
+                              args=(str(tracks_csv_file), str(database_file), batch_size, results))
+    process.start()
+    result = results.get()
+    process.join()
+    return result
+
+
+def bench_csv_populate(directory: Path, number_of_rows: int) -> tuple:
+    tracks_csv_file = directory / f'raw_tracks_{number_of_rows}.csv'
+    write_tracks_csv(tracks_csv_file, number_of_rows)
+    whole_tracks, whole_seconds, whole_mb = populate_peak(directory, tracks_csv_file, 0)
+    batch_tracks, batch_seconds, batch_mb = populate_peak(directory, tracks_csv_file, POPULATE_BATCH_SIZE)
+    assert whole_tracks == batch_tracks == number_of_rows
+    tracks_csv_file.unlink()
+    return number_of_rows, whole_seconds, batch_seconds, whole_mb, batch_mb
+
+
+if __name__ == '__main__':
+    sizes = [int(arg) for arg in sys.argv[1:]] or ROW_COUNTS
+    with tempfile.TemporaryDirectory() as directory:
+        rows = [bench_csv_populate(Path(directory), size) for size in sizes]
+    report(f'Population of a database file from the tracks csv file, whole and in batches of {POPULATE_BATCH_SIZE}',
+           rows, ('csv rows', 'whole (s)', 'batches (s)', 'whole (MB)', 'batches (MB)'))
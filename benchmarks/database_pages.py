@@ -0,0 +1,59 @@
+"""Benchmark for the offset and keyset (cursor) pages of the SqlAlchemyRepository.
+
+Run from the project root, optionally with the catalog sizes to measure:
+    python -m benchmarks.database_pages
+    python -m benchmarks.database_pages 100000 1000000
+
+The catalog rows are inserted with Core executemany, so that large catalogs load quickly.
+"""
+import sys
+import time
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker, clear_mappers
+
+from music.adapters.database_repository import SqlAlchemyRepository
+from music.adapters.orm import metadata, map_model_to_tables, tracks_table
+from music.adapters.utils import title_sort_key
+from benchmarks.synthetic import make_catalog, report
+
+CATALOG_SIZES = [10_000, 100_000]
+PAGE_SIZE = 10
+REPEATS = 20
+
+
+def page_ms(fetch_page) -> float:
+    # Mean cost of fetching one page, in milliseconds.
+    start = time.perf_counter()
+    for _ in range(REPEATS):
+        fetch_page()
+    return (time.perf_counter() - start) / REPEATS * 1000
+
+
+def bench_pages(number_of_tracks: int) -> tuple:
+    clear_mappers()
+    engine = create_engine('sqlite://')
+    metadata.create_all(engine)
+    map_model_to_tables()
+    with engine.begin() as connection:
+        connection.execute(tracks_table.insert(), [
+            {'track_id': track.track_id, 'title': track.title} for track in make_catalog(number_of_tracks)['tracks']])
+    repo = SqlAlchemyRepository(sessionmaker(bind=engine))
+
+    last_offset = (number_of_tracks - 1) // PAGE_SIZE * PAGE_SIZE
+    # Key of the track before the last page, which a cursor of the last page seeks from.
+    before_last = repo.get_tracks_page(last_offset - 1, 1)[0]
+    before_last_key = title_sort_key(before_last.title, before_last.track_id)
+
+    return (number_of_tracks,
+            page_ms(lambda: repo.get_tracks_page(0, PAGE_SIZE)),
+            page_ms(lambda: repo.get_tracks_page(last_offset, PAGE_SIZE)),
+            page_ms(lambda: repo.get_tracks_after(before_last_key, PAGE_SIZE)),
+            page_ms(lambda: repo.get_tracks_before(None, PAGE_SIZE)))
+
+
+if __name__ == '__main__':
+    sizes = [int(arg) for arg in sys.argv[1:]] or CATALOG_SIZES
+    rows = [bench_pages(size) for size in sizes]
+    report('SqlAlchemyRepository track pages', rows,
+           ('tracks', 'offset 0 (ms)', 'offset end (ms)', 'seek end (ms)', 'seek back (ms)'))
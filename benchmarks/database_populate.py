@@ -0,0 +1,50 @@
+"""Benchmark for populating an empty database with the SqlAlchemyRepository.
+
+Run from the project root, optionally with the catalog sizes to measure:
+    python -m benchmarks.database_populate
+    python -m benchmarks.database_populate 50000
+
+Merging each entity issues a SELECT before its INSERT, the bulk path inserts the rows with executemany.
+"""
+import sys
+import time
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker, clear_mappers
+
+from music.adapters.database_repository import SqlAlchemyRepository
+from music.adapters.repository import AbstractRepository
+from music.adapters.orm import metadata, map_model_to_tables
+from benchmarks.synthetic import make_catalog, report
+
+CATALOG_SIZES = [1_000, 10_000]
+
+
+def populate_seconds(number_of_tracks: int, add_catalog) -> float:
+    clear_mappers()
+    engine = create_engine('sqlite://')
+    metadata.create_all(engine)
+    map_model_to_tables()
+    repo = SqlAlchemyRepository(sessionmaker(bind=engine))
+    catalog = make_catalog(number_of_tracks)
+
+    start = time.perf_counter()
+    add_catalog(repo, catalog['albums'], catalog['artists'], catalog['genres'], catalog['tracks'])
+    elapsed = time.perf_counter() - start
+
+    assert repo.get_number_of_tracks() == number_of_tracks
+    engine.dispose()
+    return elapsed
+
+
+def bench_populate(number_of_tracks: int) -> tuple:
+    merge_seconds = populate_seconds(number_of_tracks, AbstractRepository.add_catalog)
+    bulk_seconds = populate_seconds(number_of_tracks, SqlAlchemyRepository.add_catalog)
+    return number_of_tracks, merge_seconds, bulk_seconds, merge_seconds / bulk_seconds
+
+
+if __name__ == '__main__':
+    sizes = [int(arg) for arg in sys.argv[1:]] or CATALOG_SIZES
+    rows = [bench_populate(size) for size in sizes]
+    report('SqlAlchemyRepository population of an empty database', rows,
+           ('tracks', 'merge (s)', 'bulk (s)', 'speedup'))
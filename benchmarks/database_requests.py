@@ -0,0 +1,57 @@
+"""Benchmark for the connection setup overhead of each request to the SqlAlchemyRepository.
+
+Run from the project root, optionally with the number of requests to simulate:
+    python -m benchmarks.database_requests
+    python -m benchmarks.database_requests 5000
+
+Each simulated request reads a track by id, then removes its session as the Flask teardown does.
+With the null pool every request opens and closes an SQLite connection, with the queue pool it reuses one.
+"""
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from sqlalchemy.orm import sessionmaker, clear_mappers
+
+from music.adapters.database_engine import create_database_engine
+from music.adapters.database_repository import SqlAlchemyRepository
+from music.adapters.orm import metadata, map_model_to_tables, tracks_table
+from benchmarks.synthetic import make_catalog, report
+
+NUMBER_OF_REQUESTS = 2000
+NUMBER_OF_TRACKS = 1000
+POOL_MODES = ['null', 'queue']
+
+
+def bench_requests(database_uri: str, pool_mode: str, number_of_requests: int) -> tuple:
+    engine = create_database_engine(database_uri, pool_mode=pool_mode)
+    repo = SqlAlchemyRepository(sessionmaker(bind=engine))
+
+    start = time.perf_counter()
+    for request_index in range(number_of_requests):
+        repo.get_track(request_index % NUMBER_OF_TRACKS)
+        repo.close_session()
+    request_us = (time.perf_counter() - start) / number_of_requests * 1_000_000
+
+    engine.dispose()
+    return pool_mode, type(engine.pool).__name__, request_us
+
+
+if __name__ == '__main__':
+    number_of_requests = int(sys.argv[1]) if len(sys.argv) > 1 else NUMBER_OF_REQUESTS
+    with tempfile.TemporaryDirectory() as directory:
+        database_uri = f'sqlite:///{Path(directory) / "benchmark.db"}'
+        engine = create_database_engine(database_uri)
+        metadata.create_all(engine)
+        with engine.begin() as connection:
+            connection.execute(tracks_table.insert(), [
+                {'track_id': track.track_id, 'title': track.title}
+                for track in make_catalog(NUMBER_OF_TRACKS)['tracks']])
+        engine.dispose()
+
+        clear_mappers()
+        map_model_to_tables()
+        rows = [bench_requests(database_uri, pool_mode, number_of_requests) for pool_mode in POOL_MODES]
+    report(f'SqlAlchemyRepository requests on an SQLite file ({number_of_requests} requests)', rows,
+           ('pool mode', 'pool', 'request (us)'))
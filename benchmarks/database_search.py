@@ -0,0 +1,53 @@
+"""Benchmark for the FTS5 track searches of the SqlAlchemyRepository.
+
+Run from the project root, optionally with the catalog sizes to measure:
+    python -m benchmarks.database_search
+    python -m benchmarks.database_search 10000 50000
+
+Each search is compared with the LIKE substring search, used when SQLite has no FTS5.
+"""
+import sys
+import time
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker, clear_mappers
+
+from music.adapters.database_repository import SqlAlchemyRepository
+from music.adapters.orm import metadata, map_model_to_tables
+from benchmarks.synthetic import make_catalog, populate_synthetic, report
+
+CATALOG_SIZES = [10_000, 50_000]
+QUERIES = [('title', 'electric'), ('title', 'ghost riv'), ('artist', 'summer'), ('genre', 'rock')]
+PAGE_SIZE = 10
+
+
+def mean_search_ms(repo, queries) -> float:
+    # Mean cost of counting the results and fetching the first page, in milliseconds.
+    start = time.perf_counter()
+    for search_key, text in queries:
+        search_result = repo.search_tracks(search_key, text)
+        search_result.total
+        search_result.get_tracks(0, PAGE_SIZE)
+    return (time.perf_counter() - start) / len(queries) * 1000
+
+
+def bench_search(number_of_tracks: int) -> tuple:
+    clear_mappers()
+    engine = create_engine('sqlite://')
+    metadata.create_all(engine)
+    map_model_to_tables()
+    session_factory = sessionmaker(autocommit=False, autoflush=True, bind=engine)
+
+    start = time.perf_counter()
+    populate_synthetic(SqlAlchemyRepository(session_factory), make_catalog(number_of_tracks))
+    populate_s = time.perf_counter() - start
+
+    fts_ms = mean_search_ms(SqlAlchemyRepository(session_factory), QUERIES)
+    like_ms = mean_search_ms(SqlAlchemyRepository(session_factory, full_text_search=False), QUERIES)
+    return number_of_tracks, populate_s, fts_ms, like_ms
+
+
+if __name__ == '__main__':
+    sizes = [int(arg) for arg in sys.argv[1:]] or CATALOG_SIZES
+    rows = [bench_search(size) for size in sizes]
+    report('SqlAlchemyRepository search', rows, ('tracks', 'populate (s)', 'fts5 (ms)', 'like (ms)'))
@@ -0,0 +1,41 @@
+"""Benchmark for primary-key lookups in the MemoryRepository.
+
+Run from the project root:
+    python -m benchmarks.memory_lookups
+
+The lookup cost should stay flat as the catalog grows.
+"""
+import random
+import timeit
+
+from music.adapters.memory_repository import MemoryRepository
+from music.domainmodel.user import User
+from benchmarks.synthetic import make_catalog, populate_synthetic, report
+
+CATALOG_SIZES = [1_000, 10_000, 100_000]
+LOOKUPS = 10_000
+
+
+def bench_lookups(number_of_tracks: int) -> tuple:
+    repo = MemoryRepository()
+    catalog = make_catalog(number_of_tracks)
+    populate_synthetic(repo, catalog)
+    for index in range(number_of_tracks // 100):
+        repo.add_user(User(f'user{index}', 'Password1'))
+
+    rng = random.Random(1)
+    track_ids = [rng.randrange(number_of_tracks) for _ in range(LOOKUPS)]
+    album_ids = [rng.randrange(len(catalog['albums'])) for _ in range(LOOKUPS)]
+    user_names = [f' User{rng.randrange(number_of_tracks // 100)} ' for _ in range(LOOKUPS)]
+
+    # Mean cost of one lookup in microseconds.
+    track_us = timeit.timeit(lambda: [repo.get_track(i) for i in track_ids], number=1) / LOOKUPS * 1e6
+    album_us = timeit.timeit(lambda: [repo.get_album(i) for i in album_ids], number=1) / LOOKUPS * 1e6
+    user_us = timeit.timeit(lambda: [repo.get_user(n) for n in user_names], number=1) / LOOKUPS * 1e6
+    return number_of_tracks, track_us, album_us, user_us
+
+
+if __name__ == '__main__':
+    rows = [bench_lookups(size) for size in CATALOG_SIZES]
+    report('MemoryRepository lookups (microseconds per call)', rows,
+           ('tracks', 'get_track', 'get_album', 'get_user'))
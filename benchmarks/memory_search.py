@@ -0,0 +1,49 @@
+"""Benchmark for the trigram indexed track searches of the MemoryRepository.
+
+Run from the project root, optionally with the catalog sizes to measure:
+    python -m benchmarks.memory_search
+    python -m benchmarks.memory_search 10000 100000
+
+Each search is compared with the linear scan it replaces.
+"""
+import sys
+import time
+
+from music.adapters.memory_repository import MemoryRepository
+from music.adapters.utils import search_string
+from benchmarks.synthetic import make_catalog, populate_synthetic, report
+
+CATALOG_SIZES = [10_000, 100_000, 1_000_000]
+QUERIES = ['electric', 'ghost riv', 'xyz', 'mpi']
+
+
+def scan_by_title(tracks, text):
+    return [track for track in tracks if search_string(track.title, text)]
+
+
+def bench_search(number_of_tracks: int) -> tuple:
+    catalog = make_catalog(number_of_tracks)
+    repo = MemoryRepository()
+    start = time.perf_counter()
+    populate_synthetic(repo, catalog)
+    build_s = time.perf_counter() - start
+    tracks = repo.get_tracks()
+
+    # Mean cost of one query in milliseconds.
+    start = time.perf_counter()
+    for text in QUERIES:
+        repo.search_tracks_by_title(text)
+    index_ms = (time.perf_counter() - start) / len(QUERIES) * 1000
+
+    start = time.perf_counter()
+    for text in QUERIES:
+        scan_by_title(tracks, text)
+    scan_ms = (time.perf_counter() - start) / len(QUERIES) * 1000
+
+    return number_of_tracks, build_s, index_ms, scan_ms
+
+
+if __name__ == '__main__':
+    sizes = [int(arg) for arg in sys.argv[1:]] or CATALOG_SIZES
+    rows = [bench_search(size) for size in sizes]
+    report('MemoryRepository search by title', rows, ('tracks', 'populate (s)', 'index (ms)', 'scan (ms)'))
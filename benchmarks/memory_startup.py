@@ -0,0 +1,32 @@
+"""Benchmark for populating the MemoryRepository at startup.
+
+Run from the project root, optionally with the catalog sizes to measure:
+    python -m benchmarks.memory_startup
+    python -m benchmarks.memory_startup 50000 100000 200000
+
+The time per track should stay roughly the same as the catalog grows, as loading is linear.
+"""
+import sys
+import time
+
+from music.adapters.memory_repository import MemoryRepository
+from benchmarks.synthetic import make_catalog, populate_synthetic, report
+
+CATALOG_SIZES = [25_000, 50_000, 100_000, 200_000, 400_000]
+
+
+def bench_startup(number_of_tracks: int) -> tuple:
+    catalog = make_catalog(number_of_tracks)
+    repo = MemoryRepository()
+
+    start = time.perf_counter()
+    populate_synthetic(repo, catalog)
+    elapsed_s = time.perf_counter() - start
+
+    return number_of_tracks, elapsed_s, elapsed_s / number_of_tracks * 1e6
+
+
+if __name__ == '__main__':
+    sizes = [int(arg) for arg in sys.argv[1:]] or CATALOG_SIZES
+    rows = [bench_startup(size) for size in sizes]
+    report('MemoryRepository population', rows, ('tracks', 'total (s)', 'per track (us)'))
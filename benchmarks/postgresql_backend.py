@@ -0,0 +1,85 @@
+"""Benchmark of the SqlAlchemyRepository on PostgreSQL against SQLite.
+
+Run from the project root with the URI of an empty PostgreSQL database, whose tables are dropped and created,
+optionally with the catalog sizes to measure:
+    python -m benchmarks.postgresql_backend postgresql://postgres@localhost/music_bench
+    python -m benchmarks.postgresql_backend postgresql://postgres@localhost/music_bench 100000
+
+The searches are the substring searches, which SQLite runs as LIKE over every row, and PostgreSQL as ILIKE
+on the pg_trgm indexes. The SQLite FTS5 search is measured too, for reference.
+"""
+import sys
+import time
+
+from sqlalchemy.orm import sessionmaker, clear_mappers, close_all_sessions
+
+from music.adapters.database_engine import create_database_engine
+from music.adapters.database_repository import SqlAlchemyRepository
+from music.adapters.orm import metadata, map_model_to_tables
+from music.tracks import services as tracks_services
+from benchmarks.synthetic import make_catalog, report
+
+CATALOG_SIZES = [10_000, 100_000]
+PAGE_SIZE = 10
+REPEATS = 50
+
+REQUESTS = {
+    'title search': lambda repo: tracks_services.get_tracks_for_search_page('title', 'ghost riv', 0, PAGE_SIZE, repo),
+    'artist search': lambda repo: tracks_services.get_tracks_for_search_page('artist', 'storm', 0, PAGE_SIZE, repo),
+    'album search': lambda repo: tracks_services.get_tracks_for_search_page('album', 'golden', 0, PAGE_SIZE, repo),
+    'tracks page': lambda repo: tracks_services.get_tracks_for_page(100, PAGE_SIZE, repo),
+    'track detail': lambda repo: tracks_services.get_track(1234, repo),
+}
+
+
+def request_ms(repo, request) -> float:
+    # Mean cost of one request in a new session, in milliseconds.
+    request(repo)
+    start = time.perf_counter()
+    for _ in range(REPEATS):
+        repo.reset_session()
+        request(repo)
+    return (time.perf_counter() - start) / REPEATS * 1000
+
+
+def populated_engine(database_uri: str, number_of_tracks: int):
+    clear_mappers()
+    engine = create_database_engine(database_uri)
+    metadata.drop_all(engine)
+    metadata.create_all(engine)
+    map_model_to_tables()
+    # The entities of the catalog are created once their classes are mapped.
+    catalog = make_catalog(number_of_tracks)
+    repo = SqlAlchemyRepository(sessionmaker(bind=engine))
+    repo.add_catalog(catalog['albums'], catalog['artists'], catalog['genres'], catalog['tracks'])
+    repo.close_session()
+    if engine.dialect.name == 'postgresql':
+        with engine.connect() as connection:
+            connection.execution_options(isolation_level='AUTOCOMMIT').exec_driver_sql('VACUUM ANALYZE')
+    return engine
+
+
+def bench_backends(postgres_uri: str, number_of_tracks: int) -> list:
+    timings = {}
+    for backend, database_uri, full_text_search in (('sqlite fts5', 'sqlite://', True),
+                                                    ('sqlite', 'sqlite://', False),
+                                                    ('postgresql', postgres_uri, False)):
+        engine = populated_engine(database_uri, number_of_tracks)
+        repo = SqlAlchemyRepository(sessionmaker(bind=engine), full_text_search=full_text_search)
+        timings[backend] = {name: request_ms(repo, request) for name, request in REQUESTS.items()}
+        close_all_sessions()
+        metadata.drop_all(engine)
+        engine.dispose()
+
+    return [(number_of_tracks, name, timings['sqlite fts5'][name], timings['sqlite'][name],
+             timings['postgresql'][name], timings['sqlite'][name] / timings['postgresql'][name])
+            for name in REQUESTS]
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2:
+        sys.exit(__doc__)
+    sizes = [int(arg) for arg in sys.argv[2:]] or CATALOG_SIZES
+    rows = [row for size in sizes for row in bench_backends(sys.argv[1], size)]
+    report('SqlAlchemyRepository requests on SQLite and PostgreSQL', rows,
+           ('tracks', 'request', 'sqlite fts5 (ms)', 'sqlite (ms)', 'postgresql (ms)', 'sqlite/pg'))
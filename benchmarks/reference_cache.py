@@ -0,0 +1,69 @@
+"""Benchmark for the reference data cache of albums, artists and genres of the SqlAlchemyRepository.
+
+Run from the project root, optionally with the catalog sizes to measure:
+    python -m benchmarks.reference_cache
+    python -m benchmarks.reference_cache 100000
+
+Each request starts a new session, as the views do. Without the cache, a page of tracks joins their album
+and artist and selects their genres, and the genre search selects the genre vocabulary first.
+"""
+import sys
+import time
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker, clear_mappers
+
+from music.adapters.database_repository import SqlAlchemyRepository
+from music.adapters.orm import metadata, map_model_to_tables
+from music.tracks import services as tracks_services
+from benchmarks.synthetic import make_catalog, report
+
+CATALOG_SIZES = [10_000, 100_000]
+PAGE_SIZE = 10
+REPEATS = 200
+
+REQUESTS = {
+    'tracks page': lambda repo: tracks_services.get_tracks_for_page(50, PAGE_SIZE, repo),
+    'album detail': lambda repo: (repo.get_album(7), tracks_services.tracks_to_dicts(repo.get_tracks_by_album(7))),
+    'genre search': lambda repo: tracks_services.get_tracks_for_search_page('genre', 'rock', 5, PAGE_SIZE, repo),
+}
+
+
+def request_ms(repo, request) -> float:
+    # Mean cost of one request in a new session, in milliseconds.
+    request(repo)
+    start = time.perf_counter()
+    for _ in range(REPEATS):
+        repo.reset_session()
+        request(repo)
+    return (time.perf_counter() - start) / REPEATS * 1000
+
+
+def bench_reference_cache(number_of_tracks: int) -> list:
+    clear_mappers()
+    engine = create_engine('sqlite://')
+    metadata.create_all(engine)
+    map_model_to_tables()
+    session_factory = sessionmaker(bind=engine)
+    catalog = make_catalog(number_of_tracks)
+    SqlAlchemyRepository(session_factory).add_catalog(
+        catalog['albums'], catalog['artists'], catalog['genres'], catalog['tracks'])
+
+    # The genre search of the full-text index does not use the genre vocabulary, so the substring search is used.
+    uncached_repo = SqlAlchemyRepository(session_factory, full_text_search=False, reference_cache=False)
+    cached_repo = SqlAlchemyRepository(session_factory, full_text_search=False)
+
+    rows = []
+    for name, request in REQUESTS.items():
+        uncached_ms = request_ms(uncached_repo, request)
+        cached_ms = request_ms(cached_repo, request)
+        rows.append((number_of_tracks, name, uncached_ms, cached_ms, uncached_ms / cached_ms))
+    engine.dispose()
+    return rows
+
+
+if __name__ == '__main__':
+    sizes = [int(arg) for arg in sys.argv[1:]] or CATALOG_SIZES
+    rows = [row for size in sizes for row in bench_reference_cache(size)]
+    report('SqlAlchemyRepository requests without and with the reference data cache', rows,
+           ('tracks', 'request', 'uncached (ms)', 'cached (ms)', 'speedup'))
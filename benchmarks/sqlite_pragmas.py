@@ -0,0 +1,105 @@
+"""Benchmark for the SQLite pragma presets of the database engine.
+
+Run from the project root, optionally with the number of tracks to load:
+    python -m benchmarks.sqlite_pragmas
+    python -m benchmarks.sqlite_pragmas 200000
+
+Bulk population inserts the tracks in many small transactions, as the repository commits each batch.
+Serving runs reader threads that look up tracks while a writer thread keeps committing reviews,
+which is what browse requests see while reviews are added.
+"""
+import random
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+from sqlalchemy import select
+from sqlalchemy.exc import OperationalError
+
+from music.adapters.database_engine import create_database_engine, sqlite_pragmas
+from music.adapters.orm import metadata, tracks_table, reviews_table
+from benchmarks.synthetic import make_catalog, report
+
+NUMBER_OF_TRACKS = 50_000
+ROWS_PER_TRANSACTION = 100
+PRESETS = ['default', 'serving', 'bulk_load']
+READER_THREADS = 4
+SERVING_SECONDS = 2.0
+
+
+def bench_bulk_load(database_uri: str, preset: str, tracks: list) -> float:
+    engine = create_database_engine(database_uri, sqlite_pragmas=sqlite_pragmas(preset))
+    metadata.create_all(engine)
+    rows = [{'track_id': track.track_id, 'title': track.title} for track in tracks]
+
+    start = time.perf_counter()
+    for batch_start in range(0, len(rows), ROWS_PER_TRANSACTION):
+        with engine.begin() as connection:
+            connection.execute(tracks_table.insert(), rows[batch_start:batch_start + ROWS_PER_TRANSACTION])
+    load_s = time.perf_counter() - start
+
+    engine.dispose()
+    return load_s
+
+
+def bench_serving(database_uri: str, preset: str, number_of_tracks: int) -> tuple:
+    engine = create_database_engine(database_uri, pool_size=READER_THREADS + 1,
+                                     sqlite_pragmas=sqlite_pragmas(preset))
+    stop = threading.Event()
+    counts = {'reads': 0, 'writes': 0, 'errors': 0}
+    lock = threading.Lock()
+
+    def count(name):
+        with lock:
+            counts[name] += 1
+
+    def read():
+        rng = random.Random()
+        while not stop.is_set():
+            try:
+                with engine.connect() as connection:
+                    connection.execute(select(tracks_table.c.title).where(
+                        tracks_table.c.track_id == rng.randrange(number_of_tracks))).all()
+                count('reads')
+            except OperationalError:
+                count('errors')
+
+    def write():
+        while not stop.is_set():
+            try:
+                with engine.begin() as connection:
+                    connection.execute(reviews_table.insert().values(
+                        timestamp=datetime.now(), review_text='Benchmark review', rating=5, track_id=0))
+                count('writes')
+            except OperationalError:
+                count('errors')
+
+    threads = [threading.Thread(target=read) for _ in range(READER_THREADS)] + [threading.Thread(target=write)]
+    for thread in threads:
+        thread.start()
+    time.sleep(SERVING_SECONDS)
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+    engine.dispose()
+    return counts['reads'] / SERVING_SECONDS, counts['writes'] / SERVING_SECONDS, counts['errors']
+
+
+if __name__ == '__main__':
+    number_of_tracks = int(sys.argv[1]) if len(sys.argv) > 1 else NUMBER_OF_TRACKS
+    tracks = make_catalog(number_of_tracks)['tracks']
+
+    rows = []
+    for preset in PRESETS:
+        with tempfile.TemporaryDirectory() as directory:
+            database_uri = f'sqlite:///{Path(directory) / "benchmark.db"}'
+            load_s = bench_bulk_load(database_uri, preset, tracks)
+            reads_per_s, writes_per_s, errors = bench_serving(database_uri, preset, number_of_tracks)
+        rows.append((preset, load_s, reads_per_s, writes_per_s, errors))
+
+    report(f'SQLite pragma presets ({number_of_tracks} tracks, {ROWS_PER_TRANSACTION} rows per transaction)', rows,
+           ('preset', 'bulk load (s)', 'reads/s', 'writes/s', 'lock errors'))
@@ -0,0 +1,72 @@
+"""Micro-benchmark for the prepared single-row statements of the SqlAlchemyRepository.
+
+Run from the project root:
+    python -m benchmarks.statement_cache
+
+Each read is executed once with a statement built for the call, as before, and once with the prepared
+statement that the repository reuses. Both hit the compiled statement cache of the engine, but a statement
+built for the call is constructed and traversed for its cache key on every call.
+"""
+import time
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker, clear_mappers
+
+from music.adapters.database_engine import StatementCacheStatistics
+from music.adapters.database_repository import SqlAlchemyRepository, PREPARED_STATEMENTS, PreparedStatements
+from music.adapters.orm import metadata, map_model_to_tables
+from music.domainmodel.user import User
+from benchmarks.synthetic import make_catalog, report
+
+NUMBER_OF_TRACKS = 10_000
+REPEATS = 5000
+
+READS = {
+    'get_user': ('user', lambda i: {'user_name': 'denis'}),
+    'get_track': ('track', lambda i: {'track_id': i % NUMBER_OF_TRACKS}),
+    'get_album': ('album', lambda i: {'album_id': i % (NUMBER_OF_TRACKS // 10)}),
+}
+
+
+def read_us(session_factory, statement_of, parameters_of) -> float:
+    # Mean cost of one read in a new session, in microseconds.
+    session = session_factory()
+    start = time.perf_counter()
+    for i in range(REPEATS):
+        session.execute(statement_of(), parameters_of(i)).scalars().first()
+        session.expunge_all()
+    elapsed = time.perf_counter() - start
+    session.close()
+    return elapsed / REPEATS * 1_000_000
+
+
+def bench_statement_cache() -> tuple:
+    clear_mappers()
+    engine = create_engine('sqlite://')
+    metadata.create_all(engine)
+    map_model_to_tables()
+    session_factory = sessionmaker(bind=engine)
+    repo = SqlAlchemyRepository(session_factory)
+    catalog = make_catalog(NUMBER_OF_TRACKS)
+    repo.add_catalog(catalog['albums'], catalog['artists'], catalog['genres'], catalog['tracks'])
+    repo.add_user(User('denis', 'Denis9389'))
+    repo.close_session()
+
+    statistics = StatementCacheStatistics(engine)
+    prepared = PreparedStatements()
+    rows = []
+    for name, (statement_name, parameters_of) in READS.items():
+        build = PREPARED_STATEMENTS[statement_name]
+        built_us = read_us(session_factory, build, parameters_of)
+        prepared_us = read_us(session_factory, lambda: prepared[statement_name], parameters_of)
+        rows.append((name, built_us, prepared_us, built_us / prepared_us))
+    statistics.close()
+    engine.dispose()
+    return rows, statistics
+
+
+if __name__ == '__main__':
+    rows, statistics = bench_statement_cache()
+    report(f'SqlAlchemyRepository single-row reads of {NUMBER_OF_TRACKS} tracks', rows,
+           ('read', 'built (us)', 'prepared (us)', 'speedup'))
+    print(statistics)
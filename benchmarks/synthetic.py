@@ -0,0 +1,55 @@
+import random
+from typing import List
+
+from music.domainmodel.artist import Artist
+from music.domainmodel.album import Album
+from music.domainmodel.track import Track
+from music.domainmodel.genre import Genre
+
+WORDS = ['love', 'night', 'electric', 'dream', 'city', 'blue', 'fire', 'river', 'ghost', 'summer',
+         'empire', 'song', 'light', 'heart', 'road', 'shadow', 'golden', 'wild', 'echo', 'storm']
+
+GENRE_NAMES = ['Hip-Hop', 'Rock', 'Pop', 'Electronic', 'Folk', 'Jazz', 'Experimental', 'Punk',
+               'Ambient', 'Lo-Fi', 'Techno', 'Soul-RnB', 'Country', 'Blues', 'Classical', 'Noise']
+
+
+def random_title(rng: random.Random) -> str:
+    return ' '.join(rng.choice(WORDS).capitalize() for _ in range(rng.randint(1, 4)))
+
+
+def make_catalog(number_of_tracks: int, seed: int = 235) -> dict:
+    # Builds a synthetic catalog with roughly 10 tracks per album and 20 tracks per artist.
+    rng = random.Random(seed)
+
+    albums = [Album(album_id, random_title(rng)) for album_id in range(max(1, number_of_tracks // 10))]
+    artists = [Artist(artist_id, random_title(rng)) for artist_id in range(max(1, number_of_tracks // 20))]
+    genres = [Genre(genre_id, name) for genre_id, name in enumerate(GENRE_NAMES)]
+
+    tracks: List[Track] = []
+    for track_id in range(number_of_tracks):
+        track = Track(track_id, random_title(rng))
+        track.track_duration = rng.randint(30, 600)
+        track.album = albums[track_id // 10 % len(albums)]
+        track.artist = rng.choice(artists)
+        for genre in rng.sample(genres, rng.randint(0, 2)):
+            track.add_genre(genre)
+        tracks.append(track)
+
+    # Shuffle so that loading the tracks does not get the sorted input for free.
+    rng.shuffle(tracks)
+    return {'albums': albums, 'artists': artists, 'genres': genres, 'tracks': tracks}
+
+
+def populate_synthetic(repo, catalog: dict):
+    repo.add_many_albums(catalog['albums'])
+    repo.add_many_artists(catalog['artists'])
+    repo.add_many_genres(catalog['genres'])
+    repo.add_many_tracks(catalog['tracks'])
+
+
+def report(title: str, rows: List[tuple], headers: tuple):
+    print(title)
+    print(' | '.join(f'{header:>14}' for header in headers))
+    for row in rows:
+        print(' | '.join(f'{value:>14.3f}' if type(value) is float else f'{value:>14}' for value in row))
+    print()
@@ -19,9 +19,74 @@ class Config:
 
     REPOSITORY = environ.get('REPOSITORY')
 
+    # Tracks shown per page when browsing and searching tracks.
+    TRACKS_PER_PAGE = int(environ.get('TRACKS_PER_PAGE', 10))
+    # Albums shown per page when browsing albums.
+    ALBUMS_PER_PAGE = int(environ.get('ALBUMS_PER_PAGE', 10))
+
+    # The tracks csv file is streamed into the repository in batches of this many tracks, so that populating
+    # the repository does not hold every row of the file in memory. 0 reads the whole file before adding it.
+    POPULATE_BATCH_SIZE = int(environ.get('POPULATE_BATCH_SIZE', 10000))
+
+    # Memory repository configuration.
+    # With snapshot reads, readers get immutable versioned snapshots and writers publish new versions,
+    # so that the repository is safe to share between the threads of a gthread worker.
+    snapshot_reads_string = environ.get('MEMORY_SNAPSHOT_READS', 'False')
+    MEMORY_SNAPSHOT_READS = snapshot_reads_string.lower().strip() == 'true'
+
+    # Directory of the journal that keeps the users and reviews of the memory repository across restarts.
+    # The journal is disabled if it is not set.
+    MEMORY_JOURNAL_PATH = environ.get('MEMORY_JOURNAL_PATH')
+    # The journal file is fsynced after this many records or seconds, whichever comes first. A background thread
+    # fsyncs the records left unsynced every interval, so a record never waits for the next write.
+    MEMORY_JOURNAL_FSYNC_BATCH = int(environ.get('MEMORY_JOURNAL_FSYNC_BATCH', 16))
+    MEMORY_JOURNAL_FSYNC_INTERVAL = float(environ.get('MEMORY_JOURNAL_FSYNC_INTERVAL', 1.0))
+    # The journal is compacted into a snapshot after this many records.
+    MEMORY_JOURNAL_COMPACT_AFTER = int(environ.get('MEMORY_JOURNAL_COMPACT_AFTER', 1000))
+
     # Database configuration
     SQLALCHEMY_DATABASE_URI = environ.get('SQLALCHEMY_DATABASE_URI')
 
+    # Connection pool of the database engine: 'auto', 'null', 'static' or 'queue'.
+    # 'auto' shares one connection for an in-memory SQLite database, and otherwise keeps a queue pool
+    # of SQLALCHEMY_POOL_SIZE connections reused across requests. 'static' shares a single connection,
+    # so it is only suited to a single-threaded worker. 'null' opens a new connection for every request.
+    SQLALCHEMY_POOL = environ.get('SQLALCHEMY_POOL', 'auto').lower().strip()
+    SQLALCHEMY_POOL_SIZE = int(environ.get('SQLALCHEMY_POOL_SIZE', 5))
+
+    # SQLite pragmas set on each new connection: a preset of music/adapters/database_engine.py,
+    # 'default', 'serving' or 'bulk_load', for serving requests and for populating a new database.
+    SQLITE_PRAGMA_PRESET = environ.get('SQLITE_PRAGMA_PRESET', 'serving').strip()
+    SQLITE_POPULATE_PRAGMA_PRESET = environ.get('SQLITE_POPULATE_PRAGMA_PRESET', 'bulk_load').strip()
+    # Pragmas set in the environment, such as SQLITE_CACHE_SIZE = -131072, override those of the serving preset.
+    SQLITE_PRAGMAS = {
+        name: environ.get(f'SQLITE_{name.upper()}')
+        for name in ('journal_mode', 'synchronous', 'cache_size', 'mmap_size', 'temp_store', 'busy_timeout')
+    }
+
+    # Track search uses the SQLite FTS5 trigram full-text index when it is available, which finds the same tracks
+    # as the substring search and ranks them by bm25. Otherwise, or when it is disabled, it searches with LIKE.
+    full_text_search_string = environ.get('FULL_TEXT_SEARCH', 'True')
+    FULL_TEXT_SEARCH = full_text_search_string.lower().strip() == 'true'
+
+    # The albums, artists and genres are cached across requests by the database repository, and set on the
+    # tracks it loads instead of being joined. The cache of a process is invalidated when it adds any of them,
+    # and each request reads their version in the database, so it also sees those added by another process.
+    reference_cache_string = environ.get('REFERENCE_CACHE', 'True')
+    REFERENCE_CACHE = reference_cache_string.lower().strip() == 'true'
+
+    # Serve the browse, search and detail views of tracks and albums with async views over the asyncio driver
+    # of the database (aiosqlite), so that the queries of a request overlap. Needs flask[async] and aiosqlite,
+    # and a database file, as an in-memory database cannot be shared with the async engine.
+    # The queries of a local SQLite file hardly wait on I/O, so the sync views serve more requests per second,
+    # see benchmarks/async_requests.py.
+    async_database_string = environ.get('ASYNC_DATABASE', 'False')
+    ASYNC_DATABASE = async_database_string.lower().strip() == 'true'
+
+    # Count the hits and misses of the compiled statement cache of the database engine, printed at exit.
+    statement_cache_statistics_string = environ.get('STATEMENT_CACHE_STATISTICS', 'False')
+    STATEMENT_CACHE_STATISTICS = statement_cache_statistics_string.lower().strip() == 'true'
+
     echo_string = environ.get('SQLALCHEMY_ECHO')
     SQLALCHEMY_ECHO = False
     if echo_string.lower().strip() == "true":
@@ -3,13 +3,18 @@ from pathlib import Path
 from flask import Flask
 
 # imports from SQLAlchemy
-from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker, clear_mappers
-from sqlalchemy.pool import NullPool
+
+import atexit
 
 import music.adapters.repository as repo
 from music.adapters import memory_repository, database_repository, repository_populate
+from music.adapters.journal import RepositoryJournal
 from music.adapters.orm import metadata, map_model_to_tables
+from music.adapters.migrations import upgrade_database
+from music.adapters.database_engine import (
+    create_database_engine, sqlite_pragmas, is_in_memory_sqlite, StatementCacheStatistics
+)
 
 
 def create_app(test_config=None):
@@ -29,15 +34,30 @@ def create_app(test_config=None):
         data_path = app.config['TEST_DATA_PATH']
         testing = True
 
+    repo.async_repo_instance = None
+
    # We can easily switch between in memory data and
    # persistent database data storage for our application
    # using the environment variable in .env file.
     if app.config['REPOSITORY'] == 'memory':
         # Create the MemoryRepository implementation for a memory-based repository.
-        repo.repo_instance = memory_repository.MemoryRepository()
+        repo.repo_instance = memory_repository.MemoryRepository(
+            snapshot_reads=app.config['MEMORY_SNAPSHOT_READS'])
         # fill the content of the repository from the provided csv files (has to be done every time we start app!)
         repository_populate.populate(
-            data_path, repo.repo_instance, testing=testing, database_mode=False)
+            data_path, repo.repo_instance, testing=testing, database_mode=False,
+            batch_size=app.config['POPULATE_BATCH_SIZE'])
+
+        # Recover users and reviews from the latest journal snapshot and the journal tail, and keep journaling.
+        if app.config.get('MEMORY_JOURNAL_PATH'):
+            journal = RepositoryJournal(
+                app.config['MEMORY_JOURNAL_PATH'],
+                fsync_batch_size=app.config['MEMORY_JOURNAL_FSYNC_BATCH'],
+                fsync_interval=app.config['MEMORY_JOURNAL_FSYNC_INTERVAL'],
+                compact_after=app.config['MEMORY_JOURNAL_COMPACT_AFTER'])
+            journal.restore(repo.repo_instance)
+            repo.repo_instance.attach_journal(journal)
+            atexit.register(journal.close)
 
     elif app.config['REPOSITORY'] == 'database':
         # Configure database.
@@ -48,16 +68,36 @@ def create_app(test_config=None):
         # leading to a URI of "sqlite:///covid-19.db".
         # Note that create_engine does not establish any actual DB connection directly!
         database_echo = app.config['SQLALCHEMY_ECHO']
-        # Please do not change the settings for connect_args and poolclass!
-        database_engine = create_engine(database_uri, connect_args={"check_same_thread": False}, poolclass=NullPool,
-                                        echo=database_echo)
+        # The connections are pooled and reused across requests, see SQLALCHEMY_POOL in config.py.
+        # The SQLite pragmas of the serving preset are set on each new connection, see SQLITE_PRAGMA_PRESET.
+        database_engine = create_database_engine(
+            database_uri, pool_mode=app.config['SQLALCHEMY_POOL'], pool_size=app.config['SQLALCHEMY_POOL_SIZE'],
+            echo=database_echo,
+            sqlite_pragmas=sqlite_pragmas(app.config['SQLITE_PRAGMA_PRESET'], app.config['SQLITE_PRAGMAS']))
+
+        if app.config['STATEMENT_CACHE_STATISTICS']:
+            statement_cache_statistics = StatementCacheStatistics(database_engine)
+            app.extensions['statement_cache_statistics'] = statement_cache_statistics
+            atexit.register(lambda: print(statement_cache_statistics))
 
         # Create the database session factory using sessionmaker (this has to be done once, in a global manner)
         session_factory = sessionmaker(
             autocommit=False, autoflush=True, bind=database_engine)
         # Create the SQLAlchemy DatabaseRepository instance for an sqlite3-based repository.
         repo.repo_instance = database_repository.SqlAlchemyRepository(
-            session_factory)
+            session_factory, full_text_search=app.config['FULL_TEXT_SEARCH'],
+            reference_cache=app.config['REFERENCE_CACHE'])
+
+        if app.config['ASYNC_DATABASE']:
+            # The async views read the same database through the asyncio driver, see ASYNC_DATABASE in config.py.
+            # They are imported here, so that the sync deployment does not need flask[async] and aiosqlite.
+            from music.adapters.async_database_repository import AsyncSqlAlchemyRepository, async_session_factory
+            from music.adapters.database_engine import create_async_database_engine
+            async_engine = create_async_database_engine(
+                database_uri, echo=database_echo,
+                sqlite_pragmas=sqlite_pragmas(app.config['SQLITE_PRAGMA_PRESET'], app.config['SQLITE_PRAGMAS']))
+            repo.async_repo_instance = AsyncSqlAlchemyRepository(
+                async_session_factory(async_engine), full_text_search=app.config['FULL_TEXT_SEARCH'])
 
         if app.config['TESTING'] == 'True' or len(database_engine.table_names()) == 0:
             print("REPOPULATING DATABASE...")
@@ -72,11 +112,13 @@ def create_app(test_config=None):
             # Generate mappings that map domain model classes to the database tables.
             map_model_to_tables()
 
-            repository_populate.populate(
-                data_path, repo.repo_instance, testing=testing, database_mode=True)
+            populate_database(app, data_path, testing, database_engine, repo.repo_instance)
             print("REPOPULATING DATABASE... FINISHED")
 
         else:
+            # Databases created by earlier versions get the new columns, indexes and full-text index.
+            with database_engine.begin() as connection:
+                upgrade_database(connection)
             # Solely generate mappings that map domain model classes to the database tables.
             map_model_to_tables()
 
@@ -102,18 +144,42 @@ def create_app(test_config=None):
         from .utilities import utilities
         app.register_blueprint(utilities.utilities_blueprint)
 
-        # Register a callback the makes sure that database sessions are associated with http requests
-        # We reset the session inside the database repository before a new flask request is generated
-
-        @app.before_request
-        def before_flask_http_request_function():
-            if isinstance(repo.repo_instance, database_repository.SqlAlchemyRepository):
-                repo.repo_instance.reset_session()
+        # The async views of tracks and albums replace their sync views when the async repository is set.
+        if repo.async_repo_instance is not None:
+            from .tracks import async_tracks
+            async_tracks.register_async_views(app)
+            from .albums import async_albums
+            async_albums.register_async_views(app)
 
         # Register a tear-down method that will be called after each request has been processed.
+        # It removes the database session of the request, so that the next request starts a new session
+        # from the same scoped session registry, and the connection goes back to the pool.
         @app.teardown_appcontext
         def shutdown_session(exception=None):
             if isinstance(repo.repo_instance, database_repository.SqlAlchemyRepository):
                 repo.repo_instance.close_session()
 
     return app
+
+
+def populate_database(app, data_path, testing, database_engine, database_repo):
+    # A database file is populated through its own connections with the pragmas of the bulk population preset.
+    # An in-memory database only exists in the connection of the engine, so it is populated through it.
+    if is_in_memory_sqlite(database_engine.url):
+        repository_populate.populate(data_path, database_repo, testing=testing, database_mode=True,
+                                     batch_size=app.config['POPULATE_BATCH_SIZE'])
+        return
+
+    # Close the serving connections, so that the population connection can change the journal mode.
+    database_engine.dispose()
+    populate_engine = create_database_engine(
+        app.config['SQLALCHEMY_DATABASE_URI'], echo=app.config['SQLALCHEMY_ECHO'],
+        sqlite_pragmas=sqlite_pragmas(app.config['SQLITE_POPULATE_PRAGMA_PRESET']))
+    populate_repo = database_repository.SqlAlchemyRepository(
+        sessionmaker(autocommit=False, autoflush=True, bind=populate_engine), reference_cache=False)
+    try:
+        repository_populate.populate(data_path, populate_repo, testing=testing, database_mode=True,
+                                     batch_size=app.config['POPULATE_BATCH_SIZE'])
+    finally:
+        populate_repo.close_session()
+        populate_engine.dispose()
@@ -0,0 +1,149 @@
+from typing import List
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import sessionmaker
+
+from music.adapters.database_repository import (
+    SqlAlchemyRepository, PreparedStatements, count_statement, tracks_page_statement, tracks_by_album_statement,
+    albums_page_statement, seek_statement, full_text_search_statement, substring_search_statement
+)
+from music.adapters.orm import tracks_table, albums_table, has_full_text_index
+from music.adapters.utils import fts_can_match
+from music.domainmodel.user import User
+from music.domainmodel.album import Album
+from music.domainmodel.track import Track
+from music.domainmodel.review import Review
+from music.domainmodel.genre import Genre
+
+
+def async_session_factory(async_engine):
+    # The entities stay readable after their session is closed, as their relationships are loaded eagerly.
+    return sessionmaker(bind=async_engine, class_=AsyncSession, expire_on_commit=False)
+
+
+class AsyncTrackSearchResult:
+    """ Result of a track search of the AsyncSqlAlchemyRepository. It carries the total number of tracks found,
+    and fetches the tracks only for the requested page window. """
+
+    def __init__(self, total: int, fetch_tracks):
+        # await fetch_tracks(offset, limit) returns the found tracks in the window as a list.
+        self.__total = total
+        self.__fetch_tracks = fetch_tracks
+
+    @property
+    def total(self) -> int:
+        return self.__total
+
+    async def get_tracks(self, offset: int, limit: int) -> List[Track]:
+        if offset >= self.__total or limit <= 0:
+            return []
+        return await self.__fetch_tracks(offset, limit)
+
+
+class AsyncSqlAlchemyRepository:
+    """ Reads of the SqlAlchemyRepository as coroutines, on the SQLAlchemy asyncio extension.
+    Every call runs in a session of its own, so the calls of a request can be awaited together and overlap
+    their queries. The statements and eager loading profiles are those of the SqlAlchemyRepository.
+    Users and reviews are still added through the SqlAlchemyRepository. """
+
+    FTS_COLUMNS = SqlAlchemyRepository.FTS_COLUMNS
+
+    def __init__(self, session_factory, full_text_search: bool = True):
+        self.__session_factory = session_factory
+        # The full-text index is used when it is enabled and exists in the database,
+        # which is only looked up on the first search.
+        self.__full_text_search = full_text_search
+        self.__has_full_text_index = None
+        self.__statements = PreparedStatements()
+
+    async def __scalars(self, statement, parameters: dict = None) -> list:
+        async with self.__session_factory() as session:
+            return (await session.execute(statement, parameters)).scalars().all()
+
+    async def __first(self, statement, parameters: dict = None):
+        async with self.__session_factory() as session:
+            return (await session.execute(statement, parameters)).scalars().first()
+
+    async def __scalar(self, statement):
+        async with self.__session_factory() as session:
+            return (await session.execute(statement)).scalar()
+
+    async def get_user(self, user_name: str) -> User:
+        return await self.__first(self.__statements['user'], {'user_name': user_name.strip().lower()})
+
+    async def get_track(self, track_id: int) -> Track:
+        return await self.__first(self.__statements['track'], {'track_id': track_id})
+
+    async def get_tracks_page(self, offset: int, limit: int, sorting: bool = True) -> List[Track]:
+        return await self.__scalars(tracks_page_statement(offset, limit, sorting))
+
+    async def get_tracks_after(self, key: tuple, limit: int) -> List[Track]:
+        return await self.__seek(Track, tracks_table.c.sort_key, tracks_table.c.track_id, key, limit, before=False)
+
+    async def get_tracks_before(self, key: tuple, limit: int) -> List[Track]:
+        return await self.__seek(Track, tracks_table.c.sort_key, tracks_table.c.track_id, key, limit, before=True)
+
+    async def get_number_of_tracks(self) -> int:
+        return await self.__scalar(count_statement(select(tracks_table.c.track_id)))
+
+    async def get_tracks_by_album(self, album_id: int) -> List[Track]:
+        return await self.__scalars(tracks_by_album_statement(album_id))
+
+    async def get_album(self, album_id: int) -> Album:
+        return await self.__first(self.__statements['album'], {'album_id': album_id})
+
+    async def get_albums_page(self, offset: int, limit: int, sorting: bool = True) -> List[Album]:
+        return await self.__scalars(albums_page_statement(offset, limit, sorting))
+
+    async def get_albums_after(self, key: tuple, limit: int) -> List[Album]:
+        return await self.__seek(Album, albums_table.c.sort_key, albums_table.c.album_id, key, limit, before=False)
+
+    async def get_albums_before(self, key: tuple, limit: int) -> List[Album]:
+        return await self.__seek(Album, albums_table.c.sort_key, albums_table.c.album_id, key, limit, before=True)
+
+    async def get_number_of_albums(self) -> int:
+        return await self.__scalar(count_statement(select(albums_table.c.album_id)))
+
+    async def get_genres(self) -> List[Genre]:
+        return await self.__scalars(select(Genre))
+
+    async def get_reviews_for_track(self, track_id: int) -> List[Review]:
+        return await self.__scalars(self.__statements['reviews_for_track'], {'track_id': track_id})
+
+    async def get_review_for_track_by_user(self, track_id: int, user_name: str) -> Review:
+        if user_name is None:
+            return None
+        return await self.__first(self.__statements['review_for_track_by_user'],
+                                  {'track_id': track_id, 'user_name': user_name.strip().lower()})
+
+    async def search_tracks(self, search_key: str, text: str) -> AsyncTrackSearchResult:
+        # Counting and the LIMIT/OFFSET of the page window are done by the database,
+        # so only the tracks of the page are loaded.
+        statement = await self.__search_tracks_statement(search_key, text)
+        return AsyncTrackSearchResult(
+            await self.__scalar(count_statement(statement)),
+            lambda offset, limit: self.__scalars(statement.offset(offset).limit(limit)))
+
+    async def __seek(self, entity_class, sort_key_column, id_column, key: tuple, limit: int, before: bool) -> list:
+        entities = await self.__scalars(
+            seek_statement(entity_class, sort_key_column, id_column, key, limit, before))
+        if before:
+            entities.reverse()
+        return entities
+
+    async def __uses_full_text_index(self) -> bool:
+        if not self.__full_text_search:
+            return False
+        if self.__has_full_text_index is None:
+            async with self.__session_factory() as session:
+                connection = await session.connection()
+                self.__has_full_text_index = await connection.run_sync(has_full_text_index)
+        return self.__has_full_text_index
+
+    async def __search_tracks_statement(self, search_key: str, text: str):
+        # Statement of the tracks found by the search.
+        if search_key in self.FTS_COLUMNS and fts_can_match(text) and await self.__uses_full_text_index():
+            return full_text_search_statement(self.FTS_COLUMNS[search_key], text)
+        genres = await self.get_genres() if search_key == 'genre' else []
+        return substring_search_statement(search_key, text, genres)
@@ -1,12 +1,16 @@
 import os
 import csv
 import ast
+from typing import Iterator, List, Tuple
 
 from music.domainmodel.artist import Artist
 from music.domainmodel.album import Album
 from music.domainmodel.track import Track
 from music.domainmodel.genre import Genre
 
+# The albums, artists, genres and tracks of a batch of the tracks csv file.
+CatalogBatch = Tuple[List[Album], List[Artist], List[Genre], List[Track]]
+
 
 def create_track_object(track_row):
     track = Track(int(track_row['track_id']), track_row['track_title'])
@@ -57,6 +61,21 @@ def extract_genres(track_row: dict):
     return genres
 
 
+def create_track_from_row(track_row: dict, albums_dict: dict) -> Track:
+    # Builds the track of a csv row with its artist, genres and album, which is looked up by its id.
+    track = create_track_object(track_row)
+    track.artist = create_artist_object(track_row)
+
+    # Extract track_genres attributes and assign genres to the track.
+    for genre in extract_genres(track_row):
+        track.add_genre(genre)
+
+    album_id = int(
+        track_row['album_id']) if track_row['album_id'].isdigit() else None
+    track.album = albums_dict[album_id] if album_id in albums_dict else None
+    return track
+
+
 class TrackCSVReader:
 
     def __init__(self, albums_csv_file: str, tracks_csv_file: str):
@@ -115,55 +134,73 @@ class TrackCSVReader:
 
         return album_dict
 
-    def read_tracks_file(self):
-        if not os.path.exists(self.__tracks_csv_file):
-            print(f"path {self.__tracks_csv_file} does not exist!")
-            return
-        track_rows = []
+    def iter_track_rows(self) -> Iterator[dict]:
+        # Yields the rows of the tracks csv file one by one, so that the file is never held in memory.
         # encoding of unicode_escape is required to decode successfully
         with open(self.__tracks_csv_file, encoding='unicode_escape') as track_csv:
             reader = csv.DictReader(track_csv)
             for track_row in reader:
-                track_rows.append(track_row)
-        return track_rows
+                yield track_row
+
+    def read_tracks_file(self):
+        if not os.path.exists(self.__tracks_csv_file):
+            print(f"path {self.__tracks_csv_file} does not exist!")
+            return
+        return list(self.iter_track_rows())
 
     def read_csv_files(self):
         # key is album_id
         albums_dict: dict = self.read_albums_file_as_dict()
-        # list of track csv rows, not track objects
-        track_rows: list = self.read_tracks_file()
 
         # Make sure re-initialize to empty list, so that calling this function multiple times does not create
         # duplicated dataset.
         self.__dataset_of_tracks = []
-        for track_row in track_rows:
-
-            track = create_track_object(track_row)
-            artist = create_artist_object(track_row)
-            track.artist = artist
-
-            # Extract track_genres attributes and assign genres to the track.
-            track_genres = extract_genres(track_row)
-            for genre in track_genres:
-                track.add_genre(genre)
-
-            album_id = int(
-                track_row['album_id']) if track_row['album_id'].isdigit() else None
+        # Each csv row is turned into a track as it is read, rather than reading all the rows first.
+        for track_row in self.iter_track_rows():
+            track = create_track_from_row(track_row, albums_dict)
 
-            album = albums_dict[album_id] if album_id in albums_dict else None
-            track.album = album
+            # Populate datasets for Artist, Album and Genre
+            self.__dataset_of_artists.add(track.artist)
+            if track.album is not None:
+                self.__dataset_of_albums.add(track.album)
+            self.__dataset_of_genres.update(track.genres)
 
-            # Populate datasets for Artist and Genre
-            if artist not in self.__dataset_of_artists:
-                self.__dataset_of_artists.add(artist)
+            self.__dataset_of_tracks.append(track)
 
-            if album is not None and album not in self.__dataset_of_albums:
-                self.__dataset_of_albums.add(album)
+        return self.__dataset_of_tracks
 
-            for genre in track_genres:
-                if genre not in self.__dataset_of_genres:
-                    self.__dataset_of_genres.add(genre)
+    def read_csv_files_in_batches(self, batch_size: int) -> Iterator[CatalogBatch]:
+        """ Streams the catalog as (albums, artists, genres, tracks) batches of at most batch_size tracks.
+        The albums, artists and genres of a batch are those first referenced by its tracks, so each of them is
+        in a single batch, before or with the tracks of later batches that reference it.
 
-            self.__dataset_of_tracks.append(track)
+        Only the albums file and the ids of the entities already seen are kept in memory, so the datasets of
+        the reader are left empty. """
+        if batch_size < 1:
+            raise ValueError('batch_size should be a positive integer')
 
-        return self.__dataset_of_tracks
+        albums_dict: dict = self.read_albums_file_as_dict()
+        seen_album_ids, seen_artist_ids, seen_genre_ids = set(), set(), set()
+
+        albums, artists, genres, tracks = [], [], [], []
+        for track_row in self.iter_track_rows():
+            track = create_track_from_row(track_row, albums_dict)
+
+            if track.artist.artist_id not in seen_artist_ids:
+                seen_artist_ids.add(track.artist.artist_id)
+                artists.append(track.artist)
+            if track.album is not None and track.album.album_id not in seen_album_ids:
+                seen_album_ids.add(track.album.album_id)
+                albums.append(track.album)
+            for genre in track.genres:
+                if genre.genre_id not in seen_genre_ids:
+                    seen_genre_ids.add(genre.genre_id)
+                    genres.append(genre)
+
+            tracks.append(track)
+            if len(tracks) == batch_size:
+                yield albums, artists, genres, tracks
+                albums, artists, genres, tracks = [], [], [], []
+
+        if tracks:
+            yield albums, artists, genres, tracks
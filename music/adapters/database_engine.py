@@ -0,0 +1,169 @@
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.engine.default import CACHE_HIT, CACHE_MISS
+from sqlalchemy.pool import NullPool, StaticPool, QueuePool
+
+# Pooling modes of the database engine.
+# 'null' opens a new connection for every session, 'static' shares a single connection,
+# 'queue' keeps a pool of connections that each serve one session at a time,
+# and 'auto' chooses the pool of the database backend.
+POOL_MODES = ('auto', 'null', 'static', 'queue')
+
+# Drivers of the SQLAlchemy asyncio extension for the database backends.
+ASYNC_DRIVERS = {'sqlite': 'aiosqlite'}
+
+
+# SQLite pragmas that can be set on each new connection, with presets for serving and for bulk population.
+SQLITE_PRAGMA_NAMES = ('journal_mode', 'synchronous', 'cache_size', 'mmap_size', 'temp_store', 'busy_timeout')
+
+SQLITE_PRAGMA_PRESETS = {
+    # SQLite defaults: rollback journal, full synchronous writes and a 2 MB page cache.
+    'default': {},
+    # Read-heavy serving. With the write-ahead log, readers do not block the writer and the writer
+    # does not block readers, so adding a review does not stall concurrent browse requests.
+    # Synchronous NORMAL only syncs the log at checkpoints, which is safe in WAL mode.
+    'serving': {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'cache_size': -65536,  # 64 MB, negative sizes are in KiB
+        'mmap_size': 268435456,  # 256 MB
+        'temp_store': 'MEMORY',
+        'busy_timeout': 5000,  # ms to wait for a lock instead of failing
+    },
+    # Bulk population of a new database, which is repopulated from the CSV files if it is interrupted,
+    # so writes are not synced at all. The journal stays in WAL mode, which a later serving connection expects.
+    'bulk_load': {
+        'journal_mode': 'WAL',
+        'synchronous': 'OFF',
+        'cache_size': -262144,  # 256 MB
+        'mmap_size': 268435456,
+        'temp_store': 'MEMORY',
+        'busy_timeout': 5000,
+    },
+}
+
+
+def sqlite_pragmas(preset: str, overrides: dict = None) -> dict:
+    # Pragmas of the preset, with the values of the overrides that are set.
+    if preset not in SQLITE_PRAGMA_PRESETS:
+        raise ValueError(f'SQLite pragma preset {preset} is invalid, it should be one of '
+                         f'{", ".join(SQLITE_PRAGMA_PRESETS)}')
+    pragmas = dict(SQLITE_PRAGMA_PRESETS[preset])
+    for name, value in (overrides or {}).items():
+        if name not in SQLITE_PRAGMA_NAMES:
+            raise ValueError(f'SQLite pragma {name} is not supported')
+        if value is not None:
+            pragmas[name] = value
+    return pragmas
+
+
+def apply_sqlite_pragmas(engine, pragmas: dict):
+    # Sets the pragmas on every new connection of the engine, before it is used by a session.
+    if engine.dialect.name != 'sqlite' or not pragmas:
+        return
+
+    @event.listens_for(engine, 'connect')
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name} = {value}')
+        cursor.close()
+
+
+class StatementCacheStatistics:
+    """ Counts the statements executed by an engine by how they were found in its compiled statement cache:
+    hits reuse a compiled statement, misses are compiled and cached, and the others, such as DDL and textual SQL,
+    are not cached. """
+
+    def __init__(self, engine):
+        self.__engine = engine
+        self.hits = 0
+        self.misses = 0
+        self.uncached = 0
+        event.listen(self.__engine, 'before_cursor_execute', self.__count_statement)
+
+    def __count_statement(self, conn, cursor, statement, parameters, context, executemany):
+        cache_hit = getattr(context, 'cache_hit', None)
+        if cache_hit is CACHE_HIT:
+            self.hits += 1
+        elif cache_hit is CACHE_MISS:
+            self.misses += 1
+        else:
+            self.uncached += 1
+
+    @property
+    def hit_ratio(self) -> float:
+        cached = self.hits + self.misses
+        return self.hits / cached if cached else 0.0
+
+    def reset(self):
+        self.hits = self.misses = self.uncached = 0
+
+    def close(self):
+        event.remove(self.__engine, 'before_cursor_execute', self.__count_statement)
+
+    def __str__(self):
+        return (f'Statement cache: {self.hits} hits, {self.misses} misses, {self.uncached} not cached, '
+                f'hit ratio {self.hit_ratio:.1%}')
+
+
+def is_in_memory_sqlite(url) -> bool:
+    return url.get_backend_name() == 'sqlite' and url.database in (None, '', ':memory:')
+
+
+def pool_class_for(url, pool_mode: str):
+    if pool_mode not in POOL_MODES:
+        raise ValueError(f'Pool mode {pool_mode} is invalid, it should be one of {", ".join(POOL_MODES)}')
+    if pool_mode == 'null':
+        return NullPool
+    if pool_mode == 'static':
+        return StaticPool
+    if pool_mode == 'queue':
+        return QueuePool
+    # An in-memory SQLite database only lives as long as its connection, so all sessions share one connection.
+    # Any other database keeps a pool of connections that are reused across requests.
+    return StaticPool if is_in_memory_sqlite(url) else QueuePool
+
+
+def create_database_engine(database_uri: str, pool_mode: str = 'auto', pool_size: int = 5, echo: bool = False,
+                           sqlite_pragmas: dict = None):
+    url = make_url(database_uri)
+    pool_class = pool_class_for(url, pool_mode)
+
+    engine_args = {'poolclass': pool_class, 'echo': echo}
+    if url.get_backend_name() == 'sqlite':
+        # The connections of the pool are handed to the threads of a threaded worker one at a time,
+        # so they may be used by another thread than the one that opened them.
+        engine_args['connect_args'] = {'check_same_thread': False}
+    if pool_class is QueuePool:
+        # Sessions are removed at the end of each request, which returns their connection to the pool,
+        # so the pool needs about as many connections as there are threads serving requests.
+        engine_args['pool_size'] = pool_size
+        # A database server may drop idle connections, so they are checked before being reused.
+        engine_args['pool_pre_ping'] = url.get_backend_name() != 'sqlite'
+    engine = create_engine(url, **engine_args)
+    apply_sqlite_pragmas(engine, sqlite_pragmas)
+    return engine
+
+
+def async_database_url(database_uri: str):
+    # URL of the same database with the asyncio driver of its backend.
+    url = make_url(database_uri)
+    backend = url.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f'There is no asyncio driver for the {backend} database backend')
+    if is_in_memory_sqlite(url):
+        # Every connection to an in-memory database opens a new empty database.
+        raise ValueError('An in-memory SQLite database cannot be shared with an async engine')
+    return url.set(drivername=f'{backend}+{ASYNC_DRIVERS[backend]}')
+
+
+def create_async_database_engine(database_uri: str, echo: bool = False, sqlite_pragmas: dict = None):
+    # Flask runs each async view in an event loop of its own, and pooled asyncio connections are bound
+    # to the event loop that opened them, so every session opens a new connection.
+    # The asyncio extension is imported here, as only the async deployment needs it.
+    from sqlalchemy.ext.asyncio import create_async_engine
+
+    engine = create_async_engine(async_database_url(database_uri), poolclass=NullPool, echo=echo)
+    apply_sqlite_pragmas(engine.sync_engine, sqlite_pragmas)
+    return engine
@@ -1,11 +1,22 @@
-from typing import List
+from typing import Iterable, List
 
 # from sqlalchemy import desc, asc
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm.exc import NoResultFound
-from sqlalchemy.orm import scoped_session
-
-from music.adapters.repository import AbstractRepository
-from music.adapters.utils import search_string, sort_entities_by_title
+from sqlalchemy import func, literal_column, tuple_, select, bindparam
+from sqlalchemy.orm import scoped_session, joinedload, selectinload
+from sqlalchemy.orm.attributes import set_committed_value
+
+from music.adapters.repository import AbstractRepository, TrackSearchResult, RepositoryException
+from music.adapters.orm import (
+    tracks_table, reviews_table, users_table, track_genres_table, artists_table, albums_table,
+    genres_table, tracks_fts_table, versions_table, has_full_text_index, REFERENCE_DATA_VERSION
+)
+from music.adapters.reference_cache import ReferenceDataCache, SessionReferenceData
+from music.adapters.utils import (
+    search_string, sort_entities_by_title, like_pattern, LIKE_ESCAPE, fts_match_query, fts_can_match,
+    title_for_sorting, in_key_order
+)
 from music.domainmodel.user import User
 from music.domainmodel.artist import Artist
 from music.domainmodel.album import Album
@@ -14,10 +25,269 @@ from music.domainmodel.review import Review
 from music.domainmodel.genre import Genre
 
 
+# Named eager-loading profiles, applied per call site so that converting the loaded entities to dicts
+# issues no lazy loads, whatever the number of entities.
+LIST_PROFILE = 'list'  # pages of tracks
+DETAIL_PROFILE = 'detail'  # a single track, and its reviews with their users
+EXPORT_PROFILE = 'export'  # the whole catalog, and reviews along with their tracks
+# Pages of tracks whose album, artist and genres are set from the reference data cache instead of being joined.
+CACHED_LIST_PROFILE = 'cached list'
+
+
+def loading_options(profile: str, entity_class) -> list:
+    # Album and artist are many-to-one, so they are joined into the SELECT of the tracks.
+    # The genres of all loaded tracks are loaded by one more SELECT ... WHERE track_id IN (...),
+    # which does not multiply the rows of the tracks as a join of the collection would.
+    track_options = [
+        joinedload(Track._Track__album),
+        joinedload(Track._Track__artist),
+        selectinload(Track._Track__genres),
+    ]
+    # The users and tracks of the reviews are joined. The reviews only show the title of the track,
+    # except when exported, where the tracks are loaded along with their own relationships.
+    review_options = [joinedload(Review._Review__user)]
+
+    profiles = {
+        LIST_PROFILE: {Track: track_options},
+        CACHED_LIST_PROFILE: {},
+        DETAIL_PROFILE: {Track: track_options, Review: review_options + [joinedload(Review._Review__track)]},
+        EXPORT_PROFILE: {
+            Track: track_options,
+            Review: review_options + [joinedload(Review._Review__track).options(*track_options)],
+        },
+    }
+    return profiles[profile].get(entity_class, [])
+
+
+def select_entities(entity_class, profile: str):
+    # SELECT of the entities with the eager loading of the profile.
+    return select(entity_class).options(*loading_options(profile, entity_class))
+
+
+# Statements of the reads, shared by the SqlAlchemyRepository and the AsyncSqlAlchemyRepository.
+
+def count_statement(statement):
+    return select(func.count()).select_from(statement.order_by(None).subquery())
+
+
+# The statements of the single-row reads and of the reviews of a track take their values as bound parameters,
+# so that they are built once and reused by every call, see PreparedStatements.
+
+def user_statement():
+    # The user_name parameter is stripped and lowercased, as the names of the users are.
+    return select(User).where(users_table.c.user_name == bindparam('user_name'))
+
+
+def track_statement():
+    return select_entities(Track, DETAIL_PROFILE).where(tracks_table.c.track_id == bindparam('track_id'))
+
+
+def tracks_page_statement(offset: int, limit: int, sorting: bool, profile: str = LIST_PROFILE):
+    # ORDER BY the indexed sort_key with LIMIT/OFFSET, so only the rows of the page are read.
+    # The track id breaks ties between equal sort keys, as the stable sort of get_tracks(sorting=True) does.
+    order = (tracks_table.c.sort_key, tracks_table.c.track_id) if sorting else (tracks_table.c.track_id,)
+    return select_entities(Track, profile).order_by(*order).offset(offset).limit(limit)
+
+
+def tracks_by_album_statement(album_id: int, profile: str = LIST_PROFILE):
+    # Single query on the indexed foreign key, without loading the album first.
+    return select_entities(Track, profile).where(
+        tracks_table.c.album_id == album_id).order_by(tracks_table.c.track_id)
+
+
+def album_statement():
+    return select(Album).where(albums_table.c.album_id == bindparam('album_id'))
+
+
+def albums_page_statement(offset: int, limit: int, sorting: bool):
+    order = (albums_table.c.sort_key, albums_table.c.album_id) if sorting else (albums_table.c.album_id,)
+    return select(Album).order_by(*order).offset(offset).limit(limit)
+
+
+def seek_statement(entity_class, sort_key_column, id_column, key: tuple, limit: int, before: bool,
+                   profile: str = LIST_PROFILE):
+    # Keyset pagination: a range scan of the (sort_key, id) index starting at the key,
+    # so a deep page costs as much as the first one. Seeking before the key scans the index backwards,
+    # so its entities come in descending order and are reversed by the caller.
+    statement = select_entities(entity_class, profile)
+    if key is not None:
+        boundary = tuple_(sort_key_column, id_column)
+        statement = statement.where(boundary < tuple_(*key) if before else boundary > tuple_(*key))
+
+    if not before:
+        return statement.order_by(sort_key_column, id_column).limit(max(limit, 0))
+    return statement.order_by(sort_key_column.desc(), id_column.desc()).limit(max(limit, 0))
+
+
+def reviews_for_track_statement():
+    # Query the indexed reviews.track_id foreign key without loading the track first.
+    return select_entities(Review, DETAIL_PROFILE).where(
+        reviews_table.c.track_id == bindparam('track_id')).order_by(reviews_table.c.review_id)
+
+
+def review_for_track_by_user_statement():
+    return select_entities(Review, DETAIL_PROFILE).join(users_table).where(
+        reviews_table.c.track_id == bindparam('track_id'),
+        users_table.c.user_name == bindparam('user_name')
+    ).order_by(reviews_table.c.review_id).limit(1)
+
+
+def reference_data_version_statement():
+    return select(versions_table.c.version).where(versions_table.c.name == REFERENCE_DATA_VERSION)
+
+
+def increment_version(session, name: str):
+    # Increments the version in the transaction of the session, which inserts it on its first write.
+    updated = session.execute(versions_table.update().where(versions_table.c.name == name).values(
+        version=versions_table.c.version + 1))
+    if updated.rowcount == 0:
+        session.execute(versions_table.insert().values(name=name, version=1))
+
+
+PREPARED_STATEMENTS = {
+    'user': user_statement,
+    'track': track_statement,
+    'album': album_statement,
+    'reviews_for_track': reviews_for_track_statement,
+    'review_for_track_by_user': review_for_track_by_user_statement,
+    'reference_data_version': reference_data_version_statement,
+}
+
+
+def full_text_search_statement(fts_column: str, text: str, profile: str = LIST_PROFILE):
+    # Substrings are looked up in the trigram FTS5 index, and the tracks are ranked by bm25,
+    # then ordered by track id.
+    fts = literal_column(tracks_fts_table.name)
+    return select_entities(Track, profile).join(
+        tracks_fts_table, tracks_fts_table.c.rowid == tracks_table.c.track_id
+    ).where(
+        fts.op('MATCH')(fts_match_query(fts_column, text))
+    ).order_by(func.bm25(fts), tracks_table.c.track_id)
+
+
+def substring_search_statement(search_key: str, text: str, genres: List[Genre], profile: str = LIST_PROFILE):
+    # Substring search, used when SQLite has no FTS5, ordered by track id.
+    # The predicates are case-insensitive LIKE on the joined tables, so the filtering is done in the database.
+    statement = select_entities(Track, profile)
+    pattern = like_pattern(text)
+
+    if search_key == 'genre':
+        # Match the small genre vocabulary first, then join track_genres on the matching genre ids.
+        genre_ids = [genre.genre_id for genre in genres
+                     if search_string(genre.name if genre.name is not None else '', text)]
+        statement = statement.join(
+            track_genres_table, track_genres_table.c.track_id == tracks_table.c.track_id
+        ).where(
+            track_genres_table.c.genre_id.in_(genre_ids)
+        ).distinct()
+
+    elif not text.strip():
+        # An empty search string is contained in every name, including the missing ones.
+        pass
+
+    elif search_key == 'title':
+        statement = statement.where(tracks_table.c.title.ilike(pattern, escape=LIKE_ESCAPE))
+
+    elif search_key == 'artist':
+        statement = statement.join(artists_table, artists_table.c.artist_id == tracks_table.c.artist_id).where(
+            artists_table.c.full_name.ilike(pattern, escape=LIKE_ESCAPE))
+
+    elif search_key == 'album':
+        statement = statement.join(albums_table, albums_table.c.album_id == tracks_table.c.album_id).where(
+            albums_table.c.title.ilike(pattern, escape=LIKE_ESCAPE))
+
+    return statement.order_by(tracks_table.c.track_id)
+
+
+# Rows inserted per executemany when an empty database is filled in bulk.
+BULK_INSERT_BATCH_SIZE = 5000
+
+# Rows fetched at a time by the reads of a whole table, from a server-side cursor.
+LARGE_READ_BATCH_SIZE = 1000
+
+
+def all_rows(query) -> list:
+    # Entities of a read of a whole table. A database with server-side cursors, such as PostgreSQL,
+    # streams the rows in batches, rather than the driver buffering the whole result before the entities
+    # are loaded. SQLite cursors already step through the rows as they are fetched.
+    if query.session.get_bind().dialect.supports_server_side_cursors:
+        query = query.yield_per(LARGE_READ_BATCH_SIZE)
+    return query.all()
+
+
+def catalog_rows(albums: List[Album], artists: List[Artist], genres: List[Genre], tracks: List[Track],
+                 with_track_references: bool = True) -> list:
+    # Rows of the catalog tables, in the order of their foreign keys. The albums, artists and genres of the
+    # tracks are included, as merging a track would insert them too, unless with_track_references is False
+    # because they were inserted with an earlier batch.
+    albums_by_id = {album.album_id: album for album in albums}
+    artists_by_id = {artist.artist_id: artist for artist in artists}
+    genres_by_id = {genre.genre_id: genre for genre in genres}
+    tracks_by_id = {}
+    for track in tracks:
+        tracks_by_id.setdefault(track.track_id, track)
+        if not with_track_references:
+            continue
+        if track.album is not None:
+            albums_by_id.setdefault(track.album.album_id, track.album)
+        if track.artist is not None:
+            artists_by_id.setdefault(track.artist.artist_id, track.artist)
+        for genre in track.genres:
+            genres_by_id.setdefault(genre.genre_id, genre)
+
+    album_rows = [{
+        'album_id': album.album_id, 'title': album.title, 'album_url': album.album_url,
+        'album_type': album.album_type, 'release_year': album.release_year,
+        'sort_key': title_for_sorting(album.title or ''),
+    } for album in albums_by_id.values()]
+    artist_rows = [
+        {'artist_id': artist.artist_id, 'full_name': artist.full_name} for artist in artists_by_id.values()]
+    genre_rows = [{'genre_id': genre.genre_id, 'name': genre.name} for genre in genres_by_id.values()]
+    track_rows = [{
+        'track_id': track.track_id, 'title': track.title, 'track_url': track.track_url,
+        'track_duration': track.track_duration,
+        'artist_id': track.artist.artist_id if track.artist is not None else None,
+        'album_id': track.album.album_id if track.album is not None else None,
+        'sort_key': title_for_sorting(track.title or ''),
+    } for track in tracks_by_id.values()]
+    # A genre listed twice for a track is a single association row, as in the genres collection.
+    track_genre_rows = [
+        {'track_id': track_id, 'genre_id': genre_id}
+        for track_id, track in tracks_by_id.items()
+        for genre_id in dict.fromkeys(genre.genre_id for genre in track.genres)
+    ]
+    return [
+        (albums_table, album_rows),
+        (artists_table, artist_rows),
+        (genres_table, genre_rows),
+        (tracks_table, track_rows),
+        (track_genres_table, track_genre_rows),
+    ]
+
+
+class PreparedStatements:
+    """ The statements of PREPARED_STATEMENTS, each built on its first use and then reused.
+
+    Building a statement, and generating its cache key for the compiled cache of the engine, costs more than
+    executing a single-row read that hits the compiled cache. A built statement memoizes its cache key,
+    so a reused statement only binds its parameters. The statements refer to the mapped classes,
+    so they are kept by a repository rather than by the module, which outlives a remapping of the model.
+    """
+
+    def __init__(self):
+        self.__statements = {}
+
+    def __getitem__(self, name: str):
+        statement = self.__statements.get(name)
+        if statement is None:
+            statement = self.__statements[name] = PREPARED_STATEMENTS[name]()
+        return statement
+
+
 class SessionContextManager:
     def __init__(self, session_factory):
-        self.__session_factory = session_factory
-        self.__session = scoped_session(self.__session_factory)
+        # The scoped session registry lives as long as the repository, and gives each thread its own session.
+        self.__session = scoped_session(session_factory)
 
     def __enter__(self):
         return self
@@ -36,20 +306,124 @@ class SessionContextManager:
         self.__session.rollback()
 
     def reset_session(self):
-        # this method can be used e.g. to allow Flask to start a new session for each http request,
-        # via the 'before_request' callback
+        # The next use of the session starts a new session for the current thread.
         self.close_current_session()
-        self.__session = scoped_session(self.__session_factory)
 
     def close_current_session(self):
-        if not self.__session is None:
-            self.__session.close()
+        # Closes the session of the current thread and removes it from the registry,
+        # which returns its connection to the pool. Flask calls it at the end of each request.
+        self.__session.remove()
 
 
 class SqlAlchemyRepository(AbstractRepository):
 
-    def __init__(self, session_factory):
+    # Columns of the full-text index searched for each search key.
+    FTS_COLUMNS = {'title': 'title', 'artist': 'artist', 'album': 'album', 'genre': 'genres'}
+
+    def __init__(self, session_factory, full_text_search: bool = True, reference_cache: bool = True):
         self._session_cm = SessionContextManager(session_factory)
+        # The full-text index is used when it is enabled and exists in the database,
+        # which is only looked up on the first search.
+        self.__full_text_search = full_text_search
+        self.__has_full_text_index = None
+        # The albums, artists and genres are cached across sessions, and loaded through a session of their own.
+        # The cache is invalidated whenever one of them is added, by this process or, through the version of
+        # the reference data in the database, by another one.
+        self.__session_factory = session_factory
+        self.__reference_cache = ReferenceDataCache(self.__load_reference_data) if reference_cache else None
+        self.__list_profile = CACHED_LIST_PROFILE if reference_cache else LIST_PROFILE
+        self.__statements = PreparedStatements()
+
+    def __query(self, entity_class, profile: str):
+        # Query of the entities with the eager loading of the profile.
+        return self._session_cm.session.query(entity_class).options(*loading_options(profile, entity_class))
+
+    def __scalars(self, statement) -> list:
+        return self._session_cm.session.execute(statement).scalars().all()
+
+    def __prepared(self, name: str, **parameters):
+        # Result of the prepared statement of the name.
+        return self._session_cm.session.execute(self.__statements[name], parameters)
+
+    def __tracks(self, statement) -> List[Track]:
+        # Tracks of a statement of the list profile.
+        return self.__set_reference_data(self.__scalars(statement))
+
+    def __get_by_keys(self, entity_class, key_column, key_of, keys: list) -> list:
+        # One SELECT ... WHERE key IN (...) with the list loading options, instead of a query per key.
+        unique_keys = list(dict.fromkeys(keys))
+        if not unique_keys:
+            return []
+        entities = self.__query(entity_class, self.__list_profile).filter(key_column.in_(unique_keys)).all()
+        if entity_class is Track:
+            entities = self.__set_reference_data(entities)
+        return in_key_order(keys, {key_of(entity): entity for entity in entities})
+
+    def __load_reference_data(self) -> tuple:
+        # The entities stay readable once the session is closed, as they have no relationships to load.
+        with self.__session_factory() as session:
+            return (session.execute(reference_data_version_statement()).scalar() or 0,
+                    all_rows(session.query(Album).order_by(albums_table.c.album_id)),
+                    all_rows(session.query(Artist).order_by(artists_table.c.artist_id)),
+                    all_rows(session.query(Genre).order_by(genres_table.c.genre_id)))
+
+    def __reference_data(self) -> SessionReferenceData:
+        # The reference data of the current session. Its version in the database is read by the first read of
+        # the session, so a request sees the albums, artists and genres written by other processes before it.
+        if self.__reference_cache is None:
+            return None
+        info = self._session_cm.session.info
+        if 'reference_data_version' not in info:
+            info['reference_data_version'] = self.__prepared('reference_data_version').scalar() or 0
+        data = self.__reference_cache.get(info['reference_data_version'])
+        session_data = info.get('reference_data')
+        if session_data is None or session_data.data is not data:
+            session_data = info['reference_data'] = SessionReferenceData(data, self._session_cm.session)
+        return session_data
+
+    def __genre_vocabulary(self) -> List[Genre]:
+        data = self.__reference_data()
+        return data.data.genres if data is not None else self.get_genres()
+
+    def __invalidate_reference_data(self):
+        if self.__reference_cache is not None:
+            self.__reference_cache.invalidate()
+
+    def __commit_reference_data(self, scm):
+        # Commits the albums, artists or genres written in the session along with a new version of them.
+        increment_version(scm.session, REFERENCE_DATA_VERSION)
+        scm.commit()
+        self.__invalidate_reference_data()
+
+    def __set_reference_data(self, tracks: List[Track]) -> List[Track]:
+        # The album and artist of the tracks are looked up in the reference data cache by their foreign keys,
+        # and their genres by the rows of track_genres, which are read from its (track_id, genre_id) index alone.
+        # They are set as loaded state, so the session neither lazy loads them nor sees them as changes.
+        # A track whose album, artist or genre is not cached keeps lazy loading it.
+        session_data = self.__reference_data()
+        if session_data is None or not tracks:
+            return tracks
+        data = session_data.data
+
+        genre_ids_by_track = {track.track_id: [] for track in tracks}
+        for track_id, genre_id in self._session_cm.session.execute(
+                select(track_genres_table.c.track_id, track_genres_table.c.genre_id).where(
+                    track_genres_table.c.track_id.in_(list(genre_ids_by_track))).order_by(track_genres_table.c.id)):
+            genre_ids_by_track[track_id].append(genre_id)
+
+        for track in tracks:
+            for attribute, entity_id, entities_by_id, attached in (
+                    ('_Track__album', track.album_id, data.albums_by_id, session_data.album),
+                    ('_Track__artist', track.artist_id, data.artists_by_id, session_data.artist)):
+                if entity_id is None:
+                    set_committed_value(track, attribute, None)
+                elif entity_id in entities_by_id:
+                    set_committed_value(track, attribute, attached(entity_id))
+
+            genre_ids = genre_ids_by_track[track.track_id]
+            if all(genre_id in data.genres_by_id for genre_id in genre_ids):
+                set_committed_value(track, '_Track__genres', [session_data.genre(genre_id) for genre_id in genre_ids])
+        return tracks
 
     def close_session(self):
         self._session_cm.close_current_session()
@@ -66,15 +440,19 @@ class SqlAlchemyRepository(AbstractRepository):
     def get_user(self, user_name: str) -> User:
         user = None
         try:
-            user = self._session_cm.session.query(User).filter(
-                User._User__user_name == user_name.strip().lower()).one()
+            user = self.__prepared('user', user_name=user_name.strip().lower()).scalar_one()
         except NoResultFound:
             # Ignore any exception and return None.
             print(f'User {user_name} was not found')
         return user
 
+    def get_users_by_names(self, user_names: List[str]) -> List[User]:
+        return self.__get_by_keys(User, users_table.c.user_name, lambda user: user.user_name,
+                                  [user_name.strip().lower() for user_name in user_names])
+
     def get_tracks(self, sorting: bool = False) -> List[Track]:
-        tracks = self._session_cm.session.query(Track).all()
+        # Ordered by id, as SQLite returns the rows by default, which PostgreSQL does not.
+        tracks = all_rows(self.__query(Track, EXPORT_PROFILE).order_by(tracks_table.c.track_id))
         if not sorting:
             return tracks
         return sort_entities_by_title(tracks)
@@ -82,135 +460,239 @@ class SqlAlchemyRepository(AbstractRepository):
     def get_track(self, track_id: int) -> Track:
         track = None
         try:
-            track = self._session_cm.session.query(
-                Track).filter(Track._Track__track_id == track_id).one()
+            track = self.__prepared('track', track_id=track_id).scalar_one()
         except NoResultFound:
             print(f'Track {track_id} was not found')
 
         return track
 
+    def get_tracks_by_ids(self, track_ids: List[int]) -> List[Track]:
+        return self.__get_by_keys(Track, tracks_table.c.track_id, lambda track: track.track_id, track_ids)
+
+    def get_tracks_page(self, offset: int, limit: int, sorting: bool = True) -> List[Track]:
+        return self.__tracks(tracks_page_statement(offset, limit, sorting, self.__list_profile))
+
+    def get_tracks_after(self, key: tuple, limit: int) -> List[Track]:
+        return self.__seek(Track, tracks_table.c.sort_key, tracks_table.c.track_id, key, limit, before=False)
+
+    def get_tracks_before(self, key: tuple, limit: int) -> List[Track]:
+        return self.__seek(Track, tracks_table.c.sort_key, tracks_table.c.track_id, key, limit, before=True)
+
     def add_track(self, track: Track):
         with self._session_cm as scm:
             scm.session.merge(track)
-            scm.commit()
+            # Merging the tracks inserts their new albums, artists and genres too.
+            self.__commit_reference_data(scm)
 
     def add_many_tracks(self, tracks: List[Track]):
         with self._session_cm as scm:
             for track in tracks:
                 scm.session.merge(track)
-            scm.commit()
+            self.__commit_reference_data(scm)
 
     def get_number_of_tracks(self) -> List[Track]:
         num_tracks = self._session_cm.session.query(Track).count()
         return num_tracks
 
     def get_tracks_by_album(self, album_id: int)->List[Album]:
-        album = self.get_album(album_id)
-        album_tracks = self._session_cm.session.query(Track).filter(
-            Track._Track__album == album).all()
-        return album_tracks
+        return self.__tracks(tracks_by_album_statement(album_id, self.__list_profile))
 
     def get_artists(self) -> List[Artist]:
-        artists = self._session_cm.session.query(Artist).all()
+        data = self.__reference_data()
+        if data is not None:
+            return data.artists()
+        artists = all_rows(self._session_cm.session.query(Artist).order_by(artists_table.c.artist_id))
         return artists
 
     def add_artist(self, artist: Artist):
         with self._session_cm as scm:
             scm.session.merge(artist)
-            scm.commit()
+            self.__commit_reference_data(scm)
 
     def add_many_artists(self, artists: List[Artist]):
         with self._session_cm as scm:
             for artist in artists:
                 scm.session.merge(artist)
-            scm.commit()
+            self.__commit_reference_data(scm)
 
     def get_album(self, album_id: int)-> Album:
         # Get a specific album by id
+        data = self.__reference_data()
+        if data is not None and album_id in data.data.albums_by_id:
+            return data.album(album_id)
         album = None
         try:
-            album = self._session_cm.session.query(
-                Album).filter(Album._Album__album_id == album_id).one()
+            album = self.__prepared('album', album_id=album_id).scalar_one()
         except NoResultFound:
             print(f'Album {album_id} was not found')
 
         return album
 
+    def get_albums_by_ids(self, album_ids: List[int]) -> List[Album]:
+        return self.__get_by_keys(Album, albums_table.c.album_id, lambda album: album.album_id, album_ids)
+
     def get_albums(self, sorting: bool = False) -> List[Album]:
-        albums = self._session_cm.session.query(Album).all()
+        data = self.__reference_data()
+        if data is not None:
+            albums = data.albums()
+        else:
+            albums = all_rows(self._session_cm.session.query(Album).order_by(albums_table.c.album_id))
         if not sorting:
             return albums
         return sort_entities_by_title(albums)
 
+    def get_albums_page(self, offset: int, limit: int, sorting: bool = True) -> List[Album]:
+        return self.__scalars(albums_page_statement(offset, limit, sorting))
+
+    def get_albums_after(self, key: tuple, limit: int) -> List[Album]:
+        return self.__seek(Album, albums_table.c.sort_key, albums_table.c.album_id, key, limit, before=False)
+
+    def get_albums_before(self, key: tuple, limit: int) -> List[Album]:
+        return self.__seek(Album, albums_table.c.sort_key, albums_table.c.album_id, key, limit, before=True)
+
     def add_album(self, album: Album):
         with self._session_cm as scm:
             scm.session.merge(album)
-            scm.commit()
+            self.__commit_reference_data(scm)
 
     def add_many_albums(self, albums: List[Album]):
         with self._session_cm as scm:
             for album in albums:
                 scm.session.merge(album)
-            scm.commit()
+            self.__commit_reference_data(scm)
 
     def get_number_of_albums(self) -> int:
         num_albums = self._session_cm.session.query(Album).count()
         return num_albums
 
     def get_genres(self) -> List[Genre]:
-        genres = self._session_cm.session.query(Genre).all()
+        data = self.__reference_data()
+        if data is not None:
+            return data.genres()
+        genres = all_rows(self._session_cm.session.query(Genre).order_by(genres_table.c.genre_id))
         return genres
 
     def add_genre(self, genre: Genre):
         with self._session_cm as scm:
             scm.session.merge(genre)
-            scm.commit()
+            self.__commit_reference_data(scm)
 
     def add_many_genres(self, genres: List[Genre]):
         with self._session_cm as scm:
             for genre in genres:
                 scm.session.merge(genre)
-            scm.commit()
+            self.__commit_reference_data(scm)
+
+    def add_catalog(self, albums: List[Album], artists: List[Artist], genres: List[Genre], tracks: List[Track]):
+        """ Inserts the catalog with executemany INSERTs when the database is empty, as merging each entity
+        issues a SELECT before its INSERT. A database with data in it is merged into as before.
+        The tables are inserted in one transaction, so a failure rolls the whole catalog back. """
+        if not self.is_empty():
+            super().add_catalog(albums, artists, genres, tracks)
+            return
+
+        with self._session_cm as scm:
+            self.__insert_catalog(scm, catalog_rows(albums, artists, genres, tracks))
+            self.__commit_reference_data(scm)
+
+    def add_catalog_batches(self, batches: Iterable[tuple]):
+        """ Inserts each batch with executemany INSERTs when the database is empty. The albums, artists and
+        genres referenced by the tracks of a batch were inserted by the same or an earlier batch.
+        A track whose id was inserted by an earlier batch is skipped, as add_catalog keeps the first track of
+        an id. The batches are inserted in one transaction, so a failure rolls the whole catalog back. """
+        if not self.is_empty():
+            super().add_catalog_batches(batches)
+            return
+
+        with self._session_cm as scm:
+            for albums, artists, genres, tracks in batches:
+                inserted_ids = self.__existing_track_ids(scm, [track.track_id for track in tracks])
+                tracks = [track for track in tracks if track.track_id not in inserted_ids]
+                self.__insert_catalog(
+                    scm, catalog_rows(albums, artists, genres, tracks, with_track_references=False))
+            self.__commit_reference_data(scm)
+
+    def __existing_track_ids(self, scm, track_ids: list) -> set:
+        # Ids of the tracks in the database, looked up in the primary key index a chunk of ids at a time.
+        existing_ids = set()
+        for start in range(0, len(track_ids), BULK_INSERT_BATCH_SIZE):
+            existing_ids.update(scm.session.execute(select(tracks_table.c.track_id).where(
+                tracks_table.c.track_id.in_(track_ids[start:start + BULK_INSERT_BATCH_SIZE]))).scalars())
+        return existing_ids
+
+    def __insert_catalog(self, scm, table_rows: list):
+        # The rows are inserted in the transaction of the caller, which commits them.
+        for table, rows in table_rows:
+            for start in range(0, len(rows), BULK_INSERT_BATCH_SIZE):
+                scm.session.execute(table.insert(), rows[start:start + BULK_INSERT_BATCH_SIZE])
+
+    def is_empty(self) -> bool:
+        """ Returns True if there are no albums, artists, genres or tracks in the database. """
+        session = self._session_cm.session
+        return not any(session.query(table.select().exists()).scalar()
+                       for table in (albums_table, artists_table, genres_table, tracks_table))
 
     def add_review(self, review: Review):
         super().add_review(review)
         with self._session_cm as scm:
             scm.session.merge(review)
-            scm.commit()
-
-    def get_reviews_for_track(self, track_id: str) -> List[Track]:
-        track = self.get_track(track_id)
-        reviews = self._session_cm.session.query(Review).filter(
-            Review._Review__track == track).all()
-        return reviews
+            try:
+                scm.commit()
+            except IntegrityError:
+                # The unique (track_id, user_id) index rejects a second review of the track by the user.
+                scm.rollback()
+                raise RepositoryException('The user has already reviewed the track')
+
+    def get_reviews_for_track(self, track_id: str) -> List[Review]:
+        return self.__prepared('reviews_for_track', track_id=track_id).scalars().all()
+
+    def get_review_for_track_by_user(self, track_id: int, user_name: str) -> Review:
+        if user_name is None:
+            return None
+        return self.__prepared(
+            'review_for_track_by_user', track_id=track_id, user_name=user_name.strip().lower()).scalars().first()
+
+    def search_tracks(self, search_key: str, text: str) -> TrackSearchResult:
+        # Counting and the LIMIT/OFFSET of the page window are done by the database,
+        # so only the tracks of the page are loaded.
+        statement = self.__search_tracks_statement(search_key, text)
+        return TrackSearchResult(
+            self._session_cm.session.execute(count_statement(statement)).scalar(),
+            lambda offset, limit: self.__tracks(statement.offset(offset).limit(limit)))
 
     def search_tracks_by_title(self, title_string: str) -> List[Track]:
-        tracks = self._session_cm.session.query(Track).all()
-        searched_tracks = list(filter(lambda track: search_string(
-            track.title if track.title is not None else '', title_string), tracks))
-        return searched_tracks
+        return self.__tracks(self.__search_tracks_statement('title', title_string))
 
     def search_tracks_by_artist(self, artist_name: str) -> List[Track]:
-        tracks = self._session_cm.session.query(Track).all()
-        searched_tracks = list(filter(lambda track: search_string(
-            track.artist.full_name if track.artist is not None else '', artist_name), tracks))
-
-        return searched_tracks
+        return self.__tracks(self.__search_tracks_statement('artist', artist_name))
 
     def search_tracks_by_album(self, album_string: str) -> List[Track]:
-        tracks = self._session_cm.session.query(Track).all()
-        searched_tracks = list(filter(lambda track: search_string(
-            track.album.title if track.album is not None else '', album_string), tracks))
-        return searched_tracks
+        return self.__tracks(self.__search_tracks_statement('album', album_string))
 
     def search_tracks_by_genre(self, genre_string: str) -> List[Track]:
-        tracks = self._session_cm.session.query(Track).all()
-
-        searched_tracks = []
-        for track in tracks:
-            for genre in track.genres:
-                if search_string(genre.name, genre_string):
-                    searched_tracks.append(track)
-                    break
-
-        return searched_tracks
+        return self.__tracks(self.__search_tracks_statement('genre', genre_string))
+
+    def __seek(self, entity_class, sort_key_column, id_column, key: tuple, limit: int, before: bool) -> list:
+        entities = self.__scalars(
+            seek_statement(entity_class, sort_key_column, id_column, key, limit, before, self.__list_profile))
+        if entity_class is Track:
+            entities = self.__set_reference_data(entities)
+        if before:
+            entities.reverse()
+        return entities
+
+    def __uses_full_text_index(self) -> bool:
+        if not self.__full_text_search:
+            return False
+        if self.__has_full_text_index is None:
+            self.__has_full_text_index = has_full_text_index(self._session_cm.session.connection())
+        return self.__has_full_text_index
+
+    def __search_tracks_statement(self, search_key: str, text: str):
+        # Statement of the tracks found by the search.
+        if search_key in self.FTS_COLUMNS and fts_can_match(text) and self.__uses_full_text_index():
+            return full_text_search_statement(self.FTS_COLUMNS[search_key], text, self.__list_profile)
+        # The genre vocabulary comes from the reference data cache. Only the ids and names of the cached genres are
+        # read, so they are not merged into the session.
+        genres = self.__genre_vocabulary() if search_key == 'genre' else []
+        return substring_search_statement(search_key, text, genres, self.__list_profile)
@@ -0,0 +1,236 @@
+import json
+import logging
+import os
+import time
+from datetime import datetime
+from pathlib import Path
+from threading import Event, Lock, Thread
+
+from music.adapters.memory_snapshot import CatalogSnapshot
+from music.domainmodel.user import User
+from music.domainmodel.review import Review
+
+SNAPSHOT_FILENAME = 'snapshot.json'
+JOURNAL_FILENAME = 'journal.jsonl'
+
+# A child of the logger of the Flask app, so that the messages go to app.logger.
+logger = logging.getLogger(__name__)
+
+
+class CorruptJournalException(Exception):
+    """ Raised when a complete record in the journal cannot be read, so that the records after it are not lost
+    by silently cutting the journal off there. """
+
+
+def user_to_record(user: User) -> dict:
+    return {'user_name': user.user_name, 'password': user.password}
+
+
+def review_to_record(review: Review) -> dict:
+    return {
+        'track_id': review.track.track_id,
+        'user_name': review.user.user_name if review.user is not None else None,
+        'review_text': review.review_text,
+        'rating': review.rating,
+        'timestamp': review.timestamp.isoformat(),
+    }
+
+
+class RepositoryJournal:
+    """ Append-only journal of the users and reviews added to a MemoryRepository, so that they survive a restart.
+
+    Every mutation is appended to the journal file as one JSON line with a sequence number, before the repository
+    publishes it. A failed append is cut off the file and raised, so the mutation is not published either.
+    The file is fsynced once per batch of records or time interval, whichever comes first: a background thread
+    fsyncs the records left unsynced at each interval, so a lone record does not wait for the next append.
+    Once the journal holds
+    enough records, it is compacted: the users and reviews of the repository are written to a snapshot file,
+    and the journal is truncated. Recovery loads the snapshot and replays only the journal records written after it.
+    """
+
+    def __init__(self, directory: str, fsync_batch_size: int = 16, fsync_interval: float = 1.0,
+                 compact_after: int = 1000):
+        self.__directory = Path(directory)
+        self.__snapshot_path = self.__directory / SNAPSHOT_FILENAME
+        self.__journal_path = self.__directory / JOURNAL_FILENAME
+
+        self.__fsync_batch_size = fsync_batch_size
+        self.__fsync_interval = fsync_interval
+        self.__compact_after = compact_after
+
+        self.__lock = Lock()
+        self.__file = None
+        # Sequence number of the last record written, and of the last record included in the snapshot.
+        self.__sequence = 0
+        self.__snapshot_sequence = 0
+        self.__records_since_snapshot = 0
+        self.__unsynced_records = 0
+        self.__last_fsync = time.monotonic()
+        # Thread that fsyncs the unsynced records at each interval, until the journal is closed.
+        self.__closed = Event()
+        self.__flusher = None
+
+    @property
+    def sequence(self) -> int:
+        return self.__sequence
+
+    def restore(self, repo) -> int:
+        """ Adds the users and reviews of the snapshot and the journal to the repository, and opens the journal
+        for appending. The repository must not have the journal attached yet. Returns the number of replayed
+        journal records. """
+        self.__directory.mkdir(parents=True, exist_ok=True)
+
+        if self.__snapshot_path.exists():
+            with open(self.__snapshot_path, encoding='utf-8') as snapshot_file:
+                snapshot = json.load(snapshot_file)
+            self.__snapshot_sequence = snapshot['sequence']
+            for user_record in snapshot['users']:
+                apply_record(repo, {'op': 'add_user', **user_record})
+            for review_record in snapshot['reviews']:
+                apply_record(repo, {'op': 'add_review', **review_record})
+        self.__sequence = self.__snapshot_sequence
+
+        replayed = 0
+        if self.__journal_path.exists():
+            # Size of the journal up to the last complete record.
+            valid_size = 0
+            with open(self.__journal_path, 'rb') as journal_file:
+                for line in journal_file:
+                    if not line.endswith(b'\n'):
+                        # A record is complete with its newline. Only the last line can miss it, when a crash
+                        # tore its write, and the record was never acknowledged as durable.
+                        logger.warning('Cutting off the incomplete last journal record: %r', line)
+                        break
+                    try:
+                        record = json.loads(line.decode('utf-8'))
+                    except (UnicodeDecodeError, json.JSONDecodeError):
+                        raise CorruptJournalException(
+                            f'The journal record at byte {valid_size} of {self.__journal_path} is corrupt: {line!r}')
+                    valid_size += len(line)
+                    # Records already in the snapshot are left over when a crash happened during compaction.
+                    if record['seq'] <= self.__snapshot_sequence:
+                        continue
+                    apply_record(repo, record)
+                    self.__sequence = record['seq']
+                    replayed += 1
+            # Cut off a torn record, so that new records are not appended after it.
+            os.truncate(self.__journal_path, valid_size)
+
+        self.__records_since_snapshot = replayed
+        self.__file = open(self.__journal_path, 'ab', buffering=0)
+        self.__flusher = Thread(target=self.__flush_periodically, name='journal-fsync', daemon=True)
+        self.__flusher.start()
+        return replayed
+
+    def append(self, op: str, entity, snapshot: CatalogSnapshot):
+        """ Appends the mutation op ('add_user' | 'add_review') of the entity. snapshot is the repository snapshot
+        that includes the mutation, it is written out when the journal gets compacted. """
+        record = user_to_record(entity) if op == 'add_user' else review_to_record(entity)
+        with self.__lock:
+            sequence = self.__sequence + 1
+            line = (json.dumps({'seq': sequence, 'op': op, **record}) + '\n').encode('utf-8')
+            size = os.fstat(self.__file.fileno()).st_size
+            try:
+                self.__write(line)
+                if (self.__unsynced_records + 1 >= self.__fsync_batch_size or
+                        time.monotonic() - self.__last_fsync >= self.__fsync_interval):
+                    self.__fsync()
+            except OSError:
+                # Cut off the part of the record that was written, so that the next record does not follow a torn
+                # one. The caller does not publish the mutation.
+                os.ftruncate(self.__file.fileno(), size)
+                raise
+            self.__sequence = sequence
+            self.__unsynced_records += 1
+            self.__records_since_snapshot += 1
+
+            if self.__records_since_snapshot >= self.__compact_after:
+                try:
+                    self.__compact(snapshot)
+                except OSError as exception:
+                    # The record is already in the journal, so the write succeeded. Compaction is tried again
+                    # after the next record.
+                    logger.warning('Compacting the journal failed: %s', exception)
+
+    def compact(self, snapshot: CatalogSnapshot):
+        with self.__lock:
+            self.__compact(snapshot)
+
+    def close(self):
+        # The flusher is stopped first, as it takes the lock.
+        self.__closed.set()
+        if self.__flusher is not None:
+            self.__flusher.join()
+            self.__flusher = None
+        with self.__lock:
+            if self.__file is not None:
+                self.__fsync()
+                self.__file.close()
+                self.__file = None
+
+    def __write(self, data: bytes):
+        # The file is unbuffered, and a write may write only a part of the data.
+        view = memoryview(data)
+        while view:
+            view = view[self.__file.write(view):]
+
+    def __flush_periodically(self):
+        # Fsyncs the records appended since the last fsync once per interval, so that each record is durable
+        # within about an interval of being acknowledged, even when no other record follows it.
+        while not self.__closed.wait(self.__fsync_interval):
+            with self.__lock:
+                if self.__file is None or self.__unsynced_records == 0:
+                    continue
+                try:
+                    self.__fsync()
+                except OSError as exception:
+                    # The records stay unsynced, and the fsync is tried again at the next interval.
+                    logger.warning('Fsyncing the journal failed: %s', exception)
+
+    def __fsync(self):
+        os.fsync(self.__file.fileno())
+        self.__unsynced_records = 0
+        self.__last_fsync = time.monotonic()
+
+    def __compact(self, snapshot: CatalogSnapshot):
+        # Write the snapshot to a temporary file first, so that a crash never leaves a partial snapshot.
+        reviews = [review for track_reviews in snapshot.reviews_by_track.values() for review in track_reviews]
+        data = {
+            'sequence': self.__sequence,
+            'users': [user_to_record(user) for user in snapshot.users_by_name.values()],
+            'reviews': [review_to_record(review) for review in reviews],
+        }
+        temporary_path = self.__snapshot_path.with_suffix('.tmp')
+        with open(temporary_path, 'w', encoding='utf-8') as snapshot_file:
+            json.dump(data, snapshot_file)
+            snapshot_file.flush()
+            os.fsync(snapshot_file.fileno())
+        os.replace(temporary_path, self.__snapshot_path)
+
+        # Records up to the snapshot sequence are skipped on recovery, so the journal can now be truncated.
+        self.__file.close()
+        self.__file = open(self.__journal_path, 'wb', buffering=0)
+        self.__fsync()
+        self.__snapshot_sequence = self.__sequence
+        self.__records_since_snapshot = 0
+
+
+def apply_record(repo, record: dict):
+    # Applies a journal or snapshot record to the repository.
+    if record['op'] == 'add_user':
+        repo.add_user(User(record['user_name'], record['password']))
+
+    elif record['op'] == 'add_review':
+        track = repo.get_track(record['track_id'])
+        if track is None:
+            logger.warning('Ignoring review of track %s that is not in the catalog', record['track_id'])
+            return
+        review = Review(track, record['review_text'], record['rating'])
+        review.timestamp = datetime.fromisoformat(record['timestamp'])
+        if record['user_name'] is not None:
+            if repo.get_review_for_track_by_user(track.track_id, record['user_name']) is not None:
+                # Journals written before reviews were unique per user can hold a second review of the track.
+                logger.warning('Ignoring second review of track %s by %s', track.track_id, record['user_name'])
+                return
+            review.user = repo.get_user(record['user_name'])
+        repo.add_review(review)
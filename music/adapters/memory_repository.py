@@ -1,150 +1,366 @@
-from typing import List
-from bisect import insort_left
-
-from music.adapters.repository import AbstractRepository
+from typing import Iterable, List
+import heapq
+from bisect import insort_left, bisect_left, bisect_right
+from contextlib import contextmanager
+from operator import itemgetter
+from threading import Lock
+
+from music.adapters.repository import (
+    AbstractRepository, TrackSearchResult, RepositoryException, track_search_result_of
+)
 from music.domainmodel.user import User
 from music.domainmodel.artist import Artist
 from music.domainmodel.album import Album
 from music.domainmodel.track import Track
 from music.domainmodel.review import Review
 from music.domainmodel.genre import Genre
-from music.adapters.utils import search_string, sort_entities_by_title
+from music.adapters.utils import title_sort_key, in_key_order
+from music.adapters.memory_snapshot import CatalogSnapshot
+from music.adapters.journal import RepositoryJournal
+
+
+# Merge new (key, entity) entries into a title index kept as parallel lists of keys and entities.
+# Entries with equal keys keep the existing entity first, as bisect_right does when inserting one by one.
+def merge_title_index(keys: list, entities: list, new_entries: list) -> tuple:
+    new_entries.sort(key=itemgetter(0))
+    # Both runs are ordered, so sorted() only merges them.
+    entries = sorted(list(zip(keys, entities)) + new_entries, key=itemgetter(0))
+    return [key for key, _ in entries], [entity for _, entity in entries]
+
+
+# Keyset pagination over a title index: binary search for the key, then slice the page next to it.
+def seek_after(keys: list, entities: list, key: tuple, limit: int) -> list:
+    start = bisect_right(keys, key) if key is not None else 0
+    return entities[start:start + max(limit, 0)]
+
+
+def seek_before(keys: list, entities: list, key: tuple, limit: int) -> list:
+    end = bisect_left(keys, key) if key is not None else len(keys)
+    return entities[max(end - max(limit, 0), 0):end]
 
 
 class MemoryRepository(AbstractRepository):
 
-    def __init__(self):
-        self.__users = list()
-        self.__tracks = list()
-        self.__artists = set()
-        self.__albums = set()
-        self.__genres = set()
-        self.__reviews = list()
+    def __init__(self, snapshot_reads: bool = False):
+        # All data and indexes are in one CatalogSnapshot, which every read method takes once per call.
+        self.__snapshot = CatalogSnapshot()
+        # With snapshot reads, writers publish a new snapshot instead of modifying the one readers may be using,
+        # so that concurrent readers never see a half-updated index and do not need a lock.
+        self.__snapshot_reads = snapshot_reads
+        self.__write_lock = Lock()
+        # Optional journal that makes the added users and reviews survive a restart.
+        self.__journal = None
+
+    @property
+    def snapshot(self) -> CatalogSnapshot:
+        """ The latest published snapshot. Without snapshot reads, it is modified in place by the writers. """
+        return self.__snapshot
+
+    def attach_journal(self, journal: RepositoryJournal):
+        """ Appends every following add_user and add_review to the journal. """
+        self.__journal = journal
+
+    @contextmanager
+    def __writing(self, journal_op: str = None, entity=None):
+        # Writers are serialized, and readers are never blocked.
+        with self.__write_lock:
+            journaled = journal_op is not None and self.__journal is not None
+            # A journaled write is made on a copy even without snapshot reads, so that it is not visible
+            # until the journal has it.
+            if self.__snapshot_reads or journaled:
+                snapshot = self.__snapshot.copy_for_write()
+            else:
+                snapshot = self.__snapshot
+                snapshot.version += 1
+            yield snapshot
+            # Journal the mutation before publishing it, while still holding the lock, so that the journal has
+            # the order of publishing. If the journal write fails, it raises and the mutation is dropped.
+            if journaled:
+                self.__journal.append(journal_op, entity, snapshot)
+            # Publishing is a single reference assignment, so readers see either the old or the new version.
+            self.__snapshot = snapshot
 
     def add_user(self, user: User):
         if (isinstance(user, User)):
-            self.__users.append(user)
-            print('New users:', self.__users)
+            with self.__writing('add_user', user) as snapshot:
+                # The first user added with a user name owns it, same as a linear search would find.
+                snapshot.own('users_by_name').setdefault(user.user_name, user)
 
     def get_user(self, user_name: str) -> User:
         # Username must be lowercase case-insensitive.
-        return next((user for user in self.__users if user.user_name == user_name.strip().lower()), None)
+        return self.__snapshot.users_by_name.get(user_name.strip().lower())
+
+    def get_users_by_names(self, user_names: List[str]) -> List[User]:
+        return in_key_order([user_name.strip().lower() for user_name in user_names], self.__snapshot.users_by_name)
 
     def get_track(self, track_id: int) -> Track:
         # Get a specific track by id
-        return next((track for track in self.__tracks if track.track_id == track_id), None)
+        return self.__snapshot.tracks_by_id.get(track_id)
+
+    def get_tracks_by_ids(self, track_ids: List[int]) -> List[Track]:
+        return in_key_order(track_ids, self.__snapshot.tracks_by_id)
 
     def get_tracks(self, sorting: bool = False) -> List[Track]:
+        # A copy, so that the caller cannot modify the published snapshot. Pages are read with get_tracks_page.
         if not sorting:
-            return self.__tracks
-        return sort_entities_by_title(self.__tracks)
+            return list(self.__snapshot.tracks)
+        return list(self.__snapshot.tracks_by_title)
+
+    def get_tracks_page(self, offset: int, limit: int, sorting: bool = True) -> List[Track]:
+        tracks = self.__snapshot.tracks_by_title if sorting else self.__snapshot.tracks
+        return tracks[offset:offset + limit]
+
+    def get_tracks_after(self, key: tuple, limit: int) -> List[Track]:
+        snapshot = self.__snapshot
+        return seek_after(snapshot.track_title_keys, snapshot.tracks_by_title, key, limit)
+
+    def get_tracks_before(self, key: tuple, limit: int) -> List[Track]:
+        snapshot = self.__snapshot
+        return seek_before(snapshot.track_title_keys, snapshot.tracks_by_title, key, limit)
 
     def add_track(self, track: Track):
         # Verify that the track param is type Track.
         if isinstance(track, Track):
-            insort_left(self.__tracks, track)
+            with self.__writing() as snapshot:
+                insort_left(snapshot.own('tracks'), track)
+                if track.album is not None:
+                    insort_left(snapshot.own_item('tracks_by_album', track.album.album_id, list), track)
+
+                # The binary search finds the position in O(log n), but list.insert shifts the entries after it,
+                # so adding one track costs O(n). add_many_tracks merges a whole batch in one pass instead.
+                key = title_sort_key(track.title, track.track_id)
+                position = bisect_right(snapshot.track_title_keys, key)
+                snapshot.own('track_title_keys').insert(position, key)
+                snapshot.own('tracks_by_title').insert(position, track)
+
+                self.__index_track(snapshot, track)
+
+    def add_catalog_batches(self, batches: Iterable[tuple]):
+        # The repository holds the whole catalog anyway, so the batches are gathered and added once. Adding each
+        # batch would merge it with the ordered lists and title indexes of all the tracks before it,
+        # O(n) per batch and O(n^2 / batch size) for the catalog.
+        albums, artists, genres, tracks = [], [], [], []
+        for batch_albums, batch_artists, batch_genres, batch_tracks in batches:
+            albums.extend(batch_albums)
+            artists.extend(batch_artists)
+            genres.extend(batch_genres)
+            tracks.extend(batch_tracks)
+        self.add_catalog(albums, artists, genres, tracks)
 
     def add_many_tracks(self, tracks: List[Track]):
-        for track in tracks:
-            self.add_track(track)
+        # Bulk path used to populate the repository. Inserting the tracks one by one moves O(n) elements per track,
+        # so instead sort the batch once and merge it with the ordered lists in linear time.
+        batch = sorted(track for track in tracks if isinstance(track, Track))
+        if not batch:
+            return
+
+        with self.__writing() as snapshot:
+            # sorted() merges the two ordered runs in linear time. The batch goes first so that a new track
+            # is placed in front of an equal existing one, as insort_left does.
+            snapshot.replace('tracks', sorted(batch + snapshot.tracks))
+
+            keys, tracks_by_title = merge_title_index(
+                snapshot.track_title_keys, snapshot.tracks_by_title,
+                [(title_sort_key(track.title, track.track_id), track) for track in batch])
+            snapshot.replace('track_title_keys', keys)
+            snapshot.replace('tracks_by_title', tracks_by_title)
+
+            # Build every other index in one pass over the batch.
+            updated_albums = set()
+            for track in batch:
+                if track.album is not None:
+                    snapshot.own_item('tracks_by_album', track.album.album_id, list).append(track)
+                    updated_albums.add(track.album.album_id)
+                self.__index_track(snapshot, track)
+
+            # The tracks of an album are appended in id order, so sorting only merges the old and new runs.
+            for album_id in updated_albums:
+                snapshot.tracks_by_album[album_id].sort()
 
     def get_number_of_tracks(self):
-        return len(self.__tracks)
+        return len(self.__snapshot.tracks)
 
     def get_tracks_by_album(self, album_id: int)->List[Album]:
-        # Get tracks associated with the album of the album_id using filter function
-        album_tracks = list(filter(lambda track: track.album.album_id == album_id if track.album is not None else False, self.__tracks))
-        return album_tracks
+        # Get tracks associated with the album of the album_id from the album index.
+        # Return a copy so that the caller cannot modify the index.
+        return list(self.__snapshot.tracks_by_album.get(album_id, []))
 
     def get_artists(self) -> list:
-        return list(self.__artists)
+        return list(self.__snapshot.artists)
 
     def add_artist(self, artist: Artist):
         # Verify that the artist param is type Artist.
         if (isinstance(artist, Artist)):
-            self.__artists.add(artist)
+            with self.__writing() as snapshot:
+                snapshot.own('artists').add(artist)
 
     def add_many_artists(self, artists: List[Artist]):
-        for artist in artists:
-            self.add_artist(artist)
+        with self.__writing() as snapshot:
+            snapshot.own('artists').update(artist for artist in artists if isinstance(artist, Artist))
 
     def get_album(self, album_id: int) -> Album:
         # Get a specific album by id
-        return next((album for album in self.__albums if album.album_id == album_id), None)
+        return self.__snapshot.albums_by_id.get(album_id)
+
+    def get_albums_by_ids(self, album_ids: List[int]) -> List[Album]:
+        return in_key_order(album_ids, self.__snapshot.albums_by_id)
 
     def get_albums(self, sorting: bool = False) -> list:
         if not sorting:
-            return list(self.__albums)
-        return sort_entities_by_title(list(self.__albums))
+            return list(self.__snapshot.albums)
+        # A copy of the title-ordered index, pages are read with get_albums_page.
+        return list(self.__snapshot.albums_by_title)
+
+    def get_albums_page(self, offset: int, limit: int, sorting: bool = True) -> List[Album]:
+        snapshot = self.__snapshot
+        if sorting:
+            return snapshot.albums_by_title[offset:offset + limit]
+        # The albums are kept in a set, so only the albums up to the end of the page are ordered by id.
+        return heapq.nsmallest(offset + limit, snapshot.albums)[offset:]
+
+    def get_albums_after(self, key: tuple, limit: int) -> List[Album]:
+        snapshot = self.__snapshot
+        return seek_after(snapshot.album_title_keys, snapshot.albums_by_title, key, limit)
+
+    def get_albums_before(self, key: tuple, limit: int) -> List[Album]:
+        snapshot = self.__snapshot
+        return seek_before(snapshot.album_title_keys, snapshot.albums_by_title, key, limit)
 
     def add_album(self, album: Album):
         # Verify that the album param is type Album.
         if (isinstance(album, Album)):
-            self.__albums.add(album)
+            with self.__writing() as snapshot:
+                if album in snapshot.albums:
+                    return
+                snapshot.own('albums').add(album)
+                snapshot.own('albums_by_id')[album.album_id] = album
+
+                # O(log n) to find the position, O(n) for list.insert to shift the entries after it.
+                key = title_sort_key(album.title, album.album_id)
+                position = bisect_right(snapshot.album_title_keys, key)
+                snapshot.own('album_title_keys').insert(position, key)
+                snapshot.own('albums_by_title').insert(position, album)
 
     def add_many_albums(self, albums: List[Album]):
-        for album in albums:
-            self.add_album(album)
+        # Bulk path, the title index is merged once instead of inserting each album.
+        with self.__writing() as snapshot:
+            batch = []
+            for album in albums:
+                if isinstance(album, Album) and album not in snapshot.albums:
+                    snapshot.own('albums').add(album)
+                    snapshot.own('albums_by_id')[album.album_id] = album
+                    batch.append(album)
+
+            if batch:
+                keys, albums_by_title = merge_title_index(
+                    snapshot.album_title_keys, snapshot.albums_by_title,
+                    [(title_sort_key(album.title, album.album_id), album) for album in batch])
+                snapshot.replace('album_title_keys', keys)
+                snapshot.replace('albums_by_title', albums_by_title)
 
     def get_number_of_albums(self) -> int:
-        return len(self.__albums)
+        return len(self.__snapshot.albums)
 
     def get_genres(self) -> list:
-        return list(self.__genres)
+        return list(self.__snapshot.genres)
 
     def add_genre(self, genre: Genre):
         # Verify that the genre param is type Album.
         if (isinstance(genre, Genre)):
-            self.__genres.add(genre)
+            with self.__writing() as snapshot:
+                snapshot.own('genres').add(genre)
+                self.__index_genre_name(snapshot, genre)
 
     def add_many_genres(self, genres: List[Genre]):
-        for genre in genres:
-            self.add_genre(genre)
+        with self.__writing() as snapshot:
+            for genre in genres:
+                if isinstance(genre, Genre):
+                    snapshot.own('genres').add(genre)
+                    self.__index_genre_name(snapshot, genre)
 
     def add_review(self, review: Review):
         if not isinstance(review, Review):
             return
         # call parent class first, add_review relies on implementation of code common to all derived classes
         super().add_review(review)
-        self.__reviews.append(review)
+
+        track_id = review.track.track_id
+        with self.__writing('add_review', review) as snapshot:
+            # A user reviews a track at most once, as the unique index of the database enforces.
+            if review.user is not None and (track_id, review.user.user_name) in snapshot.reviews_by_track_and_user:
+                raise RepositoryException('The user has already reviewed the track')
+            snapshot.own_item('reviews_by_track', track_id, list).append(review)
+            if review.user is not None:
+                snapshot.own('reviews_by_track_and_user')[(track_id, review.user.user_name)] = review
 
     def get_reviews_for_track(self, track_id: str) -> List[Review]:
-        # Get reviews for track. Select reviews that have a track and its track_id matches the input track_id
-        track_reviews = [
-            review for review in self.__reviews if review.track and review.track.track_id == track_id]
-        return track_reviews
+        # Get reviews for track from the track index. Return a copy so that the caller cannot modify the index.
+        return list(self.__snapshot.reviews_by_track.get(track_id, []))
+
+    def get_review_for_track_by_user(self, track_id: int, user_name: str) -> Review:
+        if user_name is None:
+            return None
+        # Username must be lowercase case-insensitive.
+        return self.__snapshot.reviews_by_track_and_user.get((track_id, user_name.strip().lower()))
+
+    def search_tracks(self, search_key: str, text: str) -> TrackSearchResult:
+        search = {
+            'title': self.search_tracks_by_title,
+            'artist': self.search_tracks_by_artist,
+            'album': self.search_tracks_by_album,
+            'genre': self.search_tracks_by_genre,
+        }[search_key]
+        # The found tracks are only references, the page window is sliced from them.
+        return track_search_result_of(search(text))
 
     def search_tracks_by_title(self, title_string: str) -> List[Track]:
         # Retrieve tracks whose title contains the title_string passed by the user search.
         # This is a case-insensitive search without trailing spaces.
-        searched_tracks = list(filter(lambda track: search_string(
-            track.title if track.title is not None else '', title_string), self.__tracks))
-        return searched_tracks
+        snapshot = self.__snapshot
+        return self.__tracks_for_ids(snapshot, snapshot.title_index.search(title_string))
 
     def search_tracks_by_artist(self, artist_name: str) -> List[Track]:
         # Retrieve tracks whose artist names contain the substring artist_name of the input parameter.
-        # Sometimes track does not have an artist, so we need to handle the case where the artist = None.
-        searched_tracks = list(filter(lambda track: search_string(
-            track.artist.full_name if track.artist is not None else '', artist_name), self.__tracks))
-
-        return searched_tracks
+        snapshot = self.__snapshot
+        return self.__tracks_for_ids(snapshot, snapshot.artist_index.search(artist_name))
 
     def search_tracks_by_album(self, album_string: str) -> List[Track]:
         # Retrive tracks whose albums contain the substring album_string of the input parameter.
-        # Sometimes track does not have an album, so we need to handle the case where the album = None.
-        searched_tracks = list(filter(lambda track: search_string(
-            track.album.title if track.album is not None else '', album_string), self.__tracks))
-
-        return searched_tracks
+        snapshot = self.__snapshot
+        return self.__tracks_for_ids(snapshot, snapshot.album_index.search(album_string))
 
     def search_tracks_by_genre(self, genre_string: str) -> List[Track]:
         # Search for tracks based on its list of genres.
         # If any of its genre name contains the input substring genre_string, the track will be searched.
-        searched_tracks = []
-        for track in self.__tracks:
-            for genre in track.genres:
-                if search_string(genre.name, genre_string):
-                    searched_tracks.append(track)
-                    break
-
-        return searched_tracks
+        # Match the small genre vocabulary first, then merge the track ids of the matching genres.
+        snapshot = self.__snapshot
+        query = genre_string.strip().lower()
+        track_ids = set()
+        for genre_id, genre_name in snapshot.genre_names.items():
+            if query in genre_name:
+                track_ids.update(snapshot.tracks_by_genre.get(genre_id, ()))
+
+        return self.__tracks_for_ids(snapshot, sorted(track_ids))
+
+    def __index_track(self, snapshot: CatalogSnapshot, track: Track):
+        # Update the indexes that do not depend on the order in which tracks are added.
+        # The latest track added with an id wins it, as it is placed in front of an equal track in the list.
+        snapshot.own('tracks_by_id')[track.track_id] = track
+
+        # Sometimes track does not have an artist or an album, they are indexed as empty names.
+        snapshot.own('title_index').add(track.track_id, track.title)
+        snapshot.own('artist_index').add(
+            track.track_id, track.artist.full_name if track.artist is not None else None)
+        snapshot.own('album_index').add(
+            track.track_id, track.album.title if track.album is not None else None)
+
+        for genre in track.genres:
+            self.__index_genre_name(snapshot, genre)
+            snapshot.own_item('tracks_by_genre', genre.genre_id, set).add(track.track_id)
+
+    def __index_genre_name(self, snapshot: CatalogSnapshot, genre: Genre):
+        snapshot.own('genre_names')[genre.genre_id] = genre.name.lower() if genre.name is not None else ''
+
+    def __tracks_for_ids(self, snapshot: CatalogSnapshot, track_ids: List[int]) -> List[Track]:
+        # Map the ids found by an index to the tracks, keeping the order of the ids.
+        return [snapshot.tracks_by_id[track_id] for track_id in track_ids]
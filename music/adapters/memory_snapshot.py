@@ -0,0 +1,91 @@
+import copy
+
+from music.adapters.search_index import NGramIndex
+from music.adapters.sharded_dict import ShardedDict
+
+
+class CatalogSnapshot:
+    """ One version of all the data and indexes of the MemoryRepository.
+
+    A published snapshot is never modified. A writer works on copy_for_write() of the latest snapshot,
+    which shares every container with it and copies a container only the first time it is modified
+    through own(), own_item() or replace(). A snapshot that was never copied owns all of its containers,
+    so it is modified in place.
+
+    The users and reviews are written one at a time while serving requests, so their indexes are ShardedDicts,
+    of which a write copies only the shard it modifies. The catalog is written in bulk, and a catalog write
+    copies the ordered lists of tracks and albums anyway.
+    """
+
+    def __init__(self):
+        self.version = 0
+
+        self.tracks = list()
+        self.artists = set()
+        self.albums = set()
+        self.genres = set()
+
+        # Primary-key indexes for O(1) lookups.
+        self.users_by_name = ShardedDict()
+        self.tracks_by_id = dict()
+        self.albums_by_id = dict()
+
+        # Secondary index of album_id -> tracks of the album ordered by track id.
+        self.tracks_by_album = dict()
+
+        # Review indexes of track_id -> reviews and (track_id, user_name) -> review.
+        self.reviews_by_track = ShardedDict()
+        self.reviews_by_track_and_user = ShardedDict()
+
+        # Title-ordered indexes with precomputed sort keys. The keys and the entities are parallel lists,
+        # so that the id-ordered list of tracks is never re-sorted.
+        self.track_title_keys = list()
+        self.tracks_by_title = list()
+        self.album_title_keys = list()
+        self.albums_by_title = list()
+
+        # Trigram indexes for the substring searches on track title, artist name and album title.
+        self.title_index = NGramIndex()
+        self.artist_index = NGramIndex()
+        self.album_index = NGramIndex()
+
+        # Genre vocabulary of genre_id -> lowercase name, and the inverted index of genre_id -> track ids.
+        self.genre_names = dict()
+        self.tracks_by_genre = dict()
+
+        # Names of the containers, and (name, key) pairs of the nested containers, owned by this snapshot.
+        # None means that it owns every container.
+        self.__owned = None
+
+    def copy_for_write(self) -> 'CatalogSnapshot':
+        snapshot = copy.copy(self)
+        snapshot.version = self.version + 1
+        snapshot.__owned = set()
+        return snapshot
+
+    def own(self, name: str):
+        # Returns the container to modify in place, copying it first if it is shared with a published snapshot.
+        container = getattr(self, name)
+        if self.__owned is not None and name not in self.__owned:
+            container = copy.copy(container)
+            setattr(self, name, container)
+            self.__owned.add(name)
+        return container
+
+    def own_item(self, name: str, key, empty):
+        # Same as own() for a container nested in the dict of the name. empty() creates a missing container.
+        container = self.own(name)
+        item = container.get(key)
+        if item is None:
+            item = container[key] = empty()
+        elif self.__owned is not None and (name, key) not in self.__owned:
+            item = container[key] = copy.copy(item)
+        if self.__owned is not None:
+            self.__owned.add((name, key))
+        return item
+
+    def replace(self, name: str, container):
+        # Replaces a container with a newly built one, which this snapshot owns.
+        setattr(self, name, container)
+        if self.__owned is not None:
+            self.__owned.add(name)
@@ -0,0 +1,87 @@
+import logging
+
+from sqlalchemy import inspect, bindparam, select, func, Table, Column, MetaData
+
+from music.adapters.orm import (
+    metadata, tracks_table, albums_table, reviews_table, track_genres_table, versions_table, create_full_text_index,
+    create_trigram_indexes
+)
+from music.adapters.utils import title_for_sorting
+
+# A child of the logger of the Flask app, so that the messages go to app.logger.
+logger = logging.getLogger(__name__)
+
+
+# Upgrades a database created by an earlier version of the application to the current schema.
+# Every step checks the schema first, so running the upgrade again does nothing.
+def upgrade_database(connection):
+    versions_table.create(connection, checkfirst=True)
+    for table in (tracks_table, albums_table):
+        add_sort_key_column(connection, table)
+
+    # The rows that break the unique indexes are removed before the indexes are created.
+    for table in (reviews_table, track_genres_table):
+        for index in table.indexes:
+            if index.unique and not has_index(connection, index):
+                remove_duplicate_rows(connection, table, tuple(column.name for column in index.columns))
+    create_missing_indexes(connection)
+    # Indexes replaced by composite indexes that start with the same column.
+    for index_name in ('ix_tracks_sort_key', 'ix_albums_sort_key', 'ix_reviews_track_id'):
+        connection.exec_driver_sql(f'DROP INDEX IF EXISTS {index_name}')
+
+    create_full_text_index(connection)
+    create_trigram_indexes(connection)
+
+
+def backup_table(table) -> Table:
+    # Table with the columns of the table, without its keys and indexes, that keeps the rows removed from it.
+    return Table(f'{table.name}_duplicates', MetaData(),
+                 *[Column(column.name, column.type) for column in table.columns])
+
+
+def remove_duplicate_rows(connection, table, column_names: tuple):
+    # Keeps the first row, by primary key, of each combination of the columns.
+    # Rows with a NULL column are not duplicates, as for a unique index.
+    # The removed rows may have been written by users, so they are copied to the backup table and logged.
+    id_column = table.primary_key.columns.values()[0]
+    columns = [table.c[name] for name in column_names]
+    first_ids = select(func.min(id_column)).where(*[column.isnot(None) for column in columns]).group_by(*columns)
+    duplicate = [*[column.isnot(None) for column in columns], id_column.not_in(first_ids.scalar_subquery())]
+
+    duplicate_ids = connection.execute(select(id_column).where(*duplicate).order_by(id_column)).scalars().all()
+    if not duplicate_ids:
+        return
+    backup = backup_table(table)
+    backup.create(connection, checkfirst=True)
+    connection.execute(backup.insert().from_select(
+        [column.name for column in table.columns], table.select().where(*duplicate)))
+    connection.execute(table.delete().where(*duplicate))
+    logger.warning('Removed %d duplicate rows of %s and kept them in %s, %s: %s', len(duplicate_ids), table.name,
+                   backup.name, id_column.name, duplicate_ids)
+
+
+def has_index(connection, index) -> bool:
+    return index.name in [existing['name'] for existing in inspect(connection).get_indexes(index.table.name)]
+
+
+def create_missing_indexes(connection):
+    for table in metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(connection, checkfirst=True)
+
+
+def add_sort_key_column(connection, table):
+    # Adds the sort_key column and fills it from the titles of the existing rows.
+    column_names = [column['name'] for column in inspect(connection).get_columns(table.name)]
+    if 'sort_key' not in column_names:
+        sort_key_type = table.c.sort_key.type.compile(dialect=connection.dialect)
+        connection.exec_driver_sql(f'ALTER TABLE {table.name} ADD COLUMN sort_key {sort_key_type}')
+
+    id_column = table.primary_key.columns.values()[0]
+    rows = connection.execute(
+        table.select().with_only_columns(id_column, table.c.title).where(table.c.sort_key.is_(None))).all()
+    if rows:
+        connection.execute(
+            table.update().where(id_column == bindparam('row_id')).values(sort_key=bindparam('row_sort_key')),
+            [{'row_id': row_id, 'row_sort_key': title_for_sorting(title or '')} for row_id, title in rows])
+
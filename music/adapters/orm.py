@@ -1,7 +1,9 @@
+import re
+
 from sqlalchemy import (
-    Table, MetaData, Column, Integer, String, DateTime, ForeignKey
+    Table, MetaData, Column, Integer, String, DateTime, ForeignKey, Index, DDL, event, inspect
 )
-from sqlalchemy.orm import mapper, relationship
+from sqlalchemy.orm import mapper, relationship, Mapper
 
 from music.domainmodel.user import User
 from music.domainmodel.artist import Artist
@@ -9,11 +11,24 @@ from music.domainmodel.album import Album
 from music.domainmodel.track import Track
 from music.domainmodel.review import Review
 from music.domainmodel.genre import Genre
+from music.adapters.utils import title_for_sorting, FTS_GENRE_SEPARATOR
 
 
 # Global variable giving access to the MetaData (schema) information of the database
 metadata = MetaData()
 
+
+# Default of the sort_key columns, computed from the title of the inserted row,
+# so that the browse pages are ordered by an index instead of sorting the titles in Python.
+def title_sort_key_default(context) -> str:
+    return title_for_sorting(context.get_current_parameters()['title'] or '')
+
+
+# The sort keys are ordered by their code points, as by SQLite and by Python in the memory repository,
+# whatever the collation of a PostgreSQL database.
+SORT_KEY_TYPE = String(256).with_variant(String(256, collation='C'), 'postgresql')
+
+
 users_table = Table(
     'users', metadata,
     Column('user_id', Integer, primary_key=True, autoincrement=True),
@@ -29,6 +44,9 @@ albums_table = Table(
     Column('album_url', String(255), nullable=True),
     Column('album_type', String(255), nullable=True),
     Column('release_year', Integer, nullable=True),
+    Column('sort_key', SORT_KEY_TYPE, default=title_sort_key_default),
+    # Keyset pagination seeks the (sort_key, album_id) of the page boundary in this index.
+    Index('ix_albums_sort_key_album_id', 'sort_key', 'album_id'),
 )
 
 artists_table = Table(
@@ -43,8 +61,10 @@ tracks_table = Table(
     Column('title', String(255), nullable=False),
     Column('track_url', String(255), nullable=True),
     Column('track_duration', Integer, nullable=True),  # duration in seconds
-    Column('artist_id', ForeignKey('artists.artist_id')),
-    Column('album_id', ForeignKey('albums.album_id')),
+    Column('artist_id', ForeignKey('artists.artist_id'), index=True),
+    Column('album_id', ForeignKey('albums.album_id'), index=True),
+    Column('sort_key', SORT_KEY_TYPE, default=title_sort_key_default),
+    Index('ix_tracks_sort_key_track_id', 'sort_key', 'track_id'),
 )
 
 genres_table = Table(
@@ -61,7 +81,9 @@ reviews_table = Table(
     Column('review_text', String(255), nullable=False),
     Column('rating', Integer, nullable=False),  # integer rating 1 - 5
     Column('track_id', ForeignKey('tracks.track_id')),
-    Column('user_id', ForeignKey('users.user_id')),
+    Column('user_id', ForeignKey('users.user_id'), index=True),
+    # A user reviews a track at most once. The index also finds the reviews of a track.
+    Index('uq_reviews_track_id_user_id', 'track_id', 'user_id', unique=True),
 )
 
 
@@ -71,9 +93,211 @@ track_genres_table = Table(
     'track_genres', metadata,
     Column('id', Integer, primary_key=True, autoincrement=True),
     Column('track_id', ForeignKey('tracks.track_id')),
-    Column('genre_id', ForeignKey('genres.genre_id'))
+    Column('genre_id', ForeignKey('genres.genre_id')),
+    # The genres of a track, and the tracks of a genre, are both found from the index alone.
+    Index('ix_track_genres_track_id_genre_id', 'track_id', 'genre_id', unique=True),
+    Index('ix_track_genres_genre_id_track_id', 'genre_id', 'track_id'),
+)
+
+# Versions of the data cached by the processes, each incremented by the writes of its data, so that a process
+# notices that its cache is out of date when another process wrote the data. See REFERENCE_DATA_VERSION.
+versions_table = Table(
+    'versions', metadata,
+    Column('name', String(64), primary_key=True),
+    Column('version', Integer, nullable=False),
+)
+
+# Version of the albums, artists and genres.
+REFERENCE_DATA_VERSION = 'reference_data'
+
+
+# Full-text index of the track catalog as an SQLite FTS5 virtual table, whose rowid is the track_id.
+# It is not part of the metadata, as it is only created when the SQLite library has FTS5 compiled in.
+# The triggers keep it in sync with the tracks, albums, artists, genres and track_genres tables.
+# Its trigram tokenizer matches substrings, so that it finds the same tracks as the substring search.
+tracks_fts_table = Table(
+    'tracks_fts', MetaData(),
+    Column('rowid', Integer, primary_key=True),
+    Column('title', String),
+    Column('artist', String),
+    Column('album', String),
+    Column('genres', String),
 )
 
+# Genre names of a track, separated by FTS_GENRE_SEPARATOR.
+FTS_GENRES_OF_TRACK = f"""(SELECT group_concat(genres.name, char({ord(FTS_GENRE_SEPARATOR)})) FROM track_genres
+    JOIN genres ON genres.genre_id = track_genres.genre_id WHERE track_genres.track_id = {{track_id}})"""
+
+FTS_INSERT_TRACK = f"""INSERT INTO tracks_fts (rowid, title, artist, album, genres) VALUES (
+    new.track_id, new.title,
+    (SELECT full_name FROM artists WHERE artists.artist_id = new.artist_id),
+    (SELECT title FROM albums WHERE albums.album_id = new.album_id),
+    {FTS_GENRES_OF_TRACK.format(track_id='new.track_id')});"""
+
+TRACKS_FTS_DDL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS tracks_fts USING fts5(title, artist, album, genres, tokenize='trigram')",
+    f"""CREATE TRIGGER IF NOT EXISTS tracks_fts_track_insert AFTER INSERT ON tracks BEGIN
+    {FTS_INSERT_TRACK}
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS tracks_fts_track_update AFTER UPDATE ON tracks BEGIN
+    DELETE FROM tracks_fts WHERE rowid = old.track_id;
+    {FTS_INSERT_TRACK}
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS tracks_fts_track_delete AFTER DELETE ON tracks BEGIN
+    DELETE FROM tracks_fts WHERE rowid = old.track_id;
+    END""",
+] + [
+    # Albums and artists may be inserted after their tracks, renamed, and deleted.
+    f"""CREATE TRIGGER IF NOT EXISTS tracks_fts_{table}_{event_name} AFTER {event_name.upper()} ON {table} BEGIN
+    UPDATE tracks_fts SET {fts_column} = {name}
+    WHERE rowid IN (SELECT track_id FROM tracks WHERE tracks.{id_column} = {row}.{id_column});
+    END"""
+    for table, fts_column, name_column, id_column in [
+        ('albums', 'album', 'title', 'album_id'),
+        ('artists', 'artist', 'full_name', 'artist_id'),
+    ]
+    for event_name, row, name in [
+        ('insert', 'new', f'new.{name_column}'), ('update', 'new', f'new.{name_column}'), ('delete', 'old', 'NULL')]
+] + [
+    f"""CREATE TRIGGER IF NOT EXISTS tracks_fts_track_genres_{event_name} AFTER {event_name.upper()} ON track_genres
+    BEGIN
+    UPDATE tracks_fts SET genres = {FTS_GENRES_OF_TRACK.format(track_id=f'{row}.track_id')}
+    WHERE rowid = {row}.track_id;
+    END"""
+    for event_name, row in [('insert', 'new'), ('delete', 'old')]
+] + [
+    # Genres may be inserted after the track_genres rows of their tracks, renamed, and deleted.
+    f"""CREATE TRIGGER IF NOT EXISTS tracks_fts_genres_{event_name} AFTER {event_name.upper()} ON genres BEGIN
+    UPDATE tracks_fts SET genres = {FTS_GENRES_OF_TRACK.format(track_id='tracks_fts.rowid')}
+    WHERE rowid IN (SELECT track_id FROM track_genres WHERE track_genres.genre_id = {row}.genre_id);
+    END"""
+    for event_name, row in [('insert', 'new'), ('update', 'new'), ('delete', 'old')]
+]
+
+# Names of the triggers of the full-text index.
+TRACKS_FTS_TRIGGERS = [re.match(r'CREATE TRIGGER IF NOT EXISTS (\w+)', statement).group(1)
+                       for statement in TRACKS_FTS_DDL if statement.startswith('CREATE TRIGGER')]
+
+# Fills the full-text index with the tracks that are already in the database.
+TRACKS_FTS_REBUILD = f"""INSERT INTO tracks_fts (rowid, title, artist, album, genres)
+    SELECT tracks.track_id, tracks.title, artists.full_name, albums.title,
+    {FTS_GENRES_OF_TRACK.format(track_id='tracks.track_id')}
+    FROM tracks
+    LEFT JOIN artists ON artists.artist_id = tracks.artist_id
+    LEFT JOIN albums ON albums.album_id = tracks.album_id"""
+
+
+# First SQLite version with the trigram tokenizer of FTS5.
+FTS_TRIGRAM_SQLITE_VERSION = (3, 34, 0)
+
+
+def sqlite_has_fts5(bind) -> bool:
+    # FTS5 compiled in, with the trigram tokenizer of SQLite 3.34.
+    if bind.dialect.name != 'sqlite':
+        return False
+    compile_options = [row[0] for row in bind.exec_driver_sql('PRAGMA compile_options')]
+    version = tuple(int(part) for part in bind.exec_driver_sql('SELECT sqlite_version()').scalar().split('.'))
+    return 'ENABLE_FTS5' in compile_options and version >= FTS_TRIGRAM_SQLITE_VERSION
+
+
+def full_text_index_sql(bind):
+    # SQL that created the full-text index, None if there is none.
+    if bind.dialect.name != 'sqlite':
+        return None
+    return bind.exec_driver_sql("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'tracks_fts'").scalar()
+
+
+def has_full_text_index(bind) -> bool:
+    # Indexes created by earlier versions tokenized words, they cannot answer the substring search.
+    table_sql = full_text_index_sql(bind)
+    return table_sql is not None and "tokenize='trigram'" in table_sql
+
+
+def is_full_text_index_current(connection) -> bool:
+    # Indexes created by earlier versions also missed some of the triggers.
+    trigger_names = connection.exec_driver_sql(
+        "SELECT name FROM sqlite_master WHERE type = 'trigger'").scalars().all()
+    return has_full_text_index(connection) and set(TRACKS_FTS_TRIGGERS) <= set(trigger_names)
+
+
+def create_full_text_index(connection):
+    """ Creates the full-text index of an existing database and fills it with its tracks. An index created by
+    an earlier version is rebuilt. Does nothing if the index is current or if FTS5 is not compiled in. """
+    if not sqlite_has_fts5(connection):
+        return
+    if full_text_index_sql(connection) is not None:
+        if is_full_text_index_current(connection):
+            return
+        trigger_names = connection.exec_driver_sql(
+            "SELECT name FROM sqlite_master WHERE type = 'trigger' AND name LIKE 'tracks/_fts/_%' ESCAPE '/'"
+        ).scalars().all()
+        for trigger_name in trigger_names:
+            connection.exec_driver_sql(f'DROP TRIGGER {trigger_name}')
+        connection.exec_driver_sql('DROP TABLE tracks_fts')
+    for statement in TRACKS_FTS_DDL:
+        connection.exec_driver_sql(statement)
+    connection.exec_driver_sql(TRACKS_FTS_REBUILD)
+
+
+# Create the full-text index along with the tables, when FTS5 is available.
+for fts_statement in TRACKS_FTS_DDL:
+    event.listen(metadata, 'after_create', DDL(fts_statement).execute_if(
+        callable_=lambda ddl, target, bind, **kw: sqlite_has_fts5(bind)))
+event.listen(metadata, 'before_drop', DDL('DROP TABLE IF EXISTS tracks_fts').execute_if(dialect='sqlite'))
+
+
+# Trigram GIN indexes of PostgreSQL on the names searched by substring. The case-insensitive substring search
+# (ILIKE '%text%') looks up the trigrams of the text in them instead of reading every row.
+# They need the pg_trgm extension, and are not created on SQLite, whose LIKE cannot use them.
+TRIGRAM_INDEXES = {
+    'ix_tracks_title_trgm': (tracks_table, 'title'),
+    'ix_artists_full_name_trgm': (artists_table, 'full_name'),
+    'ix_albums_title_trgm': (albums_table, 'title'),
+}
+
+PG_TRGM_DDL = 'CREATE EXTENSION IF NOT EXISTS pg_trgm'
+
+
+def trigram_index_ddl(index_name: str) -> str:
+    table, column_name = TRIGRAM_INDEXES[index_name]
+    return f'CREATE INDEX IF NOT EXISTS {index_name} ON {table.name} USING gin ({column_name} gin_trgm_ops)'
+
+
+def create_trigram_indexes(connection):
+    """ Creates the pg_trgm extension and the trigram indexes of an existing PostgreSQL database.
+    Does nothing on other databases. """
+    if connection.dialect.name != 'postgresql':
+        return
+    connection.exec_driver_sql(PG_TRGM_DDL)
+    for index_name in TRIGRAM_INDEXES:
+        connection.exec_driver_sql(trigram_index_ddl(index_name))
+
+
+# Create the trigram indexes along with their tables on PostgreSQL.
+event.listen(metadata, 'before_create', DDL(PG_TRGM_DDL).execute_if(dialect='postgresql'))
+for trigram_index_name, (trigram_table, _) in TRIGRAM_INDEXES.items():
+    event.listen(trigram_table, 'after_create', DDL(trigram_index_ddl(trigram_index_name)).execute_if(
+        dialect='postgresql'))
+
+# Table and (id, title) attributes of the mapped classes whose rows have a sort_key.
+SORT_KEY_TABLES = {
+    Track: (tracks_table, '_Track__track_id', '_Track__title'),
+    Album: (albums_table, '_Album__album_id', '_Album__title'),
+}
+
+
+@event.listens_for(Mapper, 'after_update')
+def update_title_sort_key(mapper, connection, target):
+    # The sort_key column is not mapped, so it is updated along with a changed title.
+    if type(target) not in SORT_KEY_TABLES:
+        return
+    table, id_attribute, title_attribute = SORT_KEY_TABLES[type(target)]
+    if inspect(target).attrs[title_attribute].history.has_changes():
+        title = getattr(target, title_attribute)
+        id_column = table.primary_key.columns.values()[0]
+        connection.execute(table.update().where(id_column == getattr(target, id_attribute)).values(
+            sort_key=title_for_sorting(title or '')))
+
 
 def map_model_to_tables():
     mapper(User, users_table, properties={
@@ -81,7 +305,7 @@ def map_model_to_tables():
         '_User__user_name': users_table.c.user_name,
         '_User__password': users_table.c.password,
     })
-    mapper(Album, albums_table, properties={
+    mapper(Album, albums_table, exclude_properties=['sort_key'], properties={
         '_Album__album_id': albums_table.c.album_id,
         '_Album__title': albums_table.c.title,
         '_Album__album_url': albums_table.c.album_url,
@@ -92,7 +316,7 @@ def map_model_to_tables():
         '_Artist__artist_id': artists_table.c.artist_id,
         '_Artist__full_name': artists_table.c.full_name,
     })
-    mapper(Track, tracks_table, properties={
+    mapper(Track, tracks_table, exclude_properties=['sort_key'], properties={
         '_Track__track_id': tracks_table.c.track_id,
         '_Track__title': tracks_table.c.title,
         '_Track__track_url': tracks_table.c.track_url,
@@ -0,0 +1,94 @@
+from threading import Lock
+from typing import Callable, Dict, List, Tuple
+
+from music.domainmodel.artist import Artist
+from music.domainmodel.album import Album
+from music.domainmodel.genre import Genre
+
+
+class ReferenceData:
+    """ One version of the albums, artists and genres of the ReferenceDataCache. It is never modified.
+    database_version is the version of the reference data in the database when it was loaded. """
+
+    def __init__(self, database_version: int, albums: List[Album], artists: List[Artist], genres: List[Genre]):
+        self.database_version = database_version
+        self.albums = albums
+        self.artists = artists
+        self.genres = genres
+        self.albums_by_id: Dict[int, Album] = {album.album_id: album for album in albums}
+        self.artists_by_id: Dict[int, Artist] = {artist.artist_id: artist for artist in artists}
+        self.genres_by_id: Dict[int, Genre] = {genre.genre_id: genre for genre in genres}
+
+
+class ReferenceDataCache:
+    """ Process-wide, read-mostly cache of the albums, artists and genres, which hardly ever change once the
+    catalog is populated.
+
+    Readers take the published ReferenceData without a lock. It is loaded on the first read after start-up,
+    after an invalidation, or when the database holds a later version of the reference data. Adding an album,
+    artist or genre invalidates it in this process, and increments the version in the database, so that the
+    other processes load it again too. The cached entities are detached from any session, and are only handed
+    out as copies merged into a session, see SessionReferenceData.
+    """
+
+    def __init__(self, load: Callable[[], Tuple[int, List[Album], List[Artist], List[Genre]]]):
+        # load() returns the version of the reference data in the database, then the albums, artists and genres,
+        # detached from any session. The version is read first, so the entities are at least as recent.
+        self.__load = load
+        self.__lock = Lock()
+        self.__data = None
+
+    def get(self, database_version: int = 0) -> ReferenceData:
+        """ Returns the reference data, loaded again if it is older than database_version. """
+        data = self.__data
+        if data is not None and data.database_version >= database_version:
+            return data
+
+        # Loading holds the lock, so that concurrent readers load only once, and an invalidation waits for the
+        # load to be published before dropping it.
+        with self.__lock:
+            if self.__data is None or self.__data.database_version < database_version:
+                self.__data = ReferenceData(*self.__load())
+            return self.__data
+
+    def invalidate(self):
+        with self.__lock:
+            self.__data = None
+
+
+class SessionReferenceData:
+    """ The reference data seen by one session. Each cached entity is merged into the session on its first use,
+    without a SELECT, so the session gets its own copy: lazy loads, cascades and merges through it run in that
+    session, and the cached entity is never shared. """
+
+    def __init__(self, data: ReferenceData, session):
+        self.data = data
+        self.__session = session
+        # Copies in the session, by the id() of the cached entity.
+        self.__merged = {}
+
+    def album(self, album_id: int) -> Album:
+        return self.__attached(self.data.albums_by_id.get(album_id))
+
+    def artist(self, artist_id: int) -> Artist:
+        return self.__attached(self.data.artists_by_id.get(artist_id))
+
+    def genre(self, genre_id: int) -> Genre:
+        return self.__attached(self.data.genres_by_id.get(genre_id))
+
+    def albums(self) -> List[Album]:
+        return [self.__attached(album) for album in self.data.albums]
+
+    def artists(self) -> List[Artist]:
+        return [self.__attached(artist) for artist in self.data.artists]
+
+    def genres(self) -> List[Genre]:
+        return [self.__attached(genre) for genre in self.data.genres]
+
+    def __attached(self, entity):
+        if entity is None:
+            return None
+        merged = self.__merged.get(id(entity))
+        if merged is None:
+            merged = self.__merged[id(entity)] = self.__session.merge(entity, load=False)
+        return merged
@@ -1,5 +1,5 @@
 import abc
-from typing import List
+from typing import Iterable, List
 
 from music.domainmodel.user import User
 from music.domainmodel.artist import Artist
@@ -9,6 +9,11 @@ from music.domainmodel.review import Review
 from music.domainmodel.genre import Genre
 
 repo_instance = None
+# AsyncSqlAlchemyRepository over the database of repo_instance, used by the async views when it is set.
+async_repo_instance = None
+
+# Fields that tracks can be searched by.
+SEARCH_KEYS = ('title', 'artist', 'album', 'genre')
 
 
 class RepositoryException(Exception):
@@ -16,6 +21,30 @@ class RepositoryException(Exception):
         print(f'RepositoryException: {message}')
 
 
+class TrackSearchResult:
+    """ Result of a track search. It carries the total number of tracks found,
+    and fetches the tracks only for the requested page window. """
+
+    def __init__(self, total: int, fetch_tracks):
+        # fetch_tracks(offset, limit) returns the found tracks in the window as a list.
+        self.__total = total
+        self.__fetch_tracks = fetch_tracks
+
+    @property
+    def total(self) -> int:
+        return self.__total
+
+    def get_tracks(self, offset: int, limit: int) -> List[Track]:
+        if offset >= self.__total or limit <= 0:
+            return []
+        return self.__fetch_tracks(offset, limit)
+
+
+def track_search_result_of(tracks: List[Track]) -> TrackSearchResult:
+    # Search result over a list of tracks that has already been found.
+    return TrackSearchResult(len(tracks), lambda offset, limit: tracks[offset:offset + limit])
+
+
 class AbstractRepository(abc.ABC):
 
     @abc.abstractmethod
@@ -31,17 +60,47 @@ class AbstractRepository(abc.ABC):
         """
         raise NotImplementedError
 
+    @abc.abstractmethod
+    def get_users_by_names(self, user_names: List[str]) -> List[User]:
+        """ Returns the Users named user_names, in the order of the names.
+        Names without a User are skipped. """
+        raise NotImplementedError
+
     @abc.abstractmethod
     def get_tracks(self, sorting: bool) -> List[Track]:
         """ Returns the list of tracks. """
         raise NotImplementedError
 
+    @abc.abstractmethod
+    def get_tracks_page(self, offset: int, limit: int, sorting: bool = True) -> List[Track]:
+        """ Returns at most limit tracks, starting at offset, ordered by title if sorting, otherwise by id.
+        Only the tracks of the page are fetched. """
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def get_tracks_after(self, key: tuple, limit: int) -> List[Track]:
+        """ Returns at most limit tracks in title order that come after the (title sort key, track id) key,
+        or the first tracks if key is None. The tracks are found by seeking the key, not by skipping an offset. """
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def get_tracks_before(self, key: tuple, limit: int) -> List[Track]:
+        """ Returns at most limit tracks in title order that come right before the (title sort key, track id) key,
+        or the last tracks if key is None. """
+        raise NotImplementedError
+
     @abc.abstractmethod
     def get_track(self, track_id: int) -> Track:
         """ Reutrns the track of the parameter track_id.
         If the track of the specified track_id does not exist, returns None. """
         raise NotImplementedError
 
+    @abc.abstractmethod
+    def get_tracks_by_ids(self, track_ids: List[int]) -> List[Track]:
+        """ Returns the tracks of track_ids in one lookup, in the order of the ids.
+        Ids without a track are skipped. """
+        raise NotImplementedError
+
     @abc.abstractmethod
     def add_track(self, track: Track):
         """ Add a track to the repository list of tracks. """
@@ -82,11 +141,35 @@ class AbstractRepository(abc.ABC):
         """ Return a specific album of the album_id param from the repository. """
         raise NotImplementedError
 
+    @abc.abstractmethod
+    def get_albums_by_ids(self, album_ids: List[int]) -> List[Album]:
+        """ Returns the albums of album_ids in one lookup, in the order of the ids.
+        Ids without an album are skipped. """
+        raise NotImplementedError
+
     @abc.abstractmethod
     def get_albums(self, sorting: bool) -> list:
         """ Returns albums as a list from the repository. """
         raise NotImplementedError
     
+    @abc.abstractmethod
+    def get_albums_page(self, offset: int, limit: int, sorting: bool = True) -> List[Album]:
+        """ Returns at most limit albums, starting at offset, ordered by title if sorting, otherwise by id.
+        Only the albums of the page are fetched. """
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def get_albums_after(self, key: tuple, limit: int) -> List[Album]:
+        """ Returns at most limit albums in title order that come after the (title sort key, album id) key,
+        or the first albums if key is None. """
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def get_albums_before(self, key: tuple, limit: int) -> List[Album]:
+        """ Returns at most limit albums in title order that come right before the (title sort key, album id) key,
+        or the last albums if key is None. """
+        raise NotImplementedError
+
     @abc.abstractmethod
     def add_album(self, album: Album):
         """ Add an album to the repository. """
@@ -117,11 +200,27 @@ class AbstractRepository(abc.ABC):
         """ Add many genres to the repository. """
         raise NotImplementedError
 
+    def add_catalog(self, albums: List[Album], artists: List[Artist], genres: List[Genre], tracks: List[Track]):
+        """ Adds the albums, artists, genres and tracks read from the csv files.
+        Repositories with a faster way to fill an empty store override this. """
+        self.add_many_albums(albums)
+        self.add_many_artists(artists)
+        self.add_many_genres(genres)
+        # add_many_tracks is the bulk path that builds the indexes in one pass.
+        self.add_many_tracks(tracks)
+
+    def add_catalog_batches(self, batches: Iterable[tuple]):
+        """ Adds the catalog streamed by TrackCSVReader.read_csv_files_in_batches, one batch at a time, so that
+        only a batch is held in memory. Each batch is a tuple of albums, artists, genres and tracks, where the
+        albums, artists and genres are those not added by an earlier batch. """
+        for albums, artists, genres, tracks in batches:
+            self.add_catalog(albums, artists, genres, tracks)
+
     @abc.abstractmethod
     def add_review(self, review: Review):
         """ Adds a Review to the repository.
-        If the Review doesn't have a link to the track, this method raises a
-        RepositoryException and doesn't update the repository.
+        If the Review doesn't have a link to the track, or its user has already reviewed the track,
+        this method raises a RepositoryException and doesn't update the repository.
         """
         if review.track is None:
             raise RepositoryException(
@@ -133,6 +232,22 @@ class AbstractRepository(abc.ABC):
         Returns a list of reviews for this track as a list. """
         raise NotImplementedError
 
+    @abc.abstractmethod
+    def get_review_for_track_by_user(self, track_id: int, user_name: str) -> Review:
+        """ Returns the review made by the user of user_name for the track of track_id.
+        If the user has not reviewed the track, returns None. """
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def search_tracks(self, search_key: str, text: str) -> TrackSearchResult:
+        """ Search for the tracks by one of the SEARCH_KEYS: 'title' | 'artist' | 'album' | 'genre'.
+        It has the same semantics as the search_tracks_by_* method of the search_key.
+        Returns a TrackSearchResult, so that only the tracks of the requested page are fetched.
+        Every repository finds the same tracks, the substring matches. They are ordered by track id, except by a
+        database repository with a full-text index, which ranks them by relevance first.
+        """
+        raise NotImplementedError
+
     @abc.abstractmethod
     def search_tracks_by_artist(self, artist_name: str) -> List[Track]:
         """Search for the tracks whose artist contains the input artist_name string.
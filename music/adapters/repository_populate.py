@@ -4,7 +4,8 @@ from music.adapters.csvdatareader import TrackCSVReader
 
 
 # Populate the memory repository with the data from the csv files using the csv reader.
-def populate(data_path: Path, repo: AbstractRepository, testing: bool, database_mode: bool):
+# With a batch_size, the tracks csv file is streamed into the repository in batches of that many tracks.
+def populate(data_path: Path, repo: AbstractRepository, testing: bool, database_mode: bool, batch_size: int = None):
     if testing:
         # Different files for the testing mode.
         albums_filename = str(Path(data_path) / "raw_albums_test.csv")
@@ -17,10 +18,16 @@ def populate(data_path: Path, repo: AbstractRepository, testing: bool, database_
     reader = TrackCSVReader(albums_filename, tracks_filename)
 
     # Populate repository data (including database if it is a database mode)
-    populate_repository(reader, repo)
+    populate_repository(reader, repo, batch_size)
 
 # Populate repository for both memory and database mode
-def populate_repository(reader: TrackCSVReader, repo: AbstractRepository):
+def populate_repository(reader: TrackCSVReader, repo: AbstractRepository, batch_size: int = None):
+    if batch_size:
+        # The tracks are read and added a batch at a time, so the memory used to read them does not grow
+        # with the size of the tracks csv file.
+        repo.add_catalog_batches(reader.read_csv_files_in_batches(batch_size))
+        return
+
     # Read two csv files tracks and albums csv.
     reader.read_csv_files()
 
@@ -29,14 +36,6 @@ def populate_repository(reader: TrackCSVReader, repo: AbstractRepository):
     genres = reader.dataset_of_genres
     tracks = reader.dataset_of_tracks
 
-    # Add albums to the repo
-    repo.add_many_albums(albums)
-
-    # Add artists to the repo
-    repo.add_many_artists(artists)
-
-    # Add genres to the repo
-    repo.add_many_genres(genres)
-
-    # Add tracks to the repo
-    repo.add_many_tracks(tracks)
+    # Add albums, artists, genres and tracks to the repo. The database repository inserts them in bulk
+    # when the database is empty.
+    repo.add_catalog(albums, artists, genres, tracks)
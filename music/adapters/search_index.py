@@ -0,0 +1,97 @@
+import copy
+from typing import List, Set
+
+from music.adapters.sharded_dict import ShardedDict
+
+# Length of the n-grams stored in the index (trigrams).
+NGRAM_SIZE = 3
+
+
+def ngrams(text: str, size: int = NGRAM_SIZE) -> Set[str]:
+    # All distinct substrings of the text with the given size.
+    return {text[index:index + size] for index in range(len(text) - size + 1)}
+
+
+class NGramIndex:
+    """ Inverted index from n-grams to the ids of the entries whose text contains them.
+
+    Substring queries intersect the posting lists of the query's n-grams and only verify those candidates,
+    so the results are exactly the ones of search_string: case-insensitive and without trailing spaces.
+    """
+
+    def __init__(self, size: int = NGRAM_SIZE):
+        self.__size = size
+        # Lowercase text of each entry, used to verify the candidates.
+        self.__texts = ShardedDict()
+        # n-gram -> ids of the entries that contain it.
+        self.__postings = ShardedDict()
+        # A copy shares its containers until it modifies them. It tracks the n-grams whose posting lists it owns,
+        # None means that it owns every posting list.
+        self.__shares_containers = False
+        self.__owned_grams = None
+
+    def __len__(self) -> int:
+        return len(self.__texts)
+
+    def __copy__(self) -> 'NGramIndex':
+        # Copy-on-write copy: it shares the containers with this index, and copies each of them
+        # the first time it modifies them. This index must not be modified after it has been copied.
+        index = NGramIndex(self.__size)
+        index.__texts = self.__texts
+        index.__postings = self.__postings
+        index.__shares_containers = True
+        index.__owned_grams = set()
+        return index
+
+    def add(self, entry_id: int, text: str):
+        # Adding an existing id again replaces its text.
+        if entry_id in self.__texts:
+            self.remove(entry_id)
+
+        text = text.lower() if text is not None else ''
+        self.__own_containers()
+        self.__texts[entry_id] = text
+        for gram in ngrams(text, self.__size):
+            self.__own_posting(gram).add(entry_id)
+
+    def remove(self, entry_id: int):
+        if entry_id not in self.__texts:
+            return
+        self.__own_containers()
+        text = self.__texts.pop(entry_id)
+        for gram in ngrams(text, self.__size):
+            posting = self.__own_posting(gram)
+            posting.discard(entry_id)
+            if not posting:
+                del self.__postings[gram]
+
+    def search(self, substring: str) -> List[int]:
+        """ Returns the ids of the entries containing the substring, in ascending order. """
+        query = substring.strip().lower()
+        query_grams = ngrams(query, self.__size)
+
+        if not query_grams:
+            # The query is shorter than an n-gram, so every entry is a candidate.
+            return sorted(entry_id for entry_id, text in self.__texts.items() if query in text)
+
+        # Intersect starting from the shortest posting list.
+        postings = sorted((self.__postings.get(gram, set()) for gram in query_grams), key=len)
+        candidates = postings[0].intersection(*postings[1:])
+        return sorted(entry_id for entry_id in candidates if query in self.__texts[entry_id])
+
+    def __own_containers(self):
+        # The sharded dicts copy only the shards that this index modifies.
+        if self.__shares_containers:
+            self.__texts = copy.copy(self.__texts)
+            self.__postings = copy.copy(self.__postings)
+            self.__shares_containers = False
+
+    def __own_posting(self, gram: str) -> Set[int]:
+        posting = self.__postings.get(gram)
+        if posting is None:
+            posting = self.__postings[gram] = set()
+        elif self.__owned_grams is not None and gram not in self.__owned_grams:
+            posting = self.__postings[gram] = set(posting)
+        if self.__owned_grams is not None:
+            self.__owned_grams.add(gram)
+        return posting
@@ -0,0 +1,83 @@
+from typing import Iterator
+
+# Number of shards of a ShardedDict. A write to a copy copies the list of shards and one shard,
+# about SHARD_COUNT + len / SHARD_COUNT entries instead of len.
+SHARD_COUNT = 256
+
+
+class ShardedDict:
+    """ Dict split into SHARD_COUNT dicts by the hash of the keys, for the copy-on-write snapshots.
+
+    A copy shares the shards with the original, and copies a shard only the first time it modifies it,
+    so a single write to a copy does not copy the whole dict. The original must not be modified after
+    it has been copied. Iteration goes shard by shard, not in the order of insertion.
+    """
+
+    def __init__(self):
+        self.__shards = [dict() for _ in range(SHARD_COUNT)]
+        self.__length = 0
+        # Indexes of the shards owned by this copy. None means that it owns every shard.
+        self.__owned = None
+
+    def __copy__(self) -> 'ShardedDict':
+        copied = ShardedDict.__new__(ShardedDict)
+        copied.__shards = list(self.__shards)
+        copied.__length = self.__length
+        copied.__owned = set()
+        return copied
+
+    def __len__(self) -> int:
+        return self.__length
+
+    def __contains__(self, key) -> bool:
+        return key in self.__shards[hash(key) % SHARD_COUNT]
+
+    def __getitem__(self, key):
+        return self.__shards[hash(key) % SHARD_COUNT][key]
+
+    def get(self, key, default=None):
+        return self.__shards[hash(key) % SHARD_COUNT].get(key, default)
+
+    def __setitem__(self, key, value):
+        shard = self.__own_shard(key)
+        if key not in shard:
+            self.__length += 1
+        shard[key] = value
+
+    def setdefault(self, key, default=None):
+        shard = self.__shards[hash(key) % SHARD_COUNT]
+        if key in shard:
+            return shard[key]
+        self[key] = default
+        return default
+
+    def __delitem__(self, key):
+        del self.__own_shard(key)[key]
+        self.__length -= 1
+
+    def pop(self, key, *default):
+        if key not in self:
+            if default:
+                return default[0]
+            raise KeyError(key)
+        self.__length -= 1
+        return self.__own_shard(key).pop(key)
+
+    def __iter__(self) -> Iterator:
+        return self.keys()
+
+    def keys(self) -> Iterator:
+        return (key for shard in self.__shards for key in shard)
+
+    def values(self) -> Iterator:
+        return (value for shard in self.__shards for value in shard.values())
+
+    def items(self) -> Iterator:
+        return (item for shard in self.__shards for item in shard.items())
+
+    def __own_shard(self, key) -> dict:
+        index = hash(key) % SHARD_COUNT
+        if self.__owned is not None and index not in self.__owned:
+            self.__shards[index] = dict(self.__shards[index])
+            self.__owned.add(index)
+        return self.__shards[index]
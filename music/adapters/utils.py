@@ -1,8 +1,39 @@
+import base64
+import json
+
 # Helper function to find out whether the name string includes the substring.
 # Case insensitive search.
 def search_string(name: str, substring: str):
     return substring.strip().lower() in name.lower()
 
+# Escape character of the LIKE patterns built by like_pattern.
+LIKE_ESCAPE = '/'
+
+# LIKE pattern that matches the names containing the substring, without trailing spaces.
+# The wildcards % and _ in the substring are escaped, so they only match themselves as in search_string.
+def like_pattern(substring: str) -> str:
+    escaped = substring.strip()
+    for char in (LIKE_ESCAPE, '%', '_'):
+        escaped = escaped.replace(char, LIKE_ESCAPE + char)
+    return f'%{escaped}%'
+
+# Shortest text that the trigram full-text index can match. Shorter texts are searched with LIKE.
+FTS_MIN_LENGTH = 3
+# Separator of the genre names of a track in the full-text index, so that a text never matches across two names.
+FTS_GENRE_SEPARATOR = '\x1f'
+
+# FTS5 query that matches the rows whose column contains the text, case-insensitive and without trailing spaces,
+# as search_string does. The text is quoted as a string, so FTS5 operators in it are not interpreted,
+# and the trigram tokenizer matches it as a substring.
+def fts_match_query(column: str, text: str) -> str:
+    phrase = text.strip().replace('"', '""')
+    return f'{column} : "{phrase}"'
+
+# Whether the trigram full-text index can answer the substring search of the text.
+def fts_can_match(text: str) -> bool:
+    text = text.strip()
+    return len(text) >= FTS_MIN_LENGTH and FTS_GENRE_SEPARATOR not in text
+
 # Used for sorting by title alphabetically with extra logics
 def title_for_sorting(title: str)->str:
     # Only extracts alphabets for sorting (no digits and special characters)
@@ -18,6 +49,37 @@ def title_for_sorting(title: str)->str:
     # in the sorting process (otherwise the titles with special characters will come first in sorting due to ASCII order)
     return f'z{title}'
 
+# Sort key for the title-ordered indexes of the memory repository.
+# The id breaks ties between equal titles, in the same way as a stable sort of the id-ordered list does.
+def title_sort_key(title: str, entity_id: int) -> tuple:
+    return (title_for_sorting(title or ''), entity_id)
+
+# Opaque cursor of a page for keyset pagination. It holds the page index and the sort key to seek from,
+# which is the (title sort key, id) of the last entity of the previous page when seeking after it,
+# or of the first entity of the next page when seeking before it. A missing sort key seeks from the end.
+def encode_page_cursor(page_index: int, before: bool, key: tuple = None) -> str:
+    payload = [page_index, before, list(key) if key is not None else None]
+    encoded = base64.urlsafe_b64encode(json.dumps(payload, separators=(',', ':')).encode('utf-8'))
+    return encoded.decode('ascii').rstrip('=')
+
+# Returns the (page_index, before, key) of a cursor, raises ValueError if it is not a valid cursor.
+def decode_page_cursor(cursor: str) -> tuple:
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        page_index, before, key = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+    except (TypeError, ValueError, UnicodeError):
+        raise ValueError(f'Invalid page cursor {cursor}')
+
+    valid_key = key is None or (type(key) is list and len(key) == 2
+                                and type(key[0]) is str and type(key[1]) is int)
+    if type(page_index) is not int or page_index < 0 or type(before) is not bool or not valid_key:
+        raise ValueError(f'Invalid page cursor {cursor}')
+    return page_index, before, tuple(key) if key is not None else None
+
+def in_key_order(keys: list, entities_by_key: dict) -> list:
+    # Entities of the keys in the order of the keys, skipping the keys without an entity.
+    return [entities_by_key[key] for key in keys if key in entities_by_key]
+
 # Sort list of entities by title alphabetically, 
 # such as list of tracks and list of albums that have title attributes 
 def sort_entities_by_title(items: list) -> list: 
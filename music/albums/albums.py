@@ -1,4 +1,5 @@
-from flask import Blueprint
+from typing import List
+from flask import Blueprint, current_app
 from flask import request, render_template, redirect, url_for, session, flash
 
 
@@ -13,28 +14,54 @@ albums_blueprint = Blueprint('albums_bp', __name__)
 @albums_blueprint.route('/browse_albums', methods=['GET'])
 def browse_albums():
     user_name = session['user_name'] if 'user_name' in session else None
-    albums_per_page = 10
-
-    # Current page of browsing which starts from 0
-    page = request.args.get('page')
-    page = int(page) if page is not None and page.isdigit() else 0
+    albums_per_page = current_app.config['ALBUMS_PER_PAGE']
 
     num_albums = services.get_number_of_albums(repo.repo_instance)
-    page_albums = services.get_albums_for_page(page, albums_per_page, repo.repo_instance)
 
+    # Pages are either found by a cursor, which seeks the page in the title order,
+    # or by the page index, which skips the albums of the previous pages.
+    cursor = request.args.get('cursor')
+    if cursor is not None:
+        page_albums, page = services.get_albums_for_cursor(cursor, albums_per_page, repo.repo_instance)
+    else:
+        # Current page of browsing which starts from 0
+        page = request.args.get('page')
+        page = int(page) if page is not None and page.isdigit() else 0
+        page_albums = services.get_albums_for_page(page, albums_per_page, repo.repo_instance)
+
+    return render_browse_albums(page, page_albums, num_albums, albums_per_page, user_name)
+
+
+@albums_blueprint.route('/album_detail', methods=['GET'])
+def album_detail():
+    user_name = session['user_name'] if 'user_name' in session else None
+    album_id = get_album_id_arg()
+
+    # Get album and with its tracks
+    album = services.get_album(album_id, repo.repo_instance)
+    album_tracks = services.get_tracks_by_album(album_id, repo.repo_instance)
+
+    return render_album_detail(album_id, album, album_tracks, user_name)
+
+
+# The views render the data they read with these functions, which the async views of async_albums.py share.
+
+def render_browse_albums(page: int, page_albums: List[dict], num_albums: int, albums_per_page: int, user_name: str):
     first_albums_url, prev_albums_url, next_albums_url, last_albums_url = None, None, None, None
 
     # Previous page exists
     if page > 0:
-        prev_albums_url = url_for('albums_bp.browse_albums', page=page - 1)
+        prev_albums_url = url_for(
+            'albums_bp.browse_albums', cursor=services.previous_albums_cursor(page, page_albums))
         first_albums_url = url_for('albums_bp.browse_albums')
 
     # Next page exists
     if page * albums_per_page + albums_per_page < num_albums:
-        next_albums_url = url_for('albums_bp.browse_albums', page=page+1)
-        # Last page using the last page index
+        next_albums_url = url_for(
+            'albums_bp.browse_albums', cursor=services.next_albums_cursor(page, page_albums))
+        # Last page seeks back from the end of the title order
         last_albums_url = url_for(
-            'albums_bp.browse_albums', page=(num_albums-1)//albums_per_page)
+            'albums_bp.browse_albums', cursor=services.last_albums_cursor(num_albums, albums_per_page))
 
     # Construct urls for viewing albums details and reviews.
     for album in page_albums:
@@ -59,16 +86,7 @@ def browse_albums():
     )
 
 
-
-@albums_blueprint.route('/album_detail', methods=['GET'])
-def album_detail():
-    user_name = session['user_name'] if 'user_name' in session else None
-    album_id = get_album_id_arg()
-
-    # Get album and with its tracks
-    album = services.get_album(album_id, repo.repo_instance)
-    album_tracks = services.get_tracks_by_album(album_id, repo.repo_instance)
-
+def render_album_detail(album_id: int, album: dict, album_tracks: List[dict], user_name: str):
     # Insert track detail link for each album track
     for track in album_tracks:
         track['track_detail_url'] = url_for(
@@ -0,0 +1,49 @@
+import asyncio
+
+from flask import current_app, request, session
+
+import music.albums.async_services as async_services
+import music.adapters.repository as repo
+from music.albums.albums import render_browse_albums, render_album_detail, get_album_id_arg
+
+
+# Async versions of the browse and detail views of albums.py, which await the AsyncSqlAlchemyRepository
+# so that the queries of a request overlap. They are registered in place of the sync views by create_app
+# when ASYNC_DATABASE is enabled.
+
+async def browse_albums():
+    user_name = session['user_name'] if 'user_name' in session else None
+    albums_per_page = current_app.config['ALBUMS_PER_PAGE']
+
+    cursor = request.args.get('cursor')
+    if cursor is not None:
+        page_albums_and_index = async_services.get_albums_for_cursor(cursor, albums_per_page, repo.async_repo_instance)
+    else:
+        page = request.args.get('page')
+        page = int(page) if page is not None and page.isdigit() else 0
+        page_albums_and_index = page_albums_with_index(page, albums_per_page)
+
+    # The number of albums is counted while the page is read.
+    num_albums, (page_albums, page) = await asyncio.gather(
+        async_services.get_number_of_albums(repo.async_repo_instance), page_albums_and_index)
+
+    return render_browse_albums(page, page_albums, num_albums, albums_per_page, user_name)
+
+
+async def album_detail():
+    user_name = session['user_name'] if 'user_name' in session else None
+    album_id = get_album_id_arg()
+
+    album, album_tracks = await async_services.get_album_detail(album_id, repo.async_repo_instance)
+
+    return render_album_detail(album_id, album, album_tracks, user_name)
+
+
+async def page_albums_with_index(page: int, albums_per_page: int):
+    return await async_services.get_albums_for_page(page, albums_per_page, repo.async_repo_instance), page
+
+
+def register_async_views(app):
+    # The endpoints keep their names and URLs, so url_for and the templates are unchanged.
+    app.view_functions['albums_bp.browse_albums'] = browse_albums
+    app.view_functions['albums_bp.album_detail'] = album_detail
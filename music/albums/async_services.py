@@ -0,0 +1,60 @@
+import asyncio
+from typing import List, Tuple
+
+from music.adapters.async_database_repository import AsyncSqlAlchemyRepository
+from music.adapters.utils import decode_page_cursor
+from music.albums.services import InvalidPageException, album_to_dict, albums_to_dict
+import music.tracks.services as tracks_services
+
+
+# The services of music/albums/services.py for the async views, awaiting the AsyncSqlAlchemyRepository.
+
+async def get_number_of_albums(repo: AsyncSqlAlchemyRepository) -> int:
+    return await repo.get_number_of_albums()
+
+
+async def get_albums_for_page(page_index: int, albums_per_page: int, repo: AsyncSqlAlchemyRepository) -> List[dict]:
+    if type(page_index) is not int:
+        raise InvalidPageException("Page should be of type integer.")
+    if page_index < 0:
+        raise InvalidPageException('Negative page does not exist.')
+
+    start_index = page_index * albums_per_page
+    albums_for_page = await repo.get_albums_page(start_index, albums_per_page, sorting=True)
+    if not albums_for_page:
+        raise InvalidPageException('The page does not exist.')
+    return albums_to_dict(albums_for_page, start_index)
+
+
+async def get_albums_for_cursor(cursor: str, albums_per_page: int,
+                                repo: AsyncSqlAlchemyRepository) -> Tuple[List[dict], int]:
+    try:
+        page_index, before, key = decode_page_cursor(cursor)
+    except ValueError:
+        raise InvalidPageException('The page cursor is invalid.')
+
+    if not before:
+        albums_for_page = await repo.get_albums_after(key, albums_per_page)
+    elif key is not None:
+        albums_for_page = await repo.get_albums_before(key, albums_per_page)
+    else:
+        last_page_size = await repo.get_number_of_albums() - page_index * albums_per_page
+        albums_for_page = await repo.get_albums_before(None, last_page_size)
+
+    if not albums_for_page:
+        raise InvalidPageException('The page does not exist.')
+    return albums_to_dict(albums_for_page, page_index * albums_per_page), page_index
+
+
+async def get_album(album_id: int, repo: AsyncSqlAlchemyRepository) -> dict:
+    album = await repo.get_album(album_id)
+    return album_to_dict(album) if album is not None else None
+
+
+async def get_tracks_by_album(album_id: int, repo: AsyncSqlAlchemyRepository) -> List[dict]:
+    return tracks_services.tracks_to_dicts(await repo.get_tracks_by_album(album_id))
+
+
+async def get_album_detail(album_id: int, repo: AsyncSqlAlchemyRepository) -> Tuple[dict, List[dict]]:
+    # The album and its tracks are read concurrently.
+    return await asyncio.gather(get_album(album_id, repo), get_tracks_by_album(album_id, repo))
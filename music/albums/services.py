@@ -1,6 +1,7 @@
-from typing import List
+from typing import List, Tuple
 
 from music.adapters.repository import AbstractRepository
+from music.adapters.utils import title_sort_key, encode_page_cursor, decode_page_cursor
 from music.domainmodel.album import Album
 import music.tracks.services as tracks_services
 
@@ -17,18 +18,51 @@ def get_albums_for_page(page_index: int, albums_per_page: int, repo: AbstractRep
     if page_index < 0:
         raise InvalidPageException('Negative page does not exist.')
 
-    albums = repo.get_albums(sorting=True)
-
-     # Find the start index of the albums for the current page.
+    # Find the start index of the albums for the current page.
     start_index = page_index * albums_per_page
-    if start_index >= len(albums):
+
+    # Retrieve only the albums of the current page, ordered by title.
+    albums_for_page = repo.get_albums_page(start_index, albums_per_page, sorting=True)
+    if not albums_for_page:
         raise InvalidPageException('The page does not exist.')
-        
-    # Retrieve albums list for the curent page
-    albums_for_page = albums[start_index:start_index+albums_per_page]
     return albums_to_dict(albums_for_page, start_index)
 
 
+def get_albums_for_cursor(cursor: str, albums_per_page: int, repo: AbstractRepository) -> Tuple[List[dict], int]:
+    # Keyset pagination: returns the albums of the page of the cursor as dicts, and the page index.
+    try:
+        page_index, before, key = decode_page_cursor(cursor)
+    except ValueError:
+        raise InvalidPageException('The page cursor is invalid.')
+
+    if not before:
+        albums_for_page = repo.get_albums_after(key, albums_per_page)
+    elif key is not None:
+        albums_for_page = repo.get_albums_before(key, albums_per_page)
+    else:
+        # The last page has the albums left after the full pages, as in offset pagination.
+        last_page_size = repo.get_number_of_albums() - page_index * albums_per_page
+        albums_for_page = repo.get_albums_before(None, last_page_size)
+
+    if not albums_for_page:
+        raise InvalidPageException('The page does not exist.')
+    return albums_to_dict(albums_for_page, page_index * albums_per_page), page_index
+
+
+def next_albums_cursor(page_index: int, page_albums: List[dict]) -> str:
+    last_album = page_albums[-1]
+    return encode_page_cursor(page_index + 1, False, title_sort_key(last_album['title'], last_album['album_id']))
+
+
+def previous_albums_cursor(page_index: int, page_albums: List[dict]) -> str:
+    first_album = page_albums[0]
+    return encode_page_cursor(page_index - 1, True, title_sort_key(first_album['title'], first_album['album_id']))
+
+
+def last_albums_cursor(number_of_albums: int, albums_per_page: int) -> str:
+    return encode_page_cursor(max(number_of_albums - 1, 0) // albums_per_page, True)
+
+
 def get_album(album_id: int, repo: AbstractRepository) -> dict:
     album = repo.get_album(album_id)
     if album is None:
@@ -63,6 +63,11 @@ class Review:
     def timestamp(self) -> datetime:
         return self.__timestamp
 
+    @timestamp.setter
+    def timestamp(self, new_timestamp: datetime):
+        if isinstance(new_timestamp, datetime):
+            self.__timestamp = new_timestamp
+
     def __eq__(self, other):
         if not isinstance(other, self.__class__):
             return False
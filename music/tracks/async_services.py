@@ -0,0 +1,94 @@
+import asyncio
+from typing import List, Tuple
+
+from music.adapters.async_database_repository import AsyncSqlAlchemyRepository
+from music.adapters.repository import SEARCH_KEYS
+from music.adapters.utils import decode_page_cursor
+from music.tracks.services import (
+    InvalidPageException, InvalidSearchKeyException, track_to_dict, tracks_to_dicts, review_to_dict, reviews_to_dicts
+)
+
+
+# The services of music/tracks/services.py for the async views, awaiting the AsyncSqlAlchemyRepository.
+
+async def get_track(track_id: int, repo: AsyncSqlAlchemyRepository) -> dict:
+    if track_id is None:
+        return None
+    track = await repo.get_track(track_id)
+    return track_to_dict(track) if track is not None else None
+
+
+async def get_number_of_tracks(repo: AsyncSqlAlchemyRepository) -> int:
+    return await repo.get_number_of_tracks()
+
+
+async def get_tracks_for_page(page_index: int, tracks_per_page: int, repo: AsyncSqlAlchemyRepository) -> List[dict]:
+    if type(page_index) is not int:
+        raise InvalidPageException('Page should be a type integer')
+    if page_index < 0:
+        raise InvalidPageException('Negative page does not exist.')
+
+    start_index = page_index * tracks_per_page
+    tracks_for_page = await repo.get_tracks_page(start_index, tracks_per_page, sorting=True)
+    if not tracks_for_page:
+        raise InvalidPageException('The page does not exist.')
+    return tracks_to_dicts(tracks_for_page, start_index)
+
+
+async def get_tracks_for_cursor(cursor: str, tracks_per_page: int,
+                                repo: AsyncSqlAlchemyRepository) -> Tuple[List[dict], int]:
+    try:
+        page_index, before, key = decode_page_cursor(cursor)
+    except ValueError:
+        raise InvalidPageException('The page cursor is invalid.')
+
+    if not before:
+        tracks_for_page = await repo.get_tracks_after(key, tracks_per_page)
+    elif key is not None:
+        tracks_for_page = await repo.get_tracks_before(key, tracks_per_page)
+    else:
+        last_page_size = await repo.get_number_of_tracks() - page_index * tracks_per_page
+        tracks_for_page = await repo.get_tracks_before(None, last_page_size)
+
+    if not tracks_for_page:
+        raise InvalidPageException('The page does not exist.')
+    return tracks_to_dicts(tracks_for_page, page_index * tracks_per_page), page_index
+
+
+async def get_tracks_for_search_page(search_key: str, text: str, page_index: int, tracks_per_page: int,
+                                     repo: AsyncSqlAlchemyRepository) -> Tuple[List[dict], int]:
+    if type(page_index) is not int:
+        raise InvalidPageException('Page should be a type integer')
+    if page_index < 0:
+        raise InvalidPageException('Negative page does not exist.')
+
+    search_key = search_key.strip().lower()
+    if search_key not in SEARCH_KEYS:
+        raise InvalidSearchKeyException(f'Search key {search_key} is invalid')
+
+    search_result = await repo.search_tracks(search_key, text)
+
+    start_index = page_index * tracks_per_page
+    tracks_for_page = await search_result.get_tracks(start_index, tracks_per_page)
+    return tracks_to_dicts(tracks_for_page, start_index), search_result.total
+
+
+async def get_reviews_for_track(track_id: int, repo: AsyncSqlAlchemyRepository) -> List[dict]:
+    return reviews_to_dicts(await repo.get_reviews_for_track(track_id))
+
+
+async def get_review_for_track_by_user(track_id: int, user_name: str, repo: AsyncSqlAlchemyRepository) -> dict:
+    review = await repo.get_review_for_track_by_user(track_id, user_name)
+    return review_to_dict(review) if review is not None else None
+
+
+async def get_track_detail(track_id: int, user_name: str, repo: AsyncSqlAlchemyRepository) -> Tuple[dict, dict]:
+    # The track, its reviews and the review of the user are read concurrently.
+    # Returns the track dict with its reviews, or None, and the review of the user.
+    track, reviews, user_review = await asyncio.gather(
+        get_track(track_id, repo),
+        get_reviews_for_track(track_id, repo),
+        get_review_for_track_by_user(track_id, user_name, repo))
+    if track is not None:
+        track['reviews'] = reviews
+    return track, user_review
@@ -0,0 +1,68 @@
+import asyncio
+
+from flask import request, session, current_app
+
+import music.tracks.async_services as async_services
+import music.adapters.repository as repo
+from music.utilities.utilities import SearchForm
+from music.tracks.tracks import (
+    render_browse_tracks, render_searched_tracks, render_track_detail, get_search_args, get_track_id
+)
+
+
+# Async versions of the browse, search and detail views of tracks.py, which await the AsyncSqlAlchemyRepository
+# so that the queries of a request overlap. They are registered in place of the sync views by create_app
+# when ASYNC_DATABASE is enabled.
+
+async def browse_tracks():
+    user_name = session['user_name'] if 'user_name' in session else None
+    tracks_per_page = current_app.config['TRACKS_PER_PAGE']
+
+    cursor = request.args.get('cursor')
+    if cursor is not None:
+        page_tracks_and_index = async_services.get_tracks_for_cursor(cursor, tracks_per_page, repo.async_repo_instance)
+    else:
+        page = request.args.get('page')
+        page = int(page) if page is not None and page.isdigit() else 0
+        page_tracks_and_index = page_tracks_with_index(page, tracks_per_page)
+
+    # The number of tracks is counted while the page is read.
+    num_tracks, (page_tracks, page) = await asyncio.gather(
+        async_services.get_number_of_tracks(repo.async_repo_instance), page_tracks_and_index)
+
+    return render_browse_tracks(page, page_tracks, num_tracks, tracks_per_page, user_name)
+
+
+async def search_tracks():
+    tracks_per_page = current_app.config['TRACKS_PER_PAGE']
+
+    user_name = session['user_name'] if 'user_name' in session else None
+    search_form = SearchForm()
+    search_key, text, page = get_search_args(search_form)
+
+    searched_page_tracks, number_of_searched_tracks = await async_services.get_tracks_for_search_page(
+        search_key, text, page, tracks_per_page, repo.async_repo_instance)
+
+    return render_searched_tracks(
+        search_form, search_key, text, page, searched_page_tracks, number_of_searched_tracks, tracks_per_page,
+        user_name)
+
+
+async def track_detail():
+    user_name = session['user_name'] if 'user_name' in session else None
+    track_id = get_track_id()
+
+    track, user_review = await async_services.get_track_detail(track_id, user_name, repo.async_repo_instance)
+
+    return render_track_detail(track_id, track, user_review, user_name)
+
+
+async def page_tracks_with_index(page: int, tracks_per_page: int):
+    return await async_services.get_tracks_for_page(page, tracks_per_page, repo.async_repo_instance), page
+
+
+def register_async_views(app):
+    # The endpoints keep their names and URLs, so url_for and the templates are unchanged.
+    app.view_functions['tracks_bp.browse_tracks'] = browse_tracks
+    app.view_functions['tracks_bp.search_tracks'] = search_tracks
+    app.view_functions['tracks_bp.track_detail'] = track_detail
@@ -1,6 +1,7 @@
-from typing import List
+from typing import List, Tuple
 
-from music.adapters.repository import AbstractRepository
+from music.adapters.repository import AbstractRepository, SEARCH_KEYS
+from music.adapters.utils import title_sort_key, encode_page_cursor, decode_page_cursor
 from music.domainmodel.track import Track
 from music.domainmodel.review import Review
 
@@ -38,39 +39,72 @@ def get_tracks_for_page(page_index: int, tracks_per_page: int, repo: AbstractRep
     if page_index < 0:
         raise InvalidPageException('Negative page does not exist.')
 
-    tracks = repo.get_tracks(sorting=True)
-
     # Find the start index of the tracks for the current page.
     start_index = page_index * tracks_per_page
-    if start_index >= len(tracks):
-        raise InvalidPageException('The page does not exist.')
 
-    # Retrieve tracks list for the current page as a list.
-    tracks_for_page = tracks[start_index:start_index+tracks_per_page]
+    # Retrieve only the tracks of the current page, ordered by title.
+    tracks_for_page = repo.get_tracks_page(start_index, tracks_per_page, sorting=True)
+    if not tracks_for_page:
+        raise InvalidPageException('The page does not exist.')
     return tracks_to_dicts(tracks_for_page, start_index)
 
 
-def get_tracks_for_search(search_key: str, text: str, repo: AbstractRepository):
-    search_key = search_key.strip().lower()
-    searched = []
-    # Only four types of search keys: 'title' | 'artist' | 'album' | 'genre'.
-    # Otherwise, they are invalid search keys.
-    if search_key == 'title':
-        searched = repo.search_tracks_by_title(text)
+def get_tracks_for_cursor(cursor: str, tracks_per_page: int, repo: AbstractRepository) -> Tuple[List[dict], int]:
+    # Keyset pagination: returns the tracks of the page of the cursor as dicts, and the page index.
+    # The page is found by seeking the sort key in the cursor, so deep pages cost the same as the first page.
+    try:
+        page_index, before, key = decode_page_cursor(cursor)
+    except ValueError:
+        raise InvalidPageException('The page cursor is invalid.')
 
-    elif search_key == 'album':
-        searched = repo.search_tracks_by_album(text)
+    if not before:
+        tracks_for_page = repo.get_tracks_after(key, tracks_per_page)
+    elif key is not None:
+        tracks_for_page = repo.get_tracks_before(key, tracks_per_page)
+    else:
+        # The last page has the tracks left after the full pages, as in offset pagination.
+        last_page_size = repo.get_number_of_tracks() - page_index * tracks_per_page
+        tracks_for_page = repo.get_tracks_before(None, last_page_size)
 
-    elif search_key == 'artist':
-        searched = repo.search_tracks_by_artist(text)
+    if not tracks_for_page:
+        raise InvalidPageException('The page does not exist.')
+    return tracks_to_dicts(tracks_for_page, page_index * tracks_per_page), page_index
 
-    elif search_key == 'genre':
-        searched = repo.search_tracks_by_genre(text)
 
-    else:
+def next_tracks_cursor(page_index: int, page_tracks: List[dict]) -> str:
+    # Cursor of the page after the page of the given track dicts.
+    last_track = page_tracks[-1]
+    return encode_page_cursor(page_index + 1, False, title_sort_key(last_track['title'], last_track['track_id']))
+
+
+def previous_tracks_cursor(page_index: int, page_tracks: List[dict]) -> str:
+    # Cursor of the page before the page of the given track dicts.
+    first_track = page_tracks[0]
+    return encode_page_cursor(page_index - 1, True, title_sort_key(first_track['title'], first_track['track_id']))
+
+
+def last_tracks_cursor(number_of_tracks: int, tracks_per_page: int) -> str:
+    return encode_page_cursor(max(number_of_tracks - 1, 0) // tracks_per_page, True)
+
+
+def get_tracks_for_search_page(search_key: str, text: str, page_index: int, tracks_per_page: int,
+                               repo: AbstractRepository) -> Tuple[List[dict], int]:
+    # Returns the searched tracks of the page as dicts, and the total number of searched tracks.
+    # Only the tracks of the page are fetched and converted to dicts.
+    if type(page_index) is not int:
+        raise InvalidPageException('Page should be a type integer')
+    if page_index < 0:
+        raise InvalidPageException('Negative page does not exist.')
+
+    search_key = search_key.strip().lower()
+    if search_key not in SEARCH_KEYS:
         raise InvalidSearchKeyException(f'Search key {search_key} is invalid')
 
-    return tracks_to_dicts(searched)
+    search_result = repo.search_tracks(search_key, text)
+
+    start_index = page_index * tracks_per_page
+    tracks_for_page = search_result.get_tracks(start_index, tracks_per_page)
+    return tracks_to_dicts(tracks_for_page, start_index), search_result.total
 
 
 def add_review(track_id: int,  user_name: str, review_text: str, rating: int,  repo: AbstractRepository)->bool:
@@ -79,9 +113,8 @@ def add_review(track_id: int,  user_name: str, review_text: str, rating: int,  r
     user = repo.get_user(user_name)
 
     # Do not allow the user to make review on the same track twice.
-    # If there is an existing review by this user, return it.
-    user_existing_review = get_review_for_track_by_user(track_id, user_name, repo)
-    if user_existing_review is not None:
+    # If there is an existing review by this user, return False.
+    if repo.get_review_for_track_by_user(track_id, user_name) is not None:
         return False
 
     if track is None:
@@ -102,12 +135,8 @@ def get_reviews_for_track(track_id: int, repo: AbstractRepository):
 
 # Get review made by the user for the track of the track_id
 def get_review_for_track_by_user(track_id: int, user_name: str, repo: AbstractRepository):
-    track_reviews = repo.get_reviews_for_track(track_id)
-    # If current user's reviews already exist for the track, do not allow review twice.
-    for review in track_reviews:
-        if review.user.user_name == user_name:
-            return review_to_dict(review)
-    return None
+    review = repo.get_review_for_track_by_user(track_id, user_name)
+    return review_to_dict(review) if review is not None else None
 
 # Helper function to calculate the duration format into mm:ss user readable format.
 def get_duration_format(total_seconds: int):
@@ -1,6 +1,6 @@
 from typing import List
 from flask import Blueprint
-from flask import request, render_template, redirect, url_for, session, flash
+from flask import request, render_template, redirect, url_for, session, flash, current_app
 
 from better_profanity import profanity
 from flask_wtf import FlaskForm
@@ -19,16 +19,57 @@ tracks_blueprint = Blueprint('tracks_bp', __name__)
 @tracks_blueprint.route('/browse_tracks', methods=['GET'])
 def browse_tracks():
     user_name = session['user_name'] if 'user_name' in session else None
-    tracks_per_page = 10
-
-    # Current page of browsing which starts from 0
-    page = request.args.get('page')
-    page = int(page) if page is not None and page.isdigit() else 0
+    tracks_per_page = current_app.config['TRACKS_PER_PAGE']
 
     num_tracks = services.get_number_of_tracks(repo.repo_instance)
-    page_tracks = services.get_tracks_for_page(
-        page, tracks_per_page, repo.repo_instance)
-    
+
+    # Pages are either found by a cursor, which seeks the page in the title order,
+    # or by the page index, which skips the tracks of the previous pages.
+    cursor = request.args.get('cursor')
+    if cursor is not None:
+        page_tracks, page = services.get_tracks_for_cursor(cursor, tracks_per_page, repo.repo_instance)
+    else:
+        # Current page of browsing which starts from 0
+        page = request.args.get('page')
+        page = int(page) if page is not None and page.isdigit() else 0
+        page_tracks = services.get_tracks_for_page(page, tracks_per_page, repo.repo_instance)
+
+    return render_browse_tracks(page, page_tracks, num_tracks, tracks_per_page, user_name)
+
+
+@tracks_blueprint.route('/search_tracks', methods=['GET', 'POST'])
+def search_tracks():
+    tracks_per_page = current_app.config['TRACKS_PER_PAGE']
+
+    user_name = session['user_name'] if 'user_name' in session else None
+    search_form = SearchForm()
+    search_key, text, page = get_search_args(search_form)
+
+    # Only the tracks of the current page are converted to dicts.
+    searched_page_tracks, number_of_searched_tracks = services.get_tracks_for_search_page(
+        search_key, text, page, tracks_per_page, repo.repo_instance)
+
+    return render_searched_tracks(
+        search_form, search_key, text, page, searched_page_tracks, number_of_searched_tracks, tracks_per_page,
+        user_name)
+
+
+@tracks_blueprint.route('/track_detail', methods=['GET'])
+def track_detail():
+    user_name = session['user_name'] if 'user_name' in session else None
+    track_id = get_track_id()
+
+    # Get tracks for the track_id and add its list of reviews to the dict.
+    track = get_track_and_reviews(track_id)
+    # Current user's review on this track
+    user_review = services.get_review_for_track_by_user(track_id, user_name, repo.repo_instance)
+
+    return render_track_detail(track_id, track, user_review, user_name)
+
+
+# The views render the data they read with these functions, which the async views of async_tracks.py share.
+
+def render_browse_tracks(page: int, page_tracks: List[dict], num_tracks: int, tracks_per_page: int, user_name: str):
     # Insert album detail page link to each track
     insert_album_detail_urls(page_tracks)
 
@@ -36,15 +77,17 @@ def browse_tracks():
 
     # Previous page exists
     if page > 0:
-        prev_tracks_url = url_for('tracks_bp.browse_tracks', page=page - 1)
+        prev_tracks_url = url_for(
+            'tracks_bp.browse_tracks', cursor=services.previous_tracks_cursor(page, page_tracks))
         first_tracks_url = url_for('tracks_bp.browse_tracks')
 
     # Next page exists
     if page * tracks_per_page + tracks_per_page < num_tracks:
-        next_tracks_url = url_for('tracks_bp.browse_tracks', page=page+1)
-        # Last page using the last page index
+        next_tracks_url = url_for(
+            'tracks_bp.browse_tracks', cursor=services.next_tracks_cursor(page, page_tracks))
+        # Last page seeks back from the end of the title order
         last_tracks_url = url_for(
-            'tracks_bp.browse_tracks', page=(num_tracks-1)//tracks_per_page)
+            'tracks_bp.browse_tracks', cursor=services.last_tracks_cursor(num_tracks, tracks_per_page))
 
     # Construct urls for viewing tracks details and reviews.
     for track in page_tracks:
@@ -69,36 +112,9 @@ def browse_tracks():
     )
 
 
-@tracks_blueprint.route('/search_tracks', methods=['GET', 'POST'])
-def search_tracks():
-    tracks_per_page = 10
-
-    user_name = session['user_name'] if 'user_name' in session else None
-    search_key, text = None, None
-
-    # Create search form on the header searchbar
-    search_form = SearchForm()
-    if search_form.validate_on_submit():
-        # Search key: 'title' | 'artist' | 'album' | 'genre'
-        search_key = search_form.search_key.data
-        text = search_form.text.data
-
-    # If it is a get request, get search_key and text from the query strings to continue to search
-    if request.method == 'GET':
-        search_key = request.args.get('search_key')
-        text = request.args.get('text')
-
-    # Current page of browsing which starts from 0
-    page = request.args.get('page')
-    page = int(page) if page is not None and page.isdigit() else 0
-
-    searched_tracks = services.get_tracks_for_search(
-        search_key, text, repo.repo_instance)
-    number_of_searched_tracks = len(searched_tracks)
-
-    searched_page_tracks = searched_tracks[page *
-                                           tracks_per_page:page*tracks_per_page+tracks_per_page]
-
+def render_searched_tracks(search_form: SearchForm, search_key: str, text: str, page: int,
+                           searched_page_tracks: List[dict], number_of_searched_tracks: int, tracks_per_page: int,
+                           user_name: str):
     # Insert album detail page link to each track
     insert_album_detail_urls(searched_page_tracks)
 
@@ -144,17 +160,7 @@ def search_tracks():
     )
 
 
-@tracks_blueprint.route('/track_detail', methods=['GET'])
-def track_detail():
-    user_name = session['user_name'] if 'user_name' in session else None
-    track_id = get_track_id()
-
-    # Get tracks for the track_id and add its list of reviews to the dict.
-    track = get_track_and_reviews(track_id)
-    # Current user's review on this track
-    user_review = services.get_review_for_track_by_user(track_id, user_name, repo.repo_instance)
-
-
+def render_track_detail(track_id: int, track: dict, user_review: dict, user_name: str):
     # If track was not found, redirect to the browsing page.
     if track is None:
         flash(f'Track {track_id} was not found...', 'error')
@@ -230,6 +236,25 @@ def track_review():
     )
 
 
+# Helper function to get the search key, text and page of a search from the search form or the query string.
+def get_search_args(search_form: SearchForm):
+    search_key, text = None, None
+    if search_form.validate_on_submit():
+        # Search key: 'title' | 'artist' | 'album' | 'genre'
+        search_key = search_form.search_key.data
+        text = search_form.text.data
+
+    # If it is a get request, get search_key and text from the query strings to continue to search
+    if request.method == 'GET':
+        search_key = request.args.get('search_key')
+        text = request.args.get('text')
+
+    # Current page of browsing which starts from 0
+    page = request.args.get('page')
+    page = int(page) if page is not None and page.isdigit() else 0
+    return search_key, text, page
+
+
 # Helper function to get track_id query param as an integer.
 # Return None if the track_id is of invalid type
 def get_track_id():
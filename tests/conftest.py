@@ -18,6 +18,14 @@ def memory_repo():
     return repo
 
 
+@pytest.fixture
+def snapshot_repo():
+    # Memory repository in the concurrency mode, where readers get immutable snapshots.
+    repo = MemoryRepository(snapshot_reads=True)
+    repository_populate.populate(TEST_DATA_PATH, repo, testing=True, database_mode=False)
+    return repo
+
+
 @pytest.fixture
 def client():
     my_app = create_app({
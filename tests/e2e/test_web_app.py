@@ -1,7 +1,15 @@
+import html
+import re
+
 import pytest
 
 from flask import session
 
+from music import create_app
+from music.tracks.services import last_tracks_cursor, get_tracks_for_page
+
+from tests.conftest import TEST_DATA_PATH
+
 
 # Helper function only to register and login the sample user (NOT an actual testing function)
 def perform_login(client, auth):
@@ -102,6 +110,18 @@ def test_browse_albums(client):
     assert b'Every Man For Himself' in response.data
 
 
+def test_browse_albums_page_size_is_configured(memory_repo):
+    client = create_app({
+        'TESTING': True, 'REPOSITORY': 'memory', 'TEST_DATA_PATH': TEST_DATA_PATH, 'WTF_CSRF_ENABLED': False,
+        'ALBUMS_PER_PAGE': 2,
+    }).test_client()
+
+    response = client.get('/browse_albums')
+    assert response.status_code == 200
+    assert len(re.findall(r'<td class="album-title">', response.data.decode())) == 2
+    assert page_link(response, 'Next') is not None
+
+
 def test_album_detail(client):
     # Test /album_detail route
     album_id = 1  # Album id for album 'AWOL - A Way Of Life'
@@ -132,6 +152,54 @@ def test_browse_tracks(client):
     assert b'Browse Tracks' in response.data
 
 
+def test_browse_tracks_by_cursor(client):
+    # The last page link seeks the last page with a cursor, which shows the same tracks as its page index
+    response = client.get('/browse_tracks')
+    cursor_response = client.get(f'/browse_tracks?cursor={last_tracks_cursor(10, 10)}')
+    assert cursor_response.status_code == 200
+    assert b'Food' in cursor_response.data
+    assert cursor_response.data == response.data
+
+
+def page_link(response, label: str) -> str:
+    # URL of the button of the page with the label, such as Next or Previous.
+    match = re.search(rf"location.href='([^']*)'\">{label}<", response.data.decode())
+    return html.unescape(match.group(1)) if match else None
+
+
+def page_titles(response) -> list:
+    return re.findall(r'class="link track-heading__title"[^>]*>([^<]*)<', response.data.decode())
+
+
+def test_browse_tracks_by_cursor_across_pages(memory_repo):
+    client = create_app({
+        'TESTING': True, 'REPOSITORY': 'memory', 'TEST_DATA_PATH': TEST_DATA_PATH, 'WTF_CSRF_ENABLED': False,
+        # 10 tracks on 4 pages
+        'TRACKS_PER_PAGE': 3,
+    }).test_client()
+    expected_titles = [[html.escape(track['title']) for track in get_tracks_for_page(page, 3, memory_repo)]
+                       for page in range(4)]
+
+    first_response = client.get('/browse_tracks')
+    assert page_titles(first_response) == expected_titles[0]
+    assert page_link(first_response, 'Previous') is None
+
+    # The next cursor seeks the second page
+    second_response = client.get(page_link(first_response, 'Next'))
+    assert second_response.status_code == 200
+    assert page_titles(second_response) == expected_titles[1]
+
+    # And the previous cursor of the second page seeks back to the first page
+    previous_response = client.get(page_link(second_response, 'Previous'))
+    assert page_titles(previous_response) == expected_titles[0]
+
+    # The last page has the single remaining track and no next page
+    last_response = client.get(page_link(first_response, 'Last'))
+    assert page_titles(last_response) == expected_titles[3]
+    assert len(expected_titles[3]) == 1
+    assert page_link(last_response, 'Next') is None
+
+
 def test_track_detail(client):
     # Test /track_detail route
     track_id = 2  # Track id for track 'Food'
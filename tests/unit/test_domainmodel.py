@@ -695,3 +695,32 @@ class TestCSVReader:
         # genre id = 3>]'
         sorted_genre_sample = str(sorted_genres[:3])
         assert sorted_genre_sample == '[<Genre Avant-Garde, genre id = 1>, <Genre International, genre id = 2>, <Genre Blues, genre id = 3>]'
+
+    def test_csv_reader_in_batches(self):
+        dirname = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        reader = TrackCSVReader(os.path.join(dirname, 'data/raw_albums_excerpt.csv'),
+                                os.path.join(dirname, 'data/raw_tracks_excerpt.csv'))
+        batches = list(reader.read_csv_files_in_batches(300))
+
+        # 2000 tracks in batches of at most 300, in the order of the file
+        assert [len(tracks) for _, _, _, tracks in batches] == [300] * 6 + [200]
+        tracks = [track for _, _, _, batch_tracks in batches for track in batch_tracks]
+        assert [track.track_id for track in tracks] == [
+            track.track_id for track in create_csv_reader().dataset_of_tracks]
+
+        # Each album, artist and genre is in the first batch that references it, and only in that one
+        albums = [album for batch_albums, _, _, _ in batches for album in batch_albums]
+        artists = [artist for _, batch_artists, _, _ in batches for artist in batch_artists]
+        genres = [genre for _, _, batch_genres, _ in batches for genre in batch_genres]
+        assert (len(albums), len(artists), len(genres)) == (427, 263, 60)
+        assert len(set(albums)) == 427 and len(set(artists)) == 263 and len(set(genres)) == 60
+        seen_artists = set()
+        for _, batch_artists, _, batch_tracks in batches:
+            seen_artists.update(batch_artists)
+            assert all(track.artist in seen_artists for track in batch_tracks)
+
+        # The rows are streamed, so the datasets of the reader are not filled
+        assert reader.dataset_of_tracks == [] and reader.dataset_of_artists == set()
+
+        with pytest.raises(ValueError):
+            list(reader.read_csv_files_in_batches(0))
@@ -1,13 +1,23 @@
+import copy
+import os
+import threading
+
 import pytest
 
+from music.adapters import repository_populate
+from music.adapters.journal import RepositoryJournal, CorruptJournalException, JOURNAL_FILENAME, SNAPSHOT_FILENAME
 from music.adapters.repository import RepositoryException
 from music.adapters.memory_repository import MemoryRepository
+from music.adapters.sharded_dict import ShardedDict
 from music.domainmodel.artist import Artist
 from music.domainmodel.album import Album
 from music.domainmodel.track import Track
 from music.domainmodel.user import User
 from music.domainmodel.review import Review
 from music.domainmodel.genre import Genre
+from music.adapters.utils import search_string, sort_entities_by_title, title_sort_key
+
+from tests.conftest import TEST_DATA_PATH
 
 
 def test_repository_can_add_a_user(memory_repo: MemoryRepository):
@@ -61,11 +71,44 @@ def test_repository_can_retrieve_track(memory_repo: MemoryRepository):
     assert 'Hip-Hop' in [genre.name for genre in track.genres]
 
 
+def test_repository_lookups_stay_in_sync_with_add_many(memory_repo: MemoryRepository):
+    tracks = [Track(7001, 'Bulk track 1'), Track(7002, 'Bulk track 2')]
+    albums = [Album(8001, 'Bulk album 1'), Album(8002, 'Bulk album 2')]
+    memory_repo.add_many_tracks(tracks)
+    memory_repo.add_many_albums(albums)
+
+    # Every track and album added in bulk can be looked up by its id.
+    assert memory_repo.get_track(7001) is tracks[0]
+    assert memory_repo.get_track(7002) is tracks[1]
+    assert memory_repo.get_album(8001) is albums[0]
+    assert memory_repo.get_album(8002) is albums[1]
+
+    # Adding an album with an existing id does not replace the stored album.
+    memory_repo.add_album(Album(8001, 'Duplicate album'))
+    assert memory_repo.get_album(8001).title == 'Bulk album 1'
+
+
 def test_repository_does_not_retrieve_a_non_existent_track(memory_repo: MemoryRepository):
     track = memory_repo.get_track(10201901)  # Non-existing track id
     assert track is None
 
 
+def test_repository_can_retrieve_many_by_ids(memory_repo: MemoryRepository):
+    track_ids = [track.track_id for track in memory_repo.get_tracks()][:4]
+    memory_repo.add_user(User('denis', 'Denis9389'))
+    memory_repo.add_user(User('fmercury', 'Freddie9389'))
+
+    # The entities are returned in the order of the ids, and the ids without an entity are skipped.
+    ids = [track_ids[2], 10201901, track_ids[0], track_ids[3]]
+    assert memory_repo.get_tracks_by_ids(ids) == [memory_repo.get_track(track_ids[2]),
+                                                   memory_repo.get_track(track_ids[0]),
+                                                   memory_repo.get_track(track_ids[3])]
+    assert [album.album_id for album in memory_repo.get_albums_by_ids([4, -1, 1])] == [4, 1]
+    assert [user.user_name for user in memory_repo.get_users_by_names([' FMercury', 'unknown', 'denis'])
+            ] == ['fmercury', 'denis']
+    assert memory_repo.get_tracks_by_ids([]) == []
+
+
 def test_repository_can_retrieve_track_count(memory_repo: MemoryRepository):
     number_of_tracks = memory_repo.get_number_of_tracks()
     # Check that the query returned 10 tracks in the testing file raw_tracks_test.csv.
@@ -78,6 +121,86 @@ def test_repository_can_retrieve_all_tracks(memory_repo: MemoryRepository):
     assert len(tracks) == 10
 
 
+def test_repository_can_retrieve_tracks_sorted_by_title(memory_repo: MemoryRepository):
+    memory_repo.add_track(Track(5001, 'Aardvark'))
+    memory_repo.add_track(Track(5002, '123 numbers first'))
+
+    sorted_tracks = memory_repo.get_tracks(sorting=True)
+    # The title-ordered index matches sorting the tracks by title
+    assert sorted_tracks == sort_entities_by_title(list(memory_repo.get_tracks()))
+    assert sorted_tracks[0].title == 'Aardvark'
+    # Titles without a leading alphabet are placed at the end
+    assert sorted_tracks[-1].title == '123 numbers first'
+
+    # The id-ordered list of tracks is left untouched
+    tracks = memory_repo.get_tracks()
+    assert tracks == sorted(tracks)
+
+
+def test_repository_can_retrieve_albums_sorted_by_title(memory_repo: MemoryRepository):
+    memory_repo.add_album(Album(15212, 'Aardvark'))
+
+    sorted_albums = memory_repo.get_albums(sorting=True)
+    assert sorted_albums == sort_entities_by_title(memory_repo.get_albums())
+    assert sorted_albums[0].title == 'Aardvark'
+
+
+def test_repository_can_retrieve_pages_of_tracks_and_albums(memory_repo: MemoryRepository):
+    sorted_tracks = memory_repo.get_tracks(sorting=True)
+    # Pages are windows of the title-ordered or id-ordered lists
+    assert memory_repo.get_tracks_page(2, 3) == sorted_tracks[2:5]
+    assert memory_repo.get_tracks_page(2, 3, sorting=False) == memory_repo.get_tracks()[2:5]
+    assert memory_repo.get_tracks_page(len(sorted_tracks), 3) == []
+
+    sorted_albums = memory_repo.get_albums(sorting=True)
+    assert memory_repo.get_albums_page(1, 2) == sorted_albums[1:3]
+    assert memory_repo.get_albums_page(1, 2, sorting=False) == sorted(memory_repo.get_albums())[1:3]
+    assert memory_repo.get_albums_page(len(sorted_albums), 2) == []
+
+
+def test_repository_can_seek_pages_of_tracks_and_albums(memory_repo: MemoryRepository):
+    sorted_tracks = memory_repo.get_tracks(sorting=True)
+    keys = [title_sort_key(track.title, track.track_id) for track in sorted_tracks]
+
+    # Seeking after or before a key returns the neighbouring window of the title order
+    assert memory_repo.get_tracks_after(None, 3) == sorted_tracks[:3]
+    assert memory_repo.get_tracks_after(keys[2], 3) == sorted_tracks[3:6]
+    assert memory_repo.get_tracks_before(keys[5], 3) == sorted_tracks[2:5]
+    assert memory_repo.get_tracks_before(keys[1], 3) == sorted_tracks[:1]
+    assert memory_repo.get_tracks_before(None, 3) == sorted_tracks[-3:]
+    assert memory_repo.get_tracks_after(keys[-1], 3) == []
+
+    sorted_albums = memory_repo.get_albums(sorting=True)
+    album_key = title_sort_key(sorted_albums[1].title, sorted_albums[1].album_id)
+    assert memory_repo.get_albums_after(album_key, 2) == sorted_albums[2:4]
+    assert memory_repo.get_albums_before(album_key, 2) == sorted_albums[:1]
+
+
+def test_repository_add_many_tracks_matches_adding_one_by_one(memory_repo: MemoryRepository):
+    album = memory_repo.get_album(1)
+    genre = Genre(3031, 'New Genre')
+
+    def new_tracks():
+        tracks = [Track(track_id, f'Bulk track {track_id}') for track_id in (9003, 1, 9001, 9002)]
+        for track in tracks:
+            track.album = album
+            track.add_genre(genre)
+        return tracks
+
+    one_by_one_repo = MemoryRepository()
+    for track in memory_repo.get_tracks() + new_tracks():
+        one_by_one_repo.add_track(track)
+    memory_repo.add_many_tracks(new_tracks())
+
+    # Both repositories have the same ordered lists and indexes
+    assert memory_repo.get_tracks() == one_by_one_repo.get_tracks()
+    assert memory_repo.get_tracks(sorting=True) == one_by_one_repo.get_tracks(sorting=True)
+    assert memory_repo.get_tracks_by_album(1) == one_by_one_repo.get_tracks_by_album(1)
+    assert memory_repo.search_tracks_by_title('bulk') == one_by_one_repo.search_tracks_by_title('bulk')
+    assert memory_repo.search_tracks_by_genre('new genre') == one_by_one_repo.search_tracks_by_genre('new genre')
+    assert memory_repo.get_track(9002).title == 'Bulk track 9002'
+
+
 def test_repository_can_add_a_genre(memory_repo: MemoryRepository):
     genre = Genre(3031, 'New Genre')
     memory_repo.add_genre(genre)
@@ -140,6 +263,22 @@ def test_repository_can_get_tracks_by_album(memory_repo: MemoryRepository):
     assert 'Electric Ave' in track_titles
     
 
+def test_repository_get_tracks_by_album_includes_added_tracks(memory_repo: MemoryRepository):
+    album = memory_repo.get_album(1)
+    track = Track(1, 'New track for album 1')
+    track.album = album
+    memory_repo.add_track(track)
+
+    # The new track is in the album's track list, ordered by track id.
+    album_tracks = memory_repo.get_tracks_by_album(1)
+    assert len(album_tracks) == 5
+    assert album_tracks[0] is track
+    assert album_tracks == sorted(album_tracks)
+
+    # Non-existing album has no tracks
+    assert memory_repo.get_tracks_by_album(134123123121) == []
+
+
 def test_repository_can_add_artist(memory_repo: MemoryRepository):
     artist = Artist(923892, 'A new artist')
     memory_repo.add_artist(artist)
@@ -193,6 +332,44 @@ def test_repository_can_retrieve_review_for_a_track(memory_repo: MemoryRepositor
     assert len(memory_repo.get_reviews_for_track(track_id)) == 1
 
 
+def test_repository_can_retrieve_review_for_a_track_by_user(memory_repo: MemoryRepository):
+    track = memory_repo.get_track(2)
+    user = User('denis', 'Denis9389')
+    memory_repo.add_user(user)
+
+    # Initially the user has not reviewed the track
+    assert memory_repo.get_review_for_track_by_user(2, 'denis') is None
+
+    review = Review(track, 'My review 1', 5)
+    review.user = user
+    memory_repo.add_review(review)
+
+    # Retrieving the review is case-insensitive without trailing spaces.
+    assert memory_repo.get_review_for_track_by_user(2, ' Denis ') is review
+    # The review is not found for other tracks or anonymous users
+    assert memory_repo.get_review_for_track_by_user(3, 'denis') is None
+    assert memory_repo.get_review_for_track_by_user(2, None) is None
+
+
+def test_repository_does_not_add_second_review_by_user(memory_repo: MemoryRepository):
+    track = memory_repo.get_track(2)
+    user = User('denis', 'Denis9389')
+    memory_repo.add_user(user)
+
+    review = Review(track, 'My review 1', 5)
+    review.user = user
+    memory_repo.add_review(review)
+
+    # RepositoryException should be raised if the user has already reviewed the track
+    second_review = Review(track, 'My review 2', 1)
+    second_review.user = user
+    with pytest.raises(RepositoryException):
+        memory_repo.add_review(second_review)
+
+    assert memory_repo.get_reviews_for_track(2) == [review]
+    assert memory_repo.get_review_for_track_by_user(2, 'denis') is review
+
+
 # Test repository search tracks by title
 def test_repository_can_search_tracks_by_title(memory_repo: MemoryRepository):
     # Create sample tracks
@@ -276,3 +453,378 @@ def test_repository_can_search_tracks_by_genre(memory_repo: MemoryRepository):
     # Search tracks based on genre name - no extra whitespace and case-insensitive
     searched_tracks = memory_repo.search_tracks_by_genre(' new test genre ')
     assert sorted(searched_tracks) == [track1, track2]
+
+# Test the indexed searches return exactly the tracks of a case-insensitive substring scan
+@pytest.mark.parametrize('text', ['', 'a', 'Aw', ' awol ', 'food', 'OOD', 'e ', 'way of life', 'hip-hop', 'not in catalog'])
+def test_repository_search_matches_substring_scan(memory_repo: MemoryRepository, text):
+    tracks = memory_repo.get_tracks()
+
+    expected_by_title = [track for track in tracks if search_string(track.title or '', text)]
+    expected_by_artist = [track for track in tracks
+                          if search_string(track.artist.full_name if track.artist else '', text)]
+    expected_by_album = [track for track in tracks
+                         if search_string(track.album.title if track.album else '', text)]
+    expected_by_genre = [track for track in tracks
+                         if any(search_string(genre.name, text) for genre in track.genres)]
+
+    assert memory_repo.search_tracks_by_title(text) == expected_by_title
+    assert memory_repo.search_tracks_by_artist(text) == expected_by_artist
+    assert memory_repo.search_tracks_by_album(text) == expected_by_album
+    assert memory_repo.search_tracks_by_genre(text) == expected_by_genre
+
+
+def test_repository_publishes_new_snapshot_on_write(snapshot_repo: MemoryRepository):
+    snapshot = snapshot_repo.snapshot
+    track = Track(5001, 'My new track 101')
+    snapshot_repo.add_track(track)
+
+    # The snapshot taken before the write is left unchanged
+    assert track not in snapshot.tracks
+    assert 5001 not in snapshot.tracks_by_id
+    assert snapshot.title_index.search('my new track') == []
+
+    # The write is visible through a new version
+    assert snapshot_repo.snapshot.version == snapshot.version + 1
+    assert snapshot_repo.get_track(5001) is track
+    assert snapshot_repo.search_tracks_by_title('my new track') == [track]
+
+
+def test_repository_snapshot_write_shares_the_containers_it_does_not_modify(snapshot_repo: MemoryRepository):
+    snapshot = snapshot_repo.snapshot
+    user = User('denis', 'Denis9389')
+    snapshot_repo.add_user(user)
+    review = Review(snapshot_repo.get_track(2), 'My review', 5)
+    review.user = user
+    snapshot_repo.add_review(review)
+
+    # The catalog and its search indexes are not copied by the writes of users and reviews
+    new_snapshot = snapshot_repo.snapshot
+    for name in ('tracks', 'tracks_by_id', 'tracks_by_title', 'title_index', 'artist_index', 'album_index'):
+        assert getattr(new_snapshot, name) is getattr(snapshot, name)
+    assert snapshot.users_by_name.get('denis') is None and snapshot.reviews_by_track.get(2) is None
+    assert snapshot_repo.get_reviews_for_track(2) == [review]
+
+
+def test_sharded_dict_copy_is_copied_on_write():
+    original = ShardedDict()
+    for key in range(1000):
+        original[key] = str(key)
+
+    copied = copy.copy(original)
+    copied[1000] = 'new'
+    copied[1] = 'one'
+    del copied[2]
+    assert copied.setdefault(3, 'three') == '3'
+
+    # The original is left unchanged
+    assert len(original) == 1000 and 1000 not in original
+    assert original[1] == '1' and original.get(2) == '2'
+    assert dict(original.items()) == {key: str(key) for key in range(1000)}
+
+    assert len(copied) == 1000
+    assert copied[1] == 'one' and 2 not in copied and copied.get(2, 'missing') == 'missing'
+    assert sorted(copied.keys()) == [0, 1] + list(range(3, 1001))
+    assert sorted(copied) == sorted(copied.keys())
+    assert sum(1 for _ in copied.values()) == 1000
+
+
+def test_sharded_dict_pop_owns_the_shard():
+    original = ShardedDict()
+    original[1] = 'one'
+
+    copied = copy.copy(original)
+    assert copied.pop(1) == 'one'
+    assert copied.pop(1, 'missing') == 'missing'
+    with pytest.raises(KeyError):
+        copied.pop(1)
+
+    assert len(copied) == 0 and 1 not in copied
+    assert len(original) == 1 and original[1] == 'one'
+
+
+@pytest.mark.parametrize('snapshot_reads', [False, True])
+def test_repository_can_add_a_track_id_again(snapshot_reads):
+    # A tracks csv file may repeat a track id. The latest track added with it wins the id and the search indexes.
+    repo = MemoryRepository(snapshot_reads=snapshot_reads)
+    repo.add_track(Track(1, 'abc'))
+    repo.add_track(Track(1, 'xyz'))
+    assert repo.get_track(1).title == 'xyz'
+    assert repo.search_tracks_by_title('abc') == []
+    assert repo.search_tracks_by_title('xyz') == [repo.get_track(1)]
+
+    repo = MemoryRepository(snapshot_reads=snapshot_reads)
+    repo.add_many_tracks([Track(1, 'abc'), Track(1, 'abd')])
+    assert repo.get_track(1).title == 'abd'
+    assert repo.search_tracks_by_title('abc') == []
+    assert repo.search_tracks_by_title('abd') == [repo.get_track(1)]
+
+
+def test_repository_get_tracks_returns_a_copy(memory_repo: MemoryRepository):
+    tracks = memory_repo.get_tracks()
+    tracks_by_title = memory_repo.get_tracks(sorting=True)
+    albums_by_title = memory_repo.get_albums(sorting=True)
+    tracks.clear()
+    tracks_by_title.clear()
+    albums_by_title.clear()
+
+    # The repository is unaffected by modifying the returned lists
+    assert len(memory_repo.get_tracks()) == len(memory_repo.get_tracks(sorting=True)) == 10
+    assert len(memory_repo.get_albums(sorting=True)) == memory_repo.get_number_of_albums()
+
+
+# Check that every index of the snapshot agrees with the others
+def check_snapshot_is_consistent(snapshot):
+    tracks = snapshot.tracks
+    assert len(tracks) == len(snapshot.tracks_by_id) == len(snapshot.tracks_by_title)
+    assert len(snapshot.track_title_keys) == len(snapshot.tracks_by_title) == len(snapshot.title_index)
+    assert tracks == sorted(tracks)
+    assert snapshot.track_title_keys == sorted(snapshot.track_title_keys)
+    assert sum(len(album_tracks) for album_tracks in snapshot.tracks_by_album.values()) == \
+        len([track for track in tracks if track.album is not None])
+    assert all(track_id in snapshot.tracks_by_id
+               for track_ids in snapshot.tracks_by_genre.values() for track_id in track_ids)
+    assert sum(len(reviews) for reviews in snapshot.reviews_by_track.values()) == \
+        len(snapshot.reviews_by_track_and_user)
+
+
+def test_repository_readers_never_see_half_updated_snapshot(snapshot_repo: MemoryRepository):
+    album = snapshot_repo.get_album(1)
+    genre = Genre(3031, 'New Genre')
+    writes_done = threading.Event()
+    errors = []
+
+    def write():
+        for index in range(300):
+            track = Track(10000 + index, f'Concurrent track {index}')
+            track.album = album
+            track.add_genre(genre)
+            snapshot_repo.add_track(track)
+
+            user = User(f'user{index}', 'Password1')
+            snapshot_repo.add_user(user)
+            review = Review(track, 'My review', 5)
+            review.user = user
+            snapshot_repo.add_review(review)
+        writes_done.set()
+
+    def read():
+        try:
+            while not writes_done.is_set():
+                check_snapshot_is_consistent(snapshot_repo.snapshot)
+                snapshot_repo.search_tracks_by_title('concurrent')
+                snapshot_repo.search_tracks_by_genre('new genre')
+                snapshot_repo.get_tracks_by_album(1)
+        except Exception as exception:
+            errors.append(exception)
+
+    readers = [threading.Thread(target=read) for _ in range(4)]
+    writer = threading.Thread(target=write)
+    for thread in readers + [writer]:
+        thread.start()
+    for thread in readers + [writer]:
+        thread.join()
+
+    assert errors == []
+    check_snapshot_is_consistent(snapshot_repo.snapshot)
+    assert len(snapshot_repo.search_tracks_by_title('concurrent track')) == 300
+
+
+# Helper function to create a populated memory repository that recovers from the journal in the directory
+def restore_repository(directory, compact_after=1000):
+    repo = MemoryRepository()
+    repository_populate.populate(TEST_DATA_PATH, repo, testing=True, database_mode=False)
+    journal = RepositoryJournal(str(directory), compact_after=compact_after)
+    replayed = journal.restore(repo)
+    repo.attach_journal(journal)
+    return repo, journal, replayed
+
+
+def add_user_review(repo: MemoryRepository, user_name: str, track_id: int) -> Review:
+    user = User(user_name, 'Password1')
+    repo.add_user(user)
+    review = Review(repo.get_track(track_id), f'Review by {user_name}', 4)
+    review.user = user
+    repo.add_review(review)
+    return review
+
+
+def test_journal_keeps_users_and_reviews_across_restarts(tmp_path):
+    repo, journal, _ = restore_repository(tmp_path)
+    review = add_user_review(repo, 'denis', 2)
+    journal.close()
+
+    restored_repo, restored_journal, replayed = restore_repository(tmp_path)
+    restored_journal.close()
+
+    # Both the user and the review records are replayed
+    assert replayed == 2
+    assert restored_repo.get_user('denis').password == 'Password1'
+    restored_review = restored_repo.get_review_for_track_by_user(2, 'denis')
+    assert restored_review.review_text == review.review_text
+    assert restored_review.timestamp == review.timestamp
+
+
+def test_journal_replays_only_records_after_the_snapshot(tmp_path):
+    repo, journal, _ = restore_repository(tmp_path, compact_after=4)
+    add_user_review(repo, 'denis', 2)
+    add_user_review(repo, 'maria', 3)
+    # The fifth record is written after the journal was compacted into the snapshot
+    repo.add_user(User('gabriel', 'Password1'))
+    journal.close()
+
+    assert (tmp_path / SNAPSHOT_FILENAME).exists()
+    assert len((tmp_path / JOURNAL_FILENAME).read_text().splitlines()) == 1
+
+    restored_repo, restored_journal, replayed = restore_repository(tmp_path, compact_after=4)
+    restored_journal.close()
+
+    assert replayed == 1
+    assert restored_journal.sequence == 5
+    for user_name in ('denis', 'maria', 'gabriel'):
+        assert restored_repo.get_user(user_name) is not None
+    assert len(restored_repo.get_reviews_for_track(2)) == 1
+    assert len(restored_repo.get_reviews_for_track(3)) == 1
+
+
+def test_journal_ignores_torn_last_record(tmp_path):
+    repo, journal, _ = restore_repository(tmp_path)
+    repo.add_user(User('denis', 'Password1'))
+    journal.close()
+
+    # Simulate a crash in the middle of writing a record
+    with open(tmp_path / JOURNAL_FILENAME, 'a') as journal_file:
+        journal_file.write('{"seq": 2, "op": "add_us')
+
+    restored_repo, restored_journal, replayed = restore_repository(tmp_path)
+    # The torn record is cut off, so records written after the restart are kept
+    restored_repo.add_user(User('maria', 'Password1'))
+    restored_journal.close()
+
+    assert replayed == 1
+    assert restored_repo.get_user('denis') is not None
+
+    restored_repo, restored_journal, replayed = restore_repository(tmp_path)
+    restored_journal.close()
+    assert replayed == 2
+    assert restored_repo.get_user('maria') is not None
+
+
+def test_journal_cuts_off_last_record_without_newline(tmp_path, caplog):
+    repo, journal, _ = restore_repository(tmp_path)
+    repo.add_user(User('denis', 'Password1'))
+    journal.close()
+
+    # A whole record was written, but the crash happened before its newline
+    with open(tmp_path / JOURNAL_FILENAME, 'a') as journal_file:
+        journal_file.write('{"seq": 2, "op": "add_user", "user_name": "maria", "password": "Password1"}')
+
+    restored_repo, restored_journal, replayed = restore_repository(tmp_path)
+    assert replayed == 1
+    assert restored_repo.get_user('maria') is None
+    assert 'incomplete last journal record' in caplog.text
+
+    # The records written after the restart are not appended to the cut off record
+    restored_repo.add_user(User('fmercury', 'Password1'))
+    restored_repo.add_user(User('gmichael', 'Password1'))
+    restored_journal.close()
+
+    restored_repo, restored_journal, replayed = restore_repository(tmp_path)
+    restored_journal.close()
+    assert replayed == 3
+    assert [user.user_name for user in restored_repo.get_users_by_names(['denis', 'fmercury', 'gmichael'])] == [
+        'denis', 'fmercury', 'gmichael']
+
+
+def test_journal_rejects_corrupt_record_in_the_middle(tmp_path):
+    repo, journal, _ = restore_repository(tmp_path)
+    repo.add_user(User('denis', 'Password1'))
+    journal.close()
+    with open(tmp_path / JOURNAL_FILENAME, 'a') as journal_file:
+        journal_file.write('{"seq": 2, "op": "add_us\n')
+        journal_file.write('{"seq": 3, "op": "add_user", "user_name": "maria", "password": "Password1"}\n')
+    journal_size = (tmp_path / JOURNAL_FILENAME).stat().st_size
+
+    # The records after the corrupt one are not silently dropped
+    with pytest.raises(CorruptJournalException):
+        RepositoryJournal(str(tmp_path)).restore(MemoryRepository())
+    assert (tmp_path / JOURNAL_FILENAME).stat().st_size == journal_size
+
+
+@pytest.mark.parametrize('snapshot_reads', (False, True))
+def test_repository_does_not_publish_a_write_the_journal_failed(tmp_path, monkeypatch, snapshot_reads):
+    repo = MemoryRepository(snapshot_reads=snapshot_reads)
+    repository_populate.populate(TEST_DATA_PATH, repo, testing=True, database_mode=False)
+    journal = RepositoryJournal(str(tmp_path), fsync_batch_size=1)
+    journal.restore(repo)
+    repo.attach_journal(journal)
+    repo.add_user(User('denis', 'Password1'))
+    journal_size = (tmp_path / JOURNAL_FILENAME).stat().st_size
+
+    # The disk fails while the review is journaled
+    def failing_fsync(fd):
+        raise OSError('No space left on device')
+    with monkeypatch.context() as patch:
+        patch.setattr('music.adapters.journal.os.fsync', failing_fsync)
+        review = Review(repo.get_track(2), 'My review', 5)
+        review.user = repo.get_user('denis')
+        with pytest.raises(OSError):
+            repo.add_review(review)
+
+    # Readers do not see the review, and the journal is left as it was
+    assert repo.get_reviews_for_track(2) == []
+    assert repo.get_review_for_track_by_user(2, 'denis') is None
+    assert (tmp_path / JOURNAL_FILENAME).stat().st_size == journal_size
+    assert journal.sequence == 1
+
+    repo.add_user(User('maria', 'Password1'))
+    journal.close()
+    restored_repo, restored_journal, replayed = restore_repository(tmp_path)
+    restored_journal.close()
+    assert replayed == 2
+    assert restored_repo.get_reviews_for_track(2) == []
+
+
+def test_journal_fsyncs_a_lone_record_within_the_interval(tmp_path, monkeypatch):
+    fsynced = threading.Event()
+    fsync = os.fsync
+    def recording_fsync(fd):
+        fsync(fd)
+        fsynced.set()
+
+    repo = MemoryRepository()
+    journal = RepositoryJournal(str(tmp_path), fsync_batch_size=100, fsync_interval=0.05)
+    journal.restore(repo)
+    repo.attach_journal(journal)
+    monkeypatch.setattr('music.adapters.journal.os.fsync', recording_fsync)
+
+    # No other record follows, and the journal is not closed
+    repo.add_user(User('denis', 'Password1'))
+    assert fsynced.wait(5)
+    journal.close()
+
+
+def test_populate_in_batches_matches_populate():
+    repo = MemoryRepository()
+    repository_populate.populate(TEST_DATA_PATH, repo, testing=True, database_mode=False)
+    batch_repo = MemoryRepository()
+    repository_populate.populate(TEST_DATA_PATH, batch_repo, testing=True, database_mode=False, batch_size=3)
+
+    assert batch_repo.get_tracks() == repo.get_tracks()
+    assert sorted(batch_repo.get_albums()) == sorted(repo.get_albums())
+    assert sorted(batch_repo.get_artists()) == sorted(repo.get_artists())
+    assert sorted(batch_repo.get_genres()) == sorted(repo.get_genres())
+    assert batch_repo.get_tracks_by_album(1) == repo.get_tracks_by_album(1)
+    assert batch_repo.search_tracks_by_genre('hip') == repo.search_tracks_by_genre('hip')
+
+
+def test_populate_in_batches_merges_the_tracks_once(monkeypatch):
+    repo = MemoryRepository()
+    added_batches = []
+    add_many_tracks = repo.add_many_tracks
+    monkeypatch.setattr(repo, 'add_many_tracks', lambda tracks: added_batches.append(len(tracks)) or
+                        add_many_tracks(tracks))
+
+    repository_populate.populate(TEST_DATA_PATH, repo, testing=True, database_mode=False, batch_size=3)
+
+    # The batches are gathered, so the ordered lists are merged with the tracks once rather than per batch
+    assert added_batches == [repo.get_number_of_tracks()]
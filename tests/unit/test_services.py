@@ -85,6 +85,21 @@ def test_get_albums_for_page(memory_repo):
     assert len(page_albums) == 5
 
 
+def test_get_albums_for_cursor(memory_repo):
+    first_albums = albums_services.get_albums_for_page(0, 2, memory_repo)
+
+    cursor = albums_services.next_albums_cursor(0, first_albums)
+    page_albums, page_index = albums_services.get_albums_for_cursor(cursor, 2, memory_repo)
+    assert page_index == 1
+    assert page_albums == albums_services.get_albums_for_page(1, 2, memory_repo)
+
+    # There are 5 albums, so the last page has only one album
+    cursor = albums_services.last_albums_cursor(albums_services.get_number_of_albums(memory_repo), 2)
+    page_albums, page_index = albums_services.get_albums_for_cursor(cursor, 2, memory_repo)
+    assert page_index == 2
+    assert page_albums == albums_services.get_albums_for_page(2, 2, memory_repo)
+
+
 def test_get_track(memory_repo):
     track_id = 2
 
@@ -129,31 +144,72 @@ def test_cannot_get_tracks_for_invalid_page(memory_repo):
         tracks_services.get_tracks_for_page(float('inf'), 10, memory_repo)
 
 
-def test_can_get_tracks_for_search(memory_repo):
-    # Test getting tracks for a search_key 'album'
-    searched_tracks = tracks_services.get_tracks_for_search(
-        'album', 'awol', memory_repo)
-    assert type(searched_tracks) is list
-    assert len(searched_tracks) > 0
+def test_can_get_tracks_for_cursor(memory_repo):
+    tracks_per_page = 3
+    number_of_tracks = tracks_services.get_number_of_tracks(memory_repo)
+
+    # Following the next page cursors visits the same pages as the page indexes
+    page_tracks = tracks_services.get_tracks_for_page(0, tracks_per_page, memory_repo)
+    for page_index in range(1, (number_of_tracks - 1) // tracks_per_page + 1):
+        cursor = tracks_services.next_tracks_cursor(page_index - 1, page_tracks)
+        page_tracks, cursor_page_index = tracks_services.get_tracks_for_cursor(cursor, tracks_per_page, memory_repo)
+        assert cursor_page_index == page_index
+        assert page_tracks == tracks_services.get_tracks_for_page(page_index, tracks_per_page, memory_repo)
+
+    # The last page cursor finds the last page without seeking through the others
+    last_cursor = tracks_services.last_tracks_cursor(number_of_tracks, tracks_per_page)
+    last_tracks, last_page_index = tracks_services.get_tracks_for_cursor(last_cursor, tracks_per_page, memory_repo)
+    assert last_tracks == page_tracks
+
+    # The previous page cursor goes back one page
+    cursor = tracks_services.previous_tracks_cursor(last_page_index, last_tracks)
+    previous_tracks, page_index = tracks_services.get_tracks_for_cursor(cursor, tracks_per_page, memory_repo)
+    assert page_index == last_page_index - 1
+    assert previous_tracks == tracks_services.get_tracks_for_page(page_index, tracks_per_page, memory_repo)
+
+
+def test_cannot_get_tracks_for_invalid_cursor(memory_repo):
+    with pytest.raises(InvalidPageException):
+        tracks_services.get_tracks_for_cursor('Invalid cursor', 3, memory_repo)
+
+    # The cursor after the last track has no page
+    last_tracks = tracks_services.get_tracks_for_page(3, 3, memory_repo)
+    with pytest.raises(InvalidPageException):
+        tracks_services.get_tracks_for_cursor(tracks_services.next_tracks_cursor(3, last_tracks), 3, memory_repo)
+
+
+def test_can_get_tracks_for_search_page_by_each_search_key(memory_repo):
+    # Test getting tracks for the search keys 'album', 'artist' and 'genre'
+    for search_key, text in (('album', 'awol'), ('artist', 'awol'), ('genre', 'hip-hop')):
+        page_tracks, total = tracks_services.get_tracks_for_search_page(search_key, text, 0, 10, memory_repo)
+        assert type(page_tracks) is list
+        assert len(page_tracks) > 0
+        assert total >= len(page_tracks)
+
 
-    # Test getting tracks for a search_key 'artist'
-    searched_tracks = tracks_services.get_tracks_for_search(
-        'artist', 'awol', memory_repo)
-    assert type(searched_tracks) is list
-    assert len(searched_tracks) > 0
+def test_can_get_tracks_for_search_page(memory_repo):
+    all_searched_tracks = memory_repo.search_tracks_by_title('e')
 
-    # Test getting tracks for a search_key 'genre'
-    searched_tracks = tracks_services.get_tracks_for_search(
-        'genre', 'hip-hop', memory_repo)
-    assert type(searched_tracks) is list
-    assert len(searched_tracks) > 0
+    # Test only the tracks of the page are returned, along with the total number of searched tracks
+    page_tracks, total = tracks_services.get_tracks_for_search_page('title', 'e', 1, 2, memory_repo)
+    assert total == len(all_searched_tracks)
+    assert page_tracks == tracks_services.tracks_to_dicts(all_searched_tracks[2:4], 2)
+
+    # Test a page after the last searched track is empty
+    page_tracks, total = tracks_services.get_tracks_for_search_page('title', 'e', 100, 2, memory_repo)
+    assert page_tracks == []
+    assert total == len(all_searched_tracks)
+
+    # Test inserting non-existing search key throws exception
+    with pytest.raises(InvalidSearchKeyException):
+        tracks_services.get_tracks_for_search_page('Invalid search key', 'e', 0, 2, memory_repo)
 
 
 def test_cannot_get_tracks_for_invalid_search_key(memory_repo):
     search_key = 'Invalid search key'
     # Test inserting non-existing search key throws exception
     with pytest.raises(InvalidSearchKeyException):
-        tracks_services.get_tracks_for_search(search_key, 'text', memory_repo)
+        tracks_services.get_tracks_for_search_page(search_key, 'text', 0, 10, memory_repo)
 
 
 def test_add_and_get_reviews_for_track(memory_repo):
@@ -176,6 +232,20 @@ def test_add_and_get_reviews_for_track(memory_repo):
     assert 5 in [review['rating'] for review in review_dicts]
 
 
+def test_cannot_add_review_twice_for_same_track(memory_repo):
+    track_id = 2
+    user_name = 'denis'
+    auth_services.add_user(user_name, 'De39sjl3dj', memory_repo)
+
+    # The first review is added, the second review by the same user is rejected.
+    assert tracks_services.add_review(track_id, user_name, 'My new review', 5, memory_repo)
+    assert not tracks_services.add_review(track_id, user_name, 'My second review', 4, memory_repo)
+
+    user_review = tracks_services.get_review_for_track_by_user(track_id, user_name, memory_repo)
+    assert user_review['review_text'] == 'My new review'
+    assert len(tracks_services.get_reviews_for_track(track_id, memory_repo)) == 1
+
+
 def test_cannot_add_review_for_non_existing_track(memory_repo):
     # Add the user who will write the review
     user_name = 'denis'
@@ -1,10 +1,13 @@
+from os import environ
+
 import pytest
 
 from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, clear_mappers
+from sqlalchemy.orm import sessionmaker, clear_mappers, close_all_sessions
 
 from music.adapters import database_repository, repository_populate
 from music.adapters.orm import metadata, map_model_to_tables
+from music.adapters.database_engine import create_database_engine
 
 from utils import get_project_root
 
@@ -12,6 +15,9 @@ TEST_DATA_PATH_DATABASE_LIMITED = get_project_root() / "tests" / "data"
 
 TEST_DATABASE_URI_IN_MEMORY = 'sqlite://'
 TEST_DATABASE_URI_FILE = 'sqlite:///cs235-music-library-test.db'
+# URI of an empty PostgreSQL database that the PostgreSQL tests may drop and create the tables in,
+# such as postgresql://postgres@localhost/music_test. The PostgreSQL tests are skipped if it is not set.
+TEST_POSTGRES_URI = environ.get('TEST_POSTGRES_URI')
 
 
 @pytest.fixture
@@ -66,3 +72,25 @@ def empty_session():
     session_factory = sessionmaker(bind=engine)
     yield session_factory()
     metadata.drop_all(engine)
+
+
+@pytest.fixture
+def postgres_session_factory():
+    if not TEST_POSTGRES_URI:
+        pytest.skip('TEST_POSTGRES_URI is not set')
+    pytest.importorskip('psycopg2')
+    clear_mappers()
+    engine = create_database_engine(TEST_POSTGRES_URI)
+    metadata.drop_all(engine)
+    metadata.create_all(engine)
+    map_model_to_tables()
+    session_factory = sessionmaker(
+        autocommit=False, autoflush=True, bind=engine)
+    repo_instance = database_repository.SqlAlchemyRepository(session_factory)
+    repository_populate.populate(
+        TEST_DATA_PATH_DATABASE_LIMITED, repo_instance, testing=True, database_mode=True)
+    yield session_factory
+    # The open transactions of the sessions would block dropping the tables.
+    close_all_sessions()
+    metadata.drop_all(engine)
+    engine.dispose()
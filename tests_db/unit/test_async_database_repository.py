@@ -0,0 +1,121 @@
+import asyncio
+import inspect
+
+import pytest
+
+from sqlalchemy.orm import sessionmaker, clear_mappers
+
+from music import create_app
+from music.adapters.async_database_repository import AsyncSqlAlchemyRepository, async_session_factory
+from music.adapters.database_engine import create_async_database_engine
+from music.adapters.database_repository import SqlAlchemyRepository
+from music.adapters.utils import title_sort_key
+from music.domainmodel.user import User
+from music.domainmodel.review import Review
+from music.tracks import services as tracks_services, async_services as async_tracks_services
+from music.albums import services as albums_services, async_services as async_albums_services
+
+from tests_db.conftest import TEST_DATABASE_URI_FILE, TEST_DATA_PATH_DATABASE_LIMITED
+
+pytest.importorskip('aiosqlite')
+
+
+@pytest.fixture
+def repos(database_engine):
+    # The sync and async repositories over the same populated database file.
+    async_engine = create_async_database_engine(TEST_DATABASE_URI_FILE)
+    yield (SqlAlchemyRepository(sessionmaker(bind=database_engine)),
+           AsyncSqlAlchemyRepository(async_session_factory(async_engine)))
+    asyncio.run(async_engine.dispose())
+
+
+def test_async_repository_reads_match_sync_repository(repos):
+    repo, async_repo = repos
+    key = title_sort_key('Food', 2)
+
+    async def read_all():
+        return await asyncio.gather(
+            async_repo.get_track(2), async_repo.get_tracks_page(2, 3), async_repo.get_tracks_after(key, 3),
+            async_repo.get_tracks_before(key, 3), async_repo.get_tracks_by_album(1),
+            async_repo.get_number_of_tracks(), async_repo.get_album(1), async_repo.get_albums_page(1, 2),
+            async_repo.get_number_of_albums())
+
+    track, page, after, before, album_tracks, number_of_tracks, album, albums, number_of_albums = asyncio.run(
+        read_all())
+
+    # The entities are detached, with the relationships the dicts need loaded
+    assert tracks_services.track_to_dict(track) == tracks_services.track_to_dict(repo.get_track(2))
+    assert tracks_services.tracks_to_dicts(page) == tracks_services.tracks_to_dicts(repo.get_tracks_page(2, 3))
+    assert tracks_services.tracks_to_dicts(after) == tracks_services.tracks_to_dicts(repo.get_tracks_after(key, 3))
+    assert tracks_services.tracks_to_dicts(before) == tracks_services.tracks_to_dicts(repo.get_tracks_before(key, 3))
+    assert tracks_services.tracks_to_dicts(album_tracks) == tracks_services.tracks_to_dicts(
+        repo.get_tracks_by_album(1))
+    assert number_of_tracks == repo.get_number_of_tracks()
+    assert album == repo.get_album(1)
+    assert albums == repo.get_albums_page(1, 2)
+    assert number_of_albums == repo.get_number_of_albums()
+
+    assert asyncio.run(async_repo.get_track(10201901)) is None
+
+
+@pytest.mark.parametrize(('search_key', 'text'), (
+    ('title', 'food'), ('artist', 'awol'), ('album', 'awol'), ('genre', 'hip'), ('title', '%'),
+))
+def test_async_repository_searches_match_sync_repository(repos, search_key, text):
+    repo, async_repo = repos
+
+    async_page, async_total = asyncio.run(
+        async_tracks_services.get_tracks_for_search_page(search_key, text, 0, 3, async_repo))
+    assert (async_page, async_total) == tracks_services.get_tracks_for_search_page(search_key, text, 0, 3, repo)
+
+
+def test_async_services_read_track_and_album_detail(repos):
+    repo, async_repo = repos
+    user = User('denis', 'Denis9389')
+    repo.add_user(user)
+    review = Review(repo.get_track(2), 'My review 1', 5)
+    review.user = user
+    repo.add_review(review)
+
+    track, user_review = asyncio.run(async_tracks_services.get_track_detail(2, 'Denis', async_repo))
+    assert track['title'] == 'Food'
+    assert track['reviews'] == tracks_services.get_reviews_for_track(2, repo)
+    assert user_review == tracks_services.get_review_for_track_by_user(2, 'denis', repo)
+
+    album, album_tracks = asyncio.run(async_albums_services.get_album_detail(1, async_repo))
+    assert album == albums_services.get_album(1, repo)
+    assert album_tracks == albums_services.get_tracks_by_album(1, repo)
+
+    cursor = albums_services.last_albums_cursor(albums_services.get_number_of_albums(repo), 2)
+    assert asyncio.run(async_albums_services.get_albums_for_cursor(cursor, 2, async_repo)) == \
+        albums_services.get_albums_for_cursor(cursor, 2, repo)
+
+
+def test_async_views_render_the_same_pages(tmp_path):
+    def make_app(async_database):
+        return create_app({
+            'TESTING': True,
+            'REPOSITORY': 'database',
+            'SQLALCHEMY_DATABASE_URI': f'sqlite:///{tmp_path / "music.db"}',
+            'ASYNC_DATABASE': async_database,
+            'TEST_DATA_PATH': TEST_DATA_PATH_DATABASE_LIMITED,
+            'WTF_CSRF_ENABLED': False,
+        })
+
+    urls = ('/browse_tracks', f'/browse_tracks?cursor={tracks_services.last_tracks_cursor(10, 10)}',
+            '/track_detail?track_id=2', '/search_tracks?page=0&search_key=genre&text=hip',
+            '/browse_albums', '/album_detail?album_id=1')
+    # The repositories are global, so the pages of the sync views are rendered before the async app is created.
+    sync_client = make_app(False).test_client()
+    sync_pages = [sync_client.get(url).data for url in urls]
+
+    # The async app finds the database populated by the sync app, and maps the model again
+    clear_mappers()
+    async_app = make_app(True)
+    assert inspect.iscoroutinefunction(async_app.view_functions['tracks_bp.track_detail'])
+    async_client = async_app.test_client()
+
+    for url, sync_page in zip(urls, sync_pages):
+        async_response = async_client.get(url)
+        assert async_response.status_code == 200
+        assert async_response.data == sync_page
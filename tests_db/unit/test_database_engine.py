@@ -0,0 +1,82 @@
+import subprocess
+import sys
+
+import pytest
+
+from sqlalchemy.pool import StaticPool, QueuePool, NullPool
+
+from music.adapters.database_engine import create_database_engine, sqlite_pragmas, async_database_url
+
+from tests_db.conftest import TEST_DATA_PATH_DATABASE_LIMITED
+
+
+def read_pragma(engine, name):
+    with engine.connect() as connection:
+        return connection.exec_driver_sql(f'PRAGMA {name}').scalar()
+
+
+@pytest.mark.parametrize(('database_uri', 'pool_mode', 'pool_class'), (
+    ('sqlite://', 'auto', StaticPool),
+    ('sqlite:///music.db', 'auto', QueuePool),
+    ('sqlite:///music.db', 'null', NullPool),
+    ('sqlite:///music.db', 'static', StaticPool),
+))
+def test_engine_pool_is_chosen_per_backend(database_uri, pool_mode, pool_class):
+    engine = create_database_engine(database_uri, pool_mode=pool_mode)
+    assert type(engine.pool) is pool_class
+
+
+def test_engine_rejects_unknown_pool_mode():
+    with pytest.raises(ValueError):
+        create_database_engine('sqlite://', pool_mode='unknown')
+
+
+def test_engine_sets_sqlite_pragmas_on_connect(tmp_path):
+    engine = create_database_engine(
+        f'sqlite:///{tmp_path / "music.db"}', sqlite_pragmas=sqlite_pragmas('serving', {'cache_size': -1024}))
+
+    assert read_pragma(engine, 'journal_mode') == 'wal'
+    assert read_pragma(engine, 'synchronous') == 1  # NORMAL
+    assert read_pragma(engine, 'busy_timeout') == 5000
+    # The override replaces the value of the preset
+    assert read_pragma(engine, 'cache_size') == -1024
+    engine.dispose()
+
+    # The bulk population preset does not sync the writes
+    engine = create_database_engine(f'sqlite:///{tmp_path / "music.db"}', sqlite_pragmas=sqlite_pragmas('bulk_load'))
+    assert read_pragma(engine, 'synchronous') == 0
+    engine.dispose()
+
+
+def test_sqlite_pragmas_rejects_unknown_presets_and_pragmas():
+    with pytest.raises(ValueError):
+        sqlite_pragmas('unknown')
+    with pytest.raises(ValueError):
+        sqlite_pragmas('serving', {'foreign_keys': 'ON'})
+    # Unset overrides keep the values of the preset
+    assert sqlite_pragmas('serving', {'cache_size': None}) == sqlite_pragmas('serving')
+
+
+def test_async_database_url_uses_the_asyncio_driver():
+    assert str(async_database_url('sqlite:///music.db')) == 'sqlite+aiosqlite:///music.db'
+
+    # An in-memory database would be a different database for each connection of the async engine
+    with pytest.raises(ValueError):
+        async_database_url('sqlite://')
+    with pytest.raises(ValueError):
+        async_database_url('mysql://localhost/music')
+
+
+def test_sync_app_does_not_import_the_async_modules(tmp_path):
+    # A new interpreter, as the other tests import the async modules
+    script = f"""
+import sys
+from music import create_app
+create_app({{'TESTING': True, 'REPOSITORY': 'database', 'ASYNC_DATABASE': False,
+            'SQLALCHEMY_DATABASE_URI': {f'sqlite:///{tmp_path / "music.db"}'!r},
+            'TEST_DATA_PATH': {str(TEST_DATA_PATH_DATABASE_LIMITED)!r}}})
+print(sorted(name for name in ('aiosqlite', 'sqlalchemy.ext.asyncio', 'music.adapters.async_database_repository',
+                               'music.tracks.async_tracks', 'music.albums.async_albums') if name in sys.modules))
+"""
+    result = subprocess.run([sys.executable, '-c', script], capture_output=True, text=True, check=True)
+    assert result.stdout.splitlines()[-1] == '[]'
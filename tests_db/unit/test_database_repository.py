@@ -1,12 +1,17 @@
 import pytest
 
+from sqlalchemy import event, inspect, text
+
 from music.adapters.database_repository import SqlAlchemyRepository
+from music.adapters.database_engine import StatementCacheStatistics
 from music.domainmodel.user import User, Track
 from music.domainmodel.album import Album
 from music.domainmodel.artist import Artist
 from music.domainmodel.genre import Genre
 from music.domainmodel.review import Review
 from music.adapters.repository import RepositoryException
+from music.adapters.utils import title_sort_key
+from music.tracks import services as tracks_services
 
 
 def test_repository_can_add_a_user(session_factory):
@@ -88,6 +93,30 @@ def test_repository_does_not_retrieve_a_non_existent_track(session_factory):
     assert track is None
 
 
+def test_repository_can_retrieve_many_by_ids(session_factory):
+    repo = SqlAlchemyRepository(session_factory)
+    track_ids = [track.track_id for track in repo.get_tracks()][:4]
+    repo.add_user(User('denis', 'Denis9389'))
+    repo.add_user(User('fmercury', 'Freddie9389'))
+    repo.reset_session()
+    # The reference data cache of albums, artists and genres is loaded by the first read
+    repo.get_genres()
+
+    # One query for the tracks and one for their genres, whatever the number of ids
+    ids = [track_ids[2], 10201901, track_ids[0], track_ids[3], track_ids[0]]
+    with QueryCounter(session_factory) as counter:
+        tracks = repo.get_tracks_by_ids(ids)
+        tracks_services.tracks_to_dicts(tracks)
+    assert counter.count == 2
+
+    # The entities are returned in the order of the ids, and the ids without an entity are skipped.
+    assert [track.track_id for track in tracks] == [track_ids[2], track_ids[0], track_ids[3], track_ids[0]]
+    assert [album.album_id for album in repo.get_albums_by_ids([4, -1, 1])] == [4, 1]
+    assert [user.user_name for user in repo.get_users_by_names([' FMercury', 'unknown', 'denis'])
+            ] == ['fmercury', 'denis']
+    assert repo.get_tracks_by_ids([]) == []
+
+
 def test_repository_can_retrieve_track_count(session_factory):
     repo = SqlAlchemyRepository(session_factory)
     number_of_tracks = repo.get_number_of_tracks()
@@ -141,6 +170,68 @@ def test_repository_can_retrieve_albums(session_factory):
     assert len(albums) == 5
 
 
+def test_repository_can_get_tracks_by_album(session_factory):
+    repo = SqlAlchemyRepository(session_factory)
+
+    album_tracks = repo.get_tracks_by_album(1)
+    # Check there are total 4 tracks for this album, ordered by track id
+    assert len(album_tracks) == 4
+    assert album_tracks == sorted(album_tracks)
+    assert 'Food' in [track.title for track in album_tracks]
+
+    # Non-existing album has no tracks
+    assert repo.get_tracks_by_album(134123123121) == []
+
+
+def test_repository_can_retrieve_pages_of_tracks_and_albums(session_factory):
+    repo = SqlAlchemyRepository(session_factory)
+    repo.add_track(Track(5001, 'Aardvark'))
+    repo.add_track(Track(5002, '123 numbers first'))
+
+    # The pages ordered by the sort_key column match sorting all tracks by title
+    sorted_tracks = repo.get_tracks(sorting=True)
+    assert repo.get_tracks_page(0, len(sorted_tracks)) == sorted_tracks
+    assert repo.get_tracks_page(0, 1)[0].title == 'Aardvark'
+    assert repo.get_tracks_page(len(sorted_tracks) - 1, 10)[0].title == '123 numbers first'
+    assert repo.get_tracks_page(2, 3, sorting=False) == sorted(repo.get_tracks())[2:5]
+    assert repo.get_tracks_page(len(sorted_tracks), 10) == []
+
+    sorted_albums = repo.get_albums(sorting=True)
+    assert repo.get_albums_page(1, 2) == sorted_albums[1:3]
+    assert repo.get_albums_page(1, 2, sorting=False) == sorted(repo.get_albums())[1:3]
+
+
+def test_repository_can_seek_pages_of_tracks_and_albums(session_factory):
+    repo = SqlAlchemyRepository(session_factory)
+    # Equal titles are ordered by their ids
+    repo.add_many_tracks([Track(5001, 'Food'), Track(5002, 'Food')])
+
+    sorted_tracks = repo.get_tracks(sorting=True)
+    keys = [title_sort_key(track.title, track.track_id) for track in sorted_tracks]
+    for index in range(len(sorted_tracks)):
+        assert repo.get_tracks_after(keys[index], 3) == sorted_tracks[index + 1:index + 4]
+        assert repo.get_tracks_before(keys[index], 3) == sorted_tracks[max(index - 3, 0):index]
+    assert repo.get_tracks_after(None, 3) == sorted_tracks[:3]
+    assert repo.get_tracks_before(None, 3) == sorted_tracks[-3:]
+
+    sorted_albums = repo.get_albums(sorting=True)
+    album_key = title_sort_key(sorted_albums[1].title, sorted_albums[1].album_id)
+    assert repo.get_albums_after(album_key, 2) == sorted_albums[2:4]
+    assert repo.get_albums_before(album_key, 2) == sorted_albums[:1]
+
+
+def test_repository_pages_follow_renamed_titles(session_factory):
+    repo = SqlAlchemyRepository(session_factory)
+    album = Album(15212, 'Zebra')
+    repo.add_album(album)
+    assert repo.get_albums_page(repo.get_number_of_albums() - 1, 1) == [album]
+
+    # Renaming the album updates its sort key
+    album.title = 'Aardvark'
+    repo.add_album(album)
+    assert repo.get_albums_page(0, 1) == [album]
+
+
 def test_repository_can_add_artist(session_factory):
     repo = SqlAlchemyRepository(session_factory)
 
@@ -202,6 +293,60 @@ def test_repository_can_retrieve_review_for_a_track(session_factory):
     assert len(repo.get_reviews_for_track(track_id)) == 1
 
 
+def test_repository_can_retrieve_review_for_a_track_by_user(session_factory):
+    repo = SqlAlchemyRepository(session_factory)
+
+    track = repo.get_track(2)
+    user = User('denis', 'Denis9389')
+    repo.add_user(user)
+
+    # Initially the user has not reviewed the track
+    assert repo.get_review_for_track_by_user(2, 'denis') is None
+
+    review = Review(track, 'My review 1', 5)
+    review.user = user
+    repo.add_review(review)
+
+    # Retrieving the review is case-insensitive without trailing spaces.
+    assert repo.get_review_for_track_by_user(2, ' Denis ') == review
+    # The review is not found for other tracks or anonymous users
+    assert repo.get_review_for_track_by_user(3, 'denis') is None
+    assert repo.get_review_for_track_by_user(2, None) is None
+
+
+def test_repository_does_not_add_second_review_by_user(session_factory):
+    repo = SqlAlchemyRepository(session_factory)
+
+    track = repo.get_track(2)
+    user = User('denis', 'Denis9389')
+    repo.add_user(user)
+
+    review = Review(track, 'My review 1', 5)
+    review.user = user
+    repo.add_review(review)
+
+    # The unique index on the reviews table rejects the second review of the user
+    second_review = Review(track, 'My review 2', 1)
+    second_review.user = user
+    with pytest.raises(RepositoryException):
+        repo.add_review(second_review)
+
+    reviews = repo.get_reviews_for_track(2)
+    assert [review.review_text for review in reviews] == ['My review 1']
+
+
+def test_repository_can_search_tracks_for_page_window(session_factory):
+    repo = SqlAlchemyRepository(session_factory)
+
+    searched_tracks = repo.search_tracks_by_artist('awol')
+    search_result = repo.search_tracks('artist', 'awol')
+
+    # The result carries the total number of tracks and fetches the tracks of the window
+    assert search_result.total == len(searched_tracks)
+    assert search_result.get_tracks(1, 2) == searched_tracks[1:3]
+    assert search_result.get_tracks(search_result.total, 2) == []
+
+
 # Test repository search tracks by title
 def test_repository_can_search_tracks_by_title(session_factory):
     repo = SqlAlchemyRepository(session_factory)
@@ -293,3 +438,322 @@ def test_repository_can_search_tracks_by_genre(session_factory):
     # Search tracks based on genre name - no extra whitespace and case-insensitive
     searched_tracks = repo.search_tracks_by_genre(' new test genre ')
     assert sorted(searched_tracks) == [track1, track2]
+
+
+def test_repository_search_tracks_by_genre_returns_each_track_once(session_factory):
+    repo = SqlAlchemyRepository(session_factory)
+
+    genre1 = Genre(2918392, 'New Test Genre')
+    genre2 = Genre(2918393, 'Another New Test Genre')
+
+    # The track matches through both of its genres
+    track = Track(29149939, 'New track 1')
+    track.add_genre(genre1)
+    track.add_genre(genre2)
+
+    repo.add_many_genres([genre1, genre2])
+    repo.add_track(track)
+
+    assert repo.search_tracks_by_genre('new test genre') == [track]
+    assert repo.search_tracks_by_genre('genre that does not exist') == []
+
+
+def test_repository_search_treats_like_wildcards_as_text(session_factory):
+    # The substring search is used when the full-text index is not available
+    repo = SqlAlchemyRepository(session_factory, full_text_search=False)
+
+    track1 = Track(29149939, '100% Pure_Love')
+    track2 = Track(29149940, '100 Pure Love')
+    repo.add_track(track1)
+    repo.add_track(track2)
+
+    # % and _ only match themselves, as in a substring search
+    assert repo.search_tracks_by_title('100%') == [track1]
+    assert repo.search_tracks_by_title('PURE_love') == [track1]
+    assert sorted(repo.search_tracks_by_title('pure')) == [track1, track2]
+
+    # An empty search string is contained in every title
+    assert len(repo.search_tracks_by_title('  ')) == repo.get_number_of_tracks()
+
+
+def test_repository_full_text_search_matches_substrings(session_factory):
+    repo = SqlAlchemyRepository(session_factory)
+
+    track1 = Track(29149939, 'Midnight Drive')
+    track2 = Track(29149940, 'Drive at midnight')
+    track3 = Track(29149941, 'Drivers')
+    repo.add_many_tracks([track1, track2, track3])
+
+    # The text is matched as a substring, case-insensitive and without trailing spaces
+    assert sorted(repo.search_tracks_by_title('drive')) == [track1, track2, track3]
+    assert repo.search_tracks_by_title('  MIDNIGHT dri ') == [track1]
+    assert repo.search_tracks_by_title('idnigh') == sorted([track1, track2], key=lambda track: track.track_id)
+    assert repo.search_tracks_by_title('ive at') == [track2]
+    # Texts shorter than a trigram fall back to the substring search
+    assert sorted(repo.search_tracks_by_title('rs')) == [track3]
+    # Quotes and FTS5 operators are searched as plain text
+    assert repo.search_tracks_by_title('"drive" OR NOT') == []
+
+
+def test_repository_full_text_search_finds_the_same_tracks_as_substring_search(session_factory):
+    repo = SqlAlchemyRepository(session_factory)
+    substring_repo = SqlAlchemyRepository(session_factory, full_text_search=False)
+
+    for search_key, text in [('title', 'oo'), ('title', 'ood'), ('title', ' the '), ('artist', 'ayo'),
+                             ('artist', 'r-k'), ('album', 'ani'), ('genre', 'hip'), ('genre', 'op-h'),
+                             ('genre', 'hop rock')]:
+        assert (sorted(repo.search_tracks(search_key, text).get_tracks(0, 1000)) ==
+                sorted(substring_repo.search_tracks(search_key, text).get_tracks(0, 1000))), (search_key, text)
+
+
+def test_repository_full_text_index_follows_catalog_changes(session_factory):
+    repo = SqlAlchemyRepository(session_factory)
+
+    artist = Artist(2918392, 'New Test Artist')
+    album = Album(2918392, 'New Test Album')
+    genre = Genre(2918392, 'New Test Genre')
+    track = Track(29149939, 'New track 1')
+    track.artist = artist
+    track.album = album
+    track.add_genre(genre)
+
+    # The track is added before its artist and album
+    repo.add_track(track)
+    repo.add_artist(artist)
+    repo.add_album(album)
+
+    assert repo.search_tracks_by_artist('new test art') == [track]
+    assert repo.search_tracks_by_album('new test alb') == [track]
+    assert repo.search_tracks_by_genre('new test gen') == [track]
+
+    # Renaming the album updates the index
+    album.title = 'Renamed Album'
+    repo.add_album(album)
+    assert repo.search_tracks_by_album('new test album') == []
+    assert repo.search_tracks_by_album('renamed') == [track]
+
+    session = session_factory()
+    # A genre inserted after the track_genres row of the track updates the index
+    session.execute(text('INSERT INTO track_genres (track_id, genre_id) VALUES (29149939, 2918393)'))
+    session.execute(text("INSERT INTO genres (genre_id, name) VALUES (2918393, 'Late Genre')"))
+    # Deleting the artist and the genre updates the index
+    session.execute(text('DELETE FROM artists WHERE artist_id = 2918392'))
+    session.execute(text('DELETE FROM genres WHERE genre_id = 2918392'))
+    session.commit()
+    full_text_repo = SqlAlchemyRepository(session_factory, reference_cache=False)
+    assert full_text_repo.search_tracks_by_artist('new test art') == []
+    assert full_text_repo.search_tracks_by_genre('new test gen') == []
+    assert full_text_repo.search_tracks_by_genre('late gen') == [track]
+
+
+def test_repository_full_text_search_does_not_match_across_genres(session_factory):
+    repo = SqlAlchemyRepository(session_factory)
+
+    track = Track(29149939, 'New track 1')
+    track.add_genre(Genre(2918392, 'Hip-Hop'))
+    track.add_genre(Genre(2918393, 'Rock'))
+    repo.add_genre(track.genres[0])
+    repo.add_genre(track.genres[1])
+    repo.add_track(track)
+
+    assert track in repo.search_tracks_by_genre('hop')
+    assert track not in repo.search_tracks_by_genre('hop rock')
+    assert track not in repo.search_tracks_by_genre('hip-hoprock')
+
+
+def test_repository_full_text_search_ranks_by_bm25(session_factory):
+    repo = SqlAlchemyRepository(session_factory)
+
+    track1 = Track(29149939, 'Love song with a long title about many other things')
+    track2 = Track(29149940, 'Love love love')
+    repo.add_many_tracks([track1, track2])
+
+    # The title with more occurrences of the word ranks first, despite its larger id
+    search_result = repo.search_tracks('title', 'love')
+    assert search_result.get_tracks(0, 2) == [track2, track1]
+    assert search_result.total == 2
+
+
+class QueryCounter:
+    # Counts the SQL statements executed by the engine of the session factory.
+    def __init__(self, session_factory):
+        self.__engine = session_factory.kw['bind']
+        self.count = 0
+
+    def __enter__(self):
+        self.count = 0
+        event.listen(self.__engine, 'before_cursor_execute', self.__count_statement)
+        return self
+
+    def __exit__(self, *args):
+        event.remove(self.__engine, 'before_cursor_execute', self.__count_statement)
+
+    def __count_statement(self, *args):
+        self.count += 1
+
+
+def test_repository_loads_a_page_of_tracks_with_fixed_number_of_queries(session_factory):
+    repo = SqlAlchemyRepository(session_factory)
+    # The first search looks up whether the full-text index exists
+    repo.search_tracks('title', 'food')
+    # The reference data cache of albums, artists and genres is loaded by the first read
+    repo.get_genres()
+
+    for tracks_per_page in (1, 5, 10):
+        repo.reset_session()
+        # The version of the reference data, read once per session, the page of tracks,
+        # then the genres of all its tracks
+        with QueryCounter(session_factory) as counter:
+            tracks_services.get_tracks_for_page(0, tracks_per_page, repo)
+        assert counter.count == 3
+
+        # The number of searched tracks, the page of tracks, then the genres of all its tracks
+        with QueryCounter(session_factory) as counter:
+            page_tracks, _ = tracks_services.get_tracks_for_search_page('genre', 'hip', 0, tracks_per_page, repo)
+        assert len(page_tracks) > 0
+        assert counter.count == 3
+
+    # The whole catalog is loaded in the same way
+    with QueryCounter(session_factory) as counter:
+        tracks_services.tracks_to_dicts(repo.get_tracks())
+    assert counter.count == 2
+
+
+def test_repository_loads_track_detail_with_fixed_number_of_queries(session_factory):
+    repo = SqlAlchemyRepository(session_factory)
+    track = repo.get_track(2)
+    for user_name in ('denis', 'fmercury', 'gmichael'):
+        user = User(user_name, 'Denis9389')
+        repo.add_user(user)
+        review = Review(track, f'Review by {user_name}', 5)
+        review.user = user
+        repo.add_review(review)
+    repo.reset_session()
+
+    # The track with its album and artist, its genres, then the reviews with their users
+    with QueryCounter(session_factory) as counter:
+        tracks_services.get_track(2, repo)
+        review_dicts = tracks_services.get_reviews_for_track(2, repo)
+    assert [review['user'] for review in review_dicts] == ['denis', 'fmercury', 'gmichael']
+    assert counter.count == 3
+
+
+def test_repository_reads_reference_data_from_cache(session_factory):
+    uncached_repo = SqlAlchemyRepository(session_factory, reference_cache=False)
+    repo = SqlAlchemyRepository(session_factory)
+    repo.get_genres()
+    repo.reset_session()
+
+    # The albums, artists and genres are cached across sessions, which only read their version
+    with QueryCounter(session_factory) as counter:
+        genres = repo.get_genres()
+        album = repo.get_album(1)
+        artists = repo.get_artists()
+        albums = repo.get_albums(sorting=True)
+    assert counter.count == 1
+    assert genres == uncached_repo.get_genres()
+    assert album == uncached_repo.get_album(1) and album.title == 'AWOL - A Way Of Life'
+    assert artists == uncached_repo.get_artists()
+    assert albums == uncached_repo.get_albums(sorting=True)
+
+    # The album, artist and genres of the tracks are set from the cache, so the tracks render the same
+    page_tracks = repo.get_tracks_page(0, 10)
+    assert tracks_services.tracks_to_dicts(page_tracks) == tracks_services.tracks_to_dicts(
+        uncached_repo.get_tracks_page(0, 10))
+    assert page_tracks[0].album is repo.get_album(page_tracks[0].album.album_id)
+    assert tracks_services.tracks_to_dicts(repo.search_tracks_by_genre('hip')) == tracks_services.tracks_to_dicts(
+        uncached_repo.search_tracks_by_genre('hip'))
+
+    # Reading the tracks does not make the session see changes to flush
+    assert not repo._session_cm.session.dirty
+
+
+def test_repository_invalidates_reference_data_cache_when_adding(session_factory):
+    repo = SqlAlchemyRepository(session_factory)
+    number_of_genres = len(repo.get_genres())
+
+    repo.add_genre(Genre(1012, 'New Genre'))
+    assert len(repo.get_genres()) == number_of_genres + 1
+
+    repo.add_album(Album(1013, 'New Album'))
+    assert repo.get_album(1013).title == 'New Album'
+
+    repo.add_artist(Artist(1014, 'New Artist'))
+    assert Artist(1014, 'New Artist') in repo.get_artists()
+
+    # Adding a track adds its album too
+    track = Track(1015, 'New Track')
+    track.album = Album(1016, 'Album Of New Track')
+    repo.add_track(track)
+    assert repo.get_album(1016).title == 'Album Of New Track'
+
+    # An entity added by another process is missing from the cache, and is still read from the database
+    other_repo = SqlAlchemyRepository(session_factory)
+    track = Track(1017, 'Other Track')
+    track.album = Album(1018, 'Album Of Other Track')
+    other_repo.add_track(track)
+    other_repo.close_session()
+    assert repo.get_album(1018).title == 'Album Of Other Track'
+    assert repo.get_tracks_by_album(1018)[0].album.title == 'Album Of Other Track'
+
+
+def test_repository_reference_data_cache_sees_changes_of_another_repository(session_factory):
+    repo = SqlAlchemyRepository(session_factory)
+    assert repo.get_album(1).title == 'AWOL - A Way Of Life'
+    number_of_genres = len(repo.get_genres())
+    repo.reset_session()
+
+    # Another process renames an album and adds a genre, which its own cache invalidation does not reach
+    other_repo = SqlAlchemyRepository(session_factory)
+    other_repo.add_album(Album(1, 'Renamed Album'))
+    other_repo.add_genre(Genre(1012, 'New Genre'))
+    other_repo.close_session()
+
+    # The next session reads the new version of the reference data, and loads the cache again
+    assert repo.get_album(1).title == 'Renamed Album'
+    assert len(repo.get_genres()) == number_of_genres + 1
+    assert all(track.album.title == 'Renamed Album' for track in repo.get_tracks_by_album(1))
+
+
+def test_repository_reference_data_cache_gives_each_session_its_own_entities(session_factory):
+    repo = SqlAlchemyRepository(session_factory)
+    album = repo.get_album(1)
+    track = repo.get_tracks_by_album(1)[0]
+    session = repo._session_cm.session()
+
+    # The cached album is merged into the session, once, and set on the tracks of the session
+    assert inspect(album).session is session
+    assert track.album is album and inspect(track.album).session is session
+    assert all(inspect(genre).session is session for genre in track.genres)
+
+    # Another session gets an album of its own, so a change to one is not seen by the other
+    repo.reset_session()
+    other_album = repo.get_album(1)
+    assert other_album is not album and inspect(other_album).session is repo._session_cm.session()
+    album.title = 'Changed In Another Session'
+    assert other_album.title == 'AWOL - A Way Of Life'
+
+
+def test_repository_reuses_compiled_single_row_statements(session_factory):
+    repo = SqlAlchemyRepository(session_factory, reference_cache=False)
+    repo.add_user(User('denis', 'Denis9389'))
+
+    def track_detail(track_id):
+        repo.get_user(' Denis')
+        repo.get_track(track_id)
+        repo.get_album(1)
+        repo.get_reviews_for_track(track_id)
+        repo.get_review_for_track_by_user(track_id, 'denis')
+        repo.reset_session()
+
+    # The statements are compiled by the first request, and found in the compiled cache by the next ones
+    track_detail(2)
+    statistics = StatementCacheStatistics(session_factory.kw['bind'])
+    try:
+        for track_id in (3, 4, 5):
+            track_detail(track_id)
+        assert statistics.hits > 0
+        assert statistics.misses == 0 and statistics.uncached == 0
+        assert statistics.hit_ratio == 1.0
+    finally:
+        statistics.close()
@@ -0,0 +1,153 @@
+import logging
+
+from sqlalchemy import create_engine, inspect
+
+from music.adapters.orm import metadata, has_full_text_index, TRACKS_FTS_TRIGGERS
+from music.adapters.migrations import upgrade_database
+
+
+def create_database_without_sort_keys():
+    # Database created before the sort_key columns existed, with a few rows in it.
+    engine = create_engine('sqlite://')
+    metadata.create_all(engine)
+    with engine.begin() as connection:
+        for table_name in ('tracks', 'albums'):
+            connection.exec_driver_sql(f'DROP INDEX ix_{table_name}_sort_key_{table_name[:-1]}_id')
+            connection.exec_driver_sql(f'ALTER TABLE {table_name} DROP COLUMN sort_key')
+        connection.exec_driver_sql("INSERT INTO albums (album_id, title) VALUES (1, 'Zebra'), (2, '99 Problems')")
+        connection.exec_driver_sql("INSERT INTO tracks (track_id, title) VALUES (1, 'Food'), (2, 'Aardvark')")
+    return engine
+
+
+def test_upgrade_adds_and_fills_sort_keys():
+    engine = create_database_without_sort_keys()
+
+    with engine.begin() as connection:
+        upgrade_database(connection)
+
+    inspector = inspect(engine)
+    assert 'ix_tracks_sort_key_track_id' in [index['name'] for index in inspector.get_indexes('tracks')]
+    assert 'ix_albums_sort_key_album_id' in [index['name'] for index in inspector.get_indexes('albums')]
+
+    with engine.connect() as connection:
+        assert connection.exec_driver_sql(
+            'SELECT title FROM tracks ORDER BY sort_key, track_id').scalars().all() == ['Aardvark', 'Food']
+        assert connection.exec_driver_sql(
+            'SELECT sort_key FROM albums ORDER BY album_id').scalars().all() == ['zebra', 'z99 Problems']
+
+
+def test_upgrade_can_run_again():
+    engine = create_database_without_sort_keys()
+
+    with engine.begin() as connection:
+        upgrade_database(connection)
+    with engine.begin() as connection:
+        upgrade_database(connection)
+
+    with engine.connect() as connection:
+        assert connection.exec_driver_sql('SELECT count(*) FROM tracks').scalar() == 2
+
+
+def test_upgrade_adds_the_versions_table():
+    engine = create_database_without_sort_keys()
+    with engine.begin() as connection:
+        connection.exec_driver_sql('DROP TABLE versions')
+
+    with engine.begin() as connection:
+        upgrade_database(connection)
+
+    assert 'versions' in inspect(engine).get_table_names()
+
+
+def create_database_with_duplicate_rows():
+    # Database created before reviews and track genres were unique, with a duplicate of each.
+    engine = create_engine('sqlite://')
+    metadata.create_all(engine)
+    with engine.begin() as connection:
+        for index_name in ('uq_reviews_track_id_user_id', 'ix_track_genres_track_id_genre_id'):
+            connection.exec_driver_sql(f'DROP INDEX {index_name}')
+        connection.exec_driver_sql('CREATE INDEX ix_reviews_track_id ON reviews (track_id)')
+        connection.exec_driver_sql(
+            "INSERT INTO reviews (review_id, timestamp, review_text, rating, track_id, user_id) VALUES "
+            "(1, '2020-01-01', 'First', 5, 2, 1), (2, '2020-01-02', 'Second', 1, 2, 1), "
+            "(3, '2020-01-03', 'Anonymous', 3, 2, NULL), (4, '2020-01-04', 'Anonymous', 3, 2, NULL)")
+        connection.exec_driver_sql(
+            'INSERT INTO track_genres (id, track_id, genre_id) VALUES (1, 2, 1), (2, 2, 1), (3, 2, 2)')
+    return engine
+
+
+def test_upgrade_removes_duplicate_rows_and_adds_unique_indexes():
+    engine = create_database_with_duplicate_rows()
+
+    with engine.begin() as connection:
+        upgrade_database(connection)
+
+    inspector = inspect(engine)
+    review_indexes = {index['name']: index for index in inspector.get_indexes('reviews')}
+    assert review_indexes['uq_reviews_track_id_user_id']['unique']
+    # The single column index is covered by the unique index
+    assert 'ix_reviews_track_id' not in review_indexes
+    assert 'ix_track_genres_track_id_genre_id' in [index['name'] for index in inspector.get_indexes('track_genres')]
+
+    with engine.connect() as connection:
+        # The first review of the user is kept, the anonymous reviews are not duplicates
+        assert connection.exec_driver_sql(
+            'SELECT review_id FROM reviews ORDER BY review_id').scalars().all() == [1, 3, 4]
+        assert connection.exec_driver_sql(
+            'SELECT id FROM track_genres ORDER BY id').scalars().all() == [1, 3]
+
+
+def test_upgrade_keeps_and_logs_the_removed_duplicate_rows(caplog):
+    engine = create_database_with_duplicate_rows()
+
+    with caplog.at_level(logging.WARNING, logger='music.adapters.migrations'):
+        with engine.begin() as connection:
+            upgrade_database(connection)
+
+    # The removed rows are logged with their ids
+    messages = [record.getMessage() for record in caplog.records]
+    assert 'Removed 1 duplicate rows of reviews and kept them in reviews_duplicates, review_id: [2]' in messages
+    assert 'Removed 1 duplicate rows of track_genres and kept them in track_genres_duplicates, id: [2]' in messages
+
+    # and kept whole in the backup tables
+    with engine.connect() as connection:
+        assert connection.exec_driver_sql(
+            'SELECT review_id, review_text, rating, track_id, user_id FROM reviews_duplicates').all() == [
+            (2, 'Second', 1, 2, 1)]
+        assert connection.exec_driver_sql('SELECT id, track_id, genre_id FROM track_genres_duplicates').all() == [
+            (2, 2, 1)]
+
+    # Running the upgrade again removes and logs nothing
+    caplog.clear()
+    with caplog.at_level(logging.WARNING, logger='music.adapters.migrations'):
+        with engine.begin() as connection:
+            upgrade_database(connection)
+    assert caplog.records == []
+
+
+def test_upgrade_rebuilds_a_word_full_text_index():
+    # Database created when the full-text index tokenized words and had fewer triggers.
+    engine = create_engine('sqlite://')
+    metadata.create_all(engine)
+    with engine.begin() as connection:
+        for trigger_name in TRACKS_FTS_TRIGGERS:
+            connection.exec_driver_sql(f'DROP TRIGGER {trigger_name}')
+        connection.exec_driver_sql('DROP TABLE tracks_fts')
+        connection.exec_driver_sql('CREATE VIRTUAL TABLE tracks_fts USING fts5(title, artist, album, genres)')
+        connection.exec_driver_sql("INSERT INTO tracks (track_id, title) VALUES (1, 'Midnight Drive')")
+        connection.exec_driver_sql("INSERT INTO tracks_fts (rowid, title) VALUES (1, 'Midnight Drive')")
+        # The repositories search with LIKE until the index is rebuilt
+        assert not has_full_text_index(connection)
+
+    with engine.begin() as connection:
+        upgrade_database(connection)
+        assert has_full_text_index(connection)
+
+    with engine.connect() as connection:
+        assert "tokenize='trigram'" in connection.exec_driver_sql(
+            "SELECT sql FROM sqlite_master WHERE name = 'tracks_fts'").scalar()
+        assert set(TRACKS_FTS_TRIGGERS) <= set(connection.exec_driver_sql(
+            "SELECT name FROM sqlite_master WHERE type = 'trigger'").scalars().all())
+        # The rebuilt index matches substrings within words
+        assert connection.exec_driver_sql(
+            """SELECT rowid FROM tracks_fts WHERE tracks_fts MATCH 'title : "idnigh"'""").scalars().all() == [1]
@@ -1,5 +1,18 @@
-from sqlalchemy import select, inspect
+import pytest
+
+from sqlalchemy import select, inspect, create_engine
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import sessionmaker
+
+from music.adapters import database_repository
 from music.adapters.orm import metadata
+from music.adapters.database_repository import SqlAlchemyRepository
+from music.domainmodel.track import Track
+from music.domainmodel.genre import Genre
+from music.adapters.repository import AbstractRepository
+from music.adapters.csvdatareader import TrackCSVReader
+
+from tests_db.conftest import TEST_DATA_PATH_DATABASE_LIMITED
 
 
 def test_database_populate_inspect_table_names(database_engine):
@@ -17,8 +30,10 @@ def test_database_populate_inspect_table_names(database_engine):
     assert 'reviews' in tables
     assert 'track_genres' in tables
 
-    assert inspector.get_table_names(
-    ) == ['albums', 'artists', 'genres', 'reviews', 'track_genres', 'tracks', 'users']
+    # The full-text index tables are created along with them, as this SQLite has FTS5
+    assert [table for table in inspector.get_table_names() if not table.startswith('tracks_fts')
+            ] == ['albums', 'artists', 'genres', 'reviews', 'track_genres', 'tracks', 'users', 'versions']
+    assert 'tracks_fts' in tables
 
 
 def test_database_populate_all_tracks(database_engine):
@@ -131,3 +146,100 @@ def test_database_populate_track_genres(database_engine):
 
         # Check the first row of the table
         assert track_genres[0] == (2, 21)
+
+
+def read_test_catalog():
+    reader = TrackCSVReader(str(TEST_DATA_PATH_DATABASE_LIMITED / 'raw_albums_test.csv'),
+                            str(TEST_DATA_PATH_DATABASE_LIMITED / 'raw_tracks_test.csv'))
+    reader.read_csv_files()
+    return (reader.dataset_of_albums, reader.dataset_of_artists, reader.dataset_of_genres,
+            reader.dataset_of_tracks)
+
+
+def catalog_table_rows(engine):
+    with engine.connect() as connection:
+        return {table_name: sorted(tuple(row) for row in connection.execute(
+                    select(*[column for column in metadata.tables[table_name].columns if column.name != 'id'])))
+                for table_name in ('albums', 'artists', 'genres', 'tracks', 'track_genres')}
+
+
+def test_database_bulk_populate_matches_merge(empty_session):
+    # The empty_session fixture maps the model to the tables
+    engines = [create_engine('sqlite://'), create_engine('sqlite://')]
+    for engine in engines:
+        metadata.create_all(engine)
+    bulk_repo, merge_repo = [SqlAlchemyRepository(sessionmaker(bind=engine)) for engine in engines]
+
+    # The empty database is filled in bulk, the other one entity by entity
+    assert bulk_repo.is_empty()
+    bulk_repo.add_catalog(*read_test_catalog())
+    AbstractRepository.add_catalog(merge_repo, *read_test_catalog())
+
+    assert not bulk_repo.is_empty()
+    assert catalog_table_rows(engines[0]) == catalog_table_rows(engines[1])
+    # The full-text index is filled by the triggers of the bulk inserts too
+    assert bulk_repo.search_tracks('genre', 'hip').total == merge_repo.search_tracks('genre', 'hip').total > 0
+
+
+def test_database_populate_in_batches_skips_a_track_id_of_an_earlier_batch(empty_session):
+    engines = [create_engine('sqlite://'), create_engine('sqlite://')]
+    for engine in engines:
+        metadata.create_all(engine)
+    batch_repo, bulk_repo = [SqlAlchemyRepository(sessionmaker(bind=engine)) for engine in engines]
+    albums, artists, genres, tracks = read_test_catalog()
+    duplicate = Track(tracks[0].track_id, 'Duplicate')
+    duplicate_genre = Genre(99999999, 'Duplicate Genre')
+    duplicate.add_genre(duplicate_genre)
+
+    # The track id of the first batch comes again in the second one, and only its first track is kept,
+    # as by add_catalog
+    batch_repo.add_catalog_batches([(albums, artists, genres, tracks[:5]),
+                                    ([], [], [duplicate_genre], tracks[5:] + [duplicate])])
+    bulk_repo.add_catalog(albums, artists, list(genres) + [duplicate_genre], tracks + [duplicate])
+
+    assert catalog_table_rows(engines[0]) == catalog_table_rows(engines[1])
+    assert batch_repo.get_track(tracks[0].track_id).title == tracks[0].title
+
+
+def test_database_bulk_populate_rolls_back_on_failure(empty_session, monkeypatch):
+    engine = create_engine('sqlite://')
+    metadata.create_all(engine)
+    repo = SqlAlchemyRepository(sessionmaker(bind=engine))
+    # Several executemany INSERTs per table, the last of which fails on the track without a title
+    monkeypatch.setattr(database_repository, 'BULK_INSERT_BATCH_SIZE', 2)
+    albums, artists, genres, tracks = read_test_catalog()
+
+    with pytest.raises(IntegrityError):
+        repo.add_catalog(albums, artists, genres, tracks + [Track(99999999, None)])
+
+    # None of the tables keeps the rows inserted before the failure
+    assert repo.is_empty()
+    assert all(rows == [] for rows in catalog_table_rows(engine).values())
+
+
+def test_database_populate_merges_into_existing_data(session_factory):
+    repo = SqlAlchemyRepository(session_factory)
+
+    # The database is not empty, so populating again merges the same rows instead of inserting them
+    repo.add_catalog(*read_test_catalog())
+    assert repo.get_number_of_tracks() == 10
+    assert repo.get_number_of_albums() == 5
+
+
+def test_database_populate_in_batches_matches_merge(empty_session):
+    engines = [create_engine('sqlite://'), create_engine('sqlite://')]
+    for engine in engines:
+        metadata.create_all(engine)
+    batch_repo, merge_repo = [SqlAlchemyRepository(sessionmaker(bind=engine)) for engine in engines]
+
+    # Batches after the first one are inserted in bulk too, without the entities of the earlier batches
+    reader = TrackCSVReader(str(TEST_DATA_PATH_DATABASE_LIMITED / 'raw_albums_test.csv'),
+                            str(TEST_DATA_PATH_DATABASE_LIMITED / 'raw_tracks_test.csv'))
+    batch_repo.add_catalog_batches(reader.read_csv_files_in_batches(3))
+    AbstractRepository.add_catalog(merge_repo, *read_test_catalog())
+
+    assert catalog_table_rows(engines[0]) == catalog_table_rows(engines[1])
+
+    # A database with data in it is merged into batch by batch
+    batch_repo.add_catalog_batches(reader.read_csv_files_in_batches(4))
+    assert catalog_table_rows(engines[0]) == catalog_table_rows(engines[1])
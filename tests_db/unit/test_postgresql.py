@@ -0,0 +1,96 @@
+import pytest
+
+from sqlalchemy import create_mock_engine, inspect
+
+from music.adapters.database_repository import SqlAlchemyRepository, substring_search_statement
+from music.adapters.migrations import upgrade_database
+from music.adapters.orm import metadata, TRIGRAM_INDEXES
+from music.adapters.repository import RepositoryException
+from music.domainmodel.user import User
+from music.domainmodel.review import Review
+from music.tracks import services as tracks_services
+
+
+SEARCHES = [(search_key, text) for search_key in ('title', 'artist', 'album', 'genre')
+            for text in ('love', 'a', 'ROCK', 'hip-hop', '%', '_', ' ', 'no such name')]
+
+
+def track_ids(tracks) -> list:
+    return [track.track_id for track in tracks]
+
+
+def test_trigram_indexes_are_only_created_on_postgresql(empty_session):
+    statements = []
+    engine = create_mock_engine('postgresql://', lambda sql, *args, **kw: statements.append(str(sql.compile(
+        dialect=engine.dialect)).strip()))
+    metadata.create_all(engine, checkfirst=False)
+    assert 'CREATE EXTENSION IF NOT EXISTS pg_trgm' in statements
+    assert 'CREATE INDEX IF NOT EXISTS ix_tracks_title_trgm ON tracks USING gin (title gin_trgm_ops)' in statements
+
+    # SQLite searches by substring without them
+    inspector = inspect(empty_session.get_bind())
+    sqlite_indexes = [index['name'] for table_name in inspector.get_table_names()
+                      for index in inspector.get_indexes(table_name)]
+    assert not set(TRIGRAM_INDEXES) & set(sqlite_indexes)
+
+
+def test_postgresql_repository_reads_as_the_sqlite_repository(postgres_session_factory, session_factory):
+    postgres_repo = SqlAlchemyRepository(postgres_session_factory)
+    sqlite_repo = SqlAlchemyRepository(session_factory, full_text_search=False)
+
+    # The pages and seeks follow the same order of the sort keys
+    assert track_ids(postgres_repo.get_tracks_page(0, 100)) == track_ids(sqlite_repo.get_tracks_page(0, 100))
+    assert track_ids(postgres_repo.get_tracks_after(None, 7)) == track_ids(sqlite_repo.get_tracks_after(None, 7))
+    assert postgres_repo.get_albums_page(0, 100) == sqlite_repo.get_albums_page(0, 100)
+    assert tracks_services.tracks_to_dicts(postgres_repo.get_tracks()) == tracks_services.tracks_to_dicts(
+        sqlite_repo.get_tracks())
+    assert tracks_services.get_track(2, postgres_repo) == tracks_services.get_track(2, sqlite_repo)
+
+    # The substring searches find the same tracks
+    for search_key, text in SEARCHES:
+        postgres_result = postgres_repo.search_tracks(search_key, text)
+        sqlite_result = sqlite_repo.search_tracks(search_key, text)
+        assert postgres_result.total == sqlite_result.total, (search_key, text)
+        assert track_ids(postgres_result.get_tracks(0, 100)) == track_ids(sqlite_result.get_tracks(0, 100))
+
+
+def test_postgresql_substring_search_uses_trigram_indexes(postgres_session_factory):
+    engine = postgres_session_factory.kw['bind']
+    with engine.connect() as connection:
+        # The test catalog is small enough for a sequential scan to be cheaper than any index.
+        connection.exec_driver_sql('SET enable_seqscan = off')
+
+        for search_key, index_name in (('title', 'ix_tracks_title_trgm'), ('artist', 'ix_artists_full_name_trgm'),
+                                       ('album', 'ix_albums_title_trgm')):
+            compiled = substring_search_statement(search_key, 'love', []).compile(dialect=engine.dialect)
+            plan = '\n'.join(connection.exec_driver_sql(f'EXPLAIN {compiled}', compiled.params).scalars())
+            assert index_name in plan, plan
+
+
+def test_postgresql_repository_rejects_a_second_review_by_the_same_user(postgres_session_factory):
+    repo = SqlAlchemyRepository(postgres_session_factory)
+    user = User('denis', 'Denis9389')
+    repo.add_user(user)
+
+    review = Review(repo.get_track(2), 'My review', 5)
+    review.user = user
+    repo.add_review(review)
+
+    second_review = Review(repo.get_track(2), 'My second review', 4)
+    second_review.user = user
+    with pytest.raises(RepositoryException):
+        repo.add_review(second_review)
+    assert [review.review_text for review in repo.get_reviews_for_track(2)] == ['My review']
+
+
+def test_postgresql_upgrade_creates_missing_trigram_indexes(postgres_session_factory):
+    engine = postgres_session_factory.kw['bind']
+    with engine.begin() as connection:
+        connection.exec_driver_sql('DROP INDEX ix_tracks_title_trgm')
+
+    # Upgrading twice does nothing the second time
+    for _ in range(2):
+        with engine.begin() as connection:
+            upgrade_database(connection)
+
+    assert 'ix_tracks_title_trgm' in [index['name'] for index in inspect(engine).get_indexes('tracks')]
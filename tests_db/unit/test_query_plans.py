@@ -0,0 +1,107 @@
+import re
+
+import pytest
+
+from sqlalchemy import event
+
+from music.adapters.database_repository import SqlAlchemyRepository
+from music.adapters.utils import title_sort_key
+from music.domainmodel.user import User
+from music.domainmodel.review import Review
+
+
+# A plain table scan reads every row. Index scans (SCAN ... USING INDEX) walk an index in order and stop
+# at the limit of the page, and the full-text index is a virtual table that does its own lookup.
+FULL_TABLE_SCAN = re.compile(r'^SCAN (TABLE )?\w+( AS \w+)?$')
+
+
+def query_plans(session_factory, request):
+    # Records the statements of the request, then explains each of them with its own parameters.
+    engine = session_factory.kw['bind']
+    statements = []
+
+    def record_statement(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+
+    event.listen(engine, 'before_cursor_execute', record_statement)
+    try:
+        request()
+    finally:
+        event.remove(engine, 'before_cursor_execute', record_statement)
+
+    with engine.connect() as connection:
+        return [(statement, [row[3] for row in connection.exec_driver_sql(
+            f'EXPLAIN QUERY PLAN {statement}', parameters)]) for statement, parameters in statements]
+
+
+@pytest.fixture(params=[False, True], ids=['without_reference_cache', 'with_reference_cache'])
+def reference_cache(request):
+    return request.param
+
+
+@pytest.fixture
+def repo(session_factory, reference_cache):
+    repo = SqlAlchemyRepository(session_factory, reference_cache=reference_cache)
+    user = User('denis', 'Denis9389')
+    repo.add_user(user)
+    review = Review(repo.get_track(2), 'My review 1', 5)
+    review.user = user
+    repo.add_review(review)
+    # The first search looks up whether the full-text index exists
+    repo.search_tracks('title', 'food')
+    # The reference data cache of albums, artists and genres is loaded by the first read
+    repo.get_genres()
+    repo.reset_session()
+    return repo
+
+
+# Every request of a single user, track, album or page. Listing the whole catalog, counting it, and the
+# substring search used without the full-text index read every row by design, so they are not listed here.
+HOT_REQUESTS = {
+    'get_user': lambda repo: repo.get_user('denis'),
+    'get_track': lambda repo: repo.get_track(2),
+    'get_tracks_by_ids': lambda repo: repo.get_tracks_by_ids([3, 2]),
+    'get_users_by_names': lambda repo: repo.get_users_by_names(['denis']),
+    'get_tracks_page': lambda repo: repo.get_tracks_page(3, 3),
+    'get_tracks_after': lambda repo: repo.get_tracks_after(title_sort_key('Food', 2), 3),
+    'get_tracks_before': lambda repo: repo.get_tracks_before(title_sort_key('Food', 2), 3),
+    'get_tracks_by_album': lambda repo: repo.get_tracks_by_album(1),
+    'get_album': lambda repo: repo.get_album(1),
+    'get_albums_by_ids': lambda repo: repo.get_albums_by_ids([4, 1]),
+    'get_albums_page': lambda repo: repo.get_albums_page(2, 2),
+    'get_albums_after': lambda repo: repo.get_albums_after(title_sort_key('AWOL - A Way Of Life', 1), 2),
+    'get_reviews_for_track': lambda repo: repo.get_reviews_for_track(2),
+    'get_review_for_track_by_user': lambda repo: repo.get_review_for_track_by_user(2, 'denis'),
+    'search_tracks_by_title': lambda repo: repo.search_tracks('title', 'food').get_tracks(0, 5),
+    'search_tracks_by_genre': lambda repo: repo.search_tracks('genre', 'hip').get_tracks(0, 5),
+}
+
+
+@pytest.mark.parametrize('request_name', HOT_REQUESTS)
+def test_hot_request_does_not_scan_tables(repo, session_factory, reference_cache, request_name):
+    plans = query_plans(session_factory, lambda: HOT_REQUESTS[request_name](repo))
+    assert len(plans) > 0
+    if reference_cache and request_name == 'get_album':
+        # An album is served from the reference data cache, which only reads its version
+        assert [statement for statement, _ in plans if 'FROM versions' not in statement] == []
+
+    for statement, plan in plans:
+        scans = [detail for detail in plan if FULL_TABLE_SCAN.match(detail)]
+        assert scans == [], f'{statement}\n{plan}'
+
+
+def test_hot_requests_use_the_expected_indexes(repo, session_factory):
+    plans = query_plans(session_factory, lambda: (
+        repo.get_review_for_track_by_user(2, 'denis'), repo.search_tracks('genre', 'hip').get_tracks(0, 5)))
+    details = [detail for _, plan in plans for detail in plan]
+
+    assert any('uq_reviews_track_id_user_id (track_id=? AND user_id=?)' in detail for detail in details)
+    assert any('COVERING INDEX ix_track_genres_track_id_genre_id' in detail for detail in details)
+
+
+def test_full_table_scan_is_detected(repo, session_factory):
+    # The substring search without the full-text index reads every track
+    substring_repo = SqlAlchemyRepository(session_factory, full_text_search=False)
+    plans = query_plans(session_factory, lambda: substring_repo.search_tracks('title', 'food').get_tracks(0, 5))
+
+    assert any(FULL_TABLE_SCAN.match(detail) for _, plan in plans for detail in plan)